@@ -18,26 +18,318 @@ Created: 8 August 2025
 
 import os
 import re
-from glob import glob
+import sys
+import json
 from pathlib import Path
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main_tools'))
+from fileio import atomic_write  # shared with main_tools
 
-def change_nml(file_path, root_dir, verbose=False, outpath=None, abs_outpaths=False):
+
+# Basename index of the YREC input tree, saved in the YREC root (see load_input_index)
+INPUT_INDEX_FILENAME = '.yrec_input_index.json'
+
+
+def build_input_index(input_root):
+    """
+    Walk the input tree once, following symbolic links to directories
+    (e.g. input/ext -> /data/ext), as glob('**') does.
+
+    Returns
+    -------
+    dict
+        'files': {basename: [paths relative to input_root]},
+        'dirs': {directory relative to input_root: mtime_ns} and
+        'links': {directory relative to input_root: real path} for the directories
+        reached through a link, whose mtimes are those of the link targets.
+        Hidden files and folders are skipped, as glob('**') does, and a directory
+        already walked under another path (a link cycle, or a second link to it)
+        is not walked again.
+    """
+    files, dirs, links = {}, {}, {}
+    root_real = os.path.realpath(input_root)
+    visited = {root_real}
+    for dirpath, dirnames, filenames in os.walk(input_root, followlinks=True):
+        kept = []
+        for d in sorted(dirnames):
+            real = os.path.realpath(os.path.join(dirpath, d))
+            if not d.startswith('.') and real not in visited:
+                visited.add(real)
+                kept.append(d)
+        dirnames[:] = kept
+        rel_dir = os.path.relpath(dirpath, input_root)
+        dirs[rel_dir] = os.stat(dirpath).st_mtime_ns
+        real = os.path.realpath(dirpath)
+        if real != os.path.normpath(os.path.join(root_real, rel_dir)):
+            links[rel_dir] = real
+        for name in sorted(filenames):
+            if not name.startswith('.'):
+                files.setdefault(name, []).append(os.path.normpath(os.path.join(rel_dir, name)))
+    return {'files': files, 'dirs': dirs, 'links': links}
+
+
+def _index_is_current(index, input_root):
+    """
+    Every directory still has the mtime it had (adding, removing or renaming an entry changes it),
+    and every linked directory still points to the same place.
+    """
+    links = index['links']
+    for rel_dir, mtime_ns in index['dirs'].items():
+        path = os.path.join(input_root, rel_dir)
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+        if rel_dir in links and os.path.realpath(path) != links[rel_dir]:
+            return False
+    return True
+
+
+def load_input_index(input_root, index_path=None, verbose=False):
+    """
+    Basename index of the input tree, read from disk if it is still current.
+
+    The index is saved as `.yrec_input_index.json` next to input_root (or at
+    index_path, which must be outside the tree) and is rebuilt when the mtime
+    of any of its directories changed, i.e. when a file or folder was added,
+    removed or renamed (for a linked directory, in the link target), or when
+    a linked directory points somewhere else. If input_root is not a folder,
+    an empty index is returned and nothing is saved.
+
+    Returns
+    -------
+    dict
+        As build_input_index().
+    """
+    if not os.path.isdir(input_root):
+        # Nothing to index, and an index without directories would never go stale: save nothing
+        print(f"⚠️ Input folder {input_root} not found; no input paths can be resolved.")
+        return {'files': {}, 'dirs': {}, 'links': {}}
+
+    index_path = index_path or os.path.join(os.path.dirname(os.path.abspath(input_root)), INPUT_INDEX_FILENAME)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if _index_is_current(index, input_root):
+            return index
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    index = build_input_index(input_root)
+    try:
+        atomic_write(index_path, lambda f: json.dump(index, f), text=True)
+    except OSError as e:  # e.g. a read-only YREC root: the index is rebuilt next time
+        if verbose:
+            print(f"⚠️ Could not save the input index to {index_path}: {e}")
+    if verbose:
+        print(f"🗂️ Indexed {sum(len(v) for v in index['files'].values())} input files under {input_root}")
+    return index
+
+
+def resolve_input_file(index, input_root, val):
+    """
+    Find the file a namelist path refers to in the input tree, by basename.
+
+    When several files share the basename, the one whose trailing path
+    components match the most of `val` (e.g. 'opal95/GS98.OP17') is used.
+
+    Returns
+    -------
+    (str or None, list of str)
+        The resolved path (under input_root), or None if there is no file or no single best
+        match; and the candidate paths.
+    """
+    candidates = [os.path.join(input_root, rel) for rel in index['files'].get(os.path.basename(val), [])]
+    if len(candidates) <= 1:
+        return (candidates[0] if candidates else None), candidates
+
+    wanted = Path(val).parts[::-1]
+
+    def shared_tail(path):
+        n = 0
+        for a, b in zip(Path(path).parts[::-1], wanted):
+            if a != b:
+                break
+            n += 1
+        return n
+
+    scores = [shared_tail(path) for path in candidates]
+    best = max(scores)
+    if scores.count(best) > 1:
+        return None, candidates
+    return candidates[scores.index(best)], candidates
+
+
+# Keys representing output files that may be redirected
+SPECIAL_KEYS = {
+    "FLAST": ".last", "FMODPT": ".full", "FSTOR": ".store", "FTRACK": ".track",
+    "FSHORT": ".short", "FPMOD": ".pmod", "FPENV": ".penv", "FPATM": ".atm",
+    "FSNU": ".snu", "FSCOMP": ".excomp"
+}
+
+_ENTRY_PATTERN = re.compile(r'([A-Z0-9_]+)\s*=\s*([^,\n]+)', re.IGNORECASE)
+
+
+def has_excluded_template(val):
+    """Ignore template/dummy file entries that should not be replaced."""
+    return any(x in val.lower() for x in ['template', 'dummy', 'replace', 'default'])
+
+
+def parse_nml_lines(lines):
+    """Parse key-value pairs from the lines of a .nml file, ignoring comments."""
+    # Remove inline and full-line comments
+    clean_lines = [line.split('!')[0].strip() for line in lines if line.strip() and not line.strip().startswith('!')]
+    joined = "\n".join(clean_lines)
+
+    # Extract entries like KEY = value
+    nml = {}
+    for key, val in _ENTRY_PATTERN.findall(joined):
+        nml[key.upper()] = val.strip().strip('"')
+    return nml
+
+
+def resolve_file_paths(nml_file, nml_dict, input_index, input_root, file_path,
+                       outpath=None, abs_outpaths=False, messages=None):
+    """
+    New values of the file keys of one namelist.
+
+    - General keys: looked up by name in the input tree index.
+    - Special keys: constructed in outpath.
+
+    Returns
+    -------
+    dict
+        {key: new value (quoted)} for the keys whose value changes.
+    """
+    messages = [] if messages is None else messages
+    updates = {}
+    for key, val in nml_dict.items():
+        if not isinstance(val, str) or has_excluded_template(val):
+            continue
+
+        # General file keys (not in SPECIAL_KEYS)
+        if '/' in val and key not in SPECIAL_KEYS:
+            found, candidates = resolve_input_file(input_index, input_root, val)
+            if found:
+                if abs_outpaths:
+                    resolved = os.path.abspath(found)
+                else:
+                    resolved = os.path.relpath(found, start = file_path)
+                if resolved != val:
+                    updates[key] = f'"{resolved}"'
+                if len(candidates) > 1:
+                    others = [os.path.relpath(c, input_root) for c in candidates if c != found]
+                    messages.append(f"⚠️ {key} in {os.path.basename(nml_file)}: '{val}' matches several files; "
+                                    f"chose {os.path.relpath(found, input_root)} over {', '.join(others)}")
+                else:
+                    messages.append(f"✅ {key} auto-resolved -> {resolved}")
+            elif candidates:
+                messages.append(f"⚠️ {key} in {os.path.basename(nml_file)} is ambiguous, left unchanged: "
+                                f"'{val}' matches {', '.join(os.path.relpath(c, input_root) for c in candidates)}")
+            continue
+
+        # Output file keys
+        if key in SPECIAL_KEYS and outpath:
+            nml_base = os.path.splitext(os.path.basename(nml_file))[0]
+            constructed = os.path.join(outpath, f"{nml_base}{SPECIAL_KEYS[key]}")
+            if constructed != val:
+                updates[key] = f'"{constructed}"'
+            messages.append(f"🏗️ {key} redirected -> {constructed}")
+
+    return updates
+
+
+def updated_nml_lines(lines, updates):
+    """
+    Lines of a .nml file with the values in `updates` substituted.
+    Keeps original formatting, line endings and unmodified lines.
+    """
+    updated_lines = []
+    for line in lines:
+        stripped = line.strip()
+        if '=' not in stripped or stripped.startswith('!'):
+            updated_lines.append(line)
+            continue
+
+        key = stripped.split('=')[0].strip().upper()
+        if key in updates:
+            ending = line[len(line.rstrip('\r\n')):] or '\n'
+            updated_lines.append(f" {key} = {updates[key]}{ending}")
+        else:
+            updated_lines.append(line)
+    return updated_lines
+
+
+# Input index shared by the workers of a pool (set once per process by _init_worker)
+_WORKER_INDEX = None
+
+
+def _init_worker(input_index):
+    global _WORKER_INDEX
+    _WORKER_INDEX = input_index
+
+
+def _update_nml_job(job):
+    """
+    Read, update and (if anything changed) rewrite one .nml file.
+
+    Runs in a worker process; returns (nml_file, written, messages, error) so the
+    parent reports results in order.
+    """
+    nml_file, file_path, input_root, outpath, abs_outpaths = job
+    messages = []
+    try:
+        with open(nml_file, 'r', newline='') as f:
+            lines = f.readlines()
+        nml_dict = parse_nml_lines(lines)
+        updates = resolve_file_paths(nml_file, nml_dict, _WORKER_INDEX, input_root, file_path,
+                                     outpath=outpath, abs_outpaths=abs_outpaths, messages=messages)
+        new_lines = updated_nml_lines(lines, updates)
+        if new_lines == lines:
+            return nml_file, False, messages, None
+
+        # Write through a temporary file so an interrupted run never leaves a truncated namelist
+        atomic_write(nml_file, lambda f: f.writelines(new_lines), text=True)
+        return nml_file, True, messages, None
+    except Exception as e:
+        return nml_file, False, messages, e
+
+
+def change_nml(file_path, root_dir, verbose=False, outpath=None, abs_outpaths=False,
+               n_workers=None, chunksize=16):
     """
     Update .nml1 and .nml2 files in a directory with correct filepaths.
 
+    Each file is read and parsed once, and is rewritten only if one of its
+    values changes, so re-running on an up-to-date grid writes nothing.
+
     Parameters
     ----------
-    file_path : str
-        Path to directory containing .nml1 and .nml2 files.
+    file_path : str or list of str
+        Path to directory containing .nml1 and .nml2 files (searched
+        recursively), or several such directories.
     root_dir : str
         Root YREC directory (must contain an /input subfolder).
     verbose : bool, optional
         If False, shows progress bar only. If True, prints detailed output.
     outpath : str, optional
         Directory where output files (special keys) should point to.
+    abs_outpaths : bool, optional
+        Write absolute paths to input files instead of paths relative to
+        the directory the namelist was found under.
+    n_workers : int, optional
+        Worker processes (default: one per CPU). 1 runs in this process.
+    chunksize : int, default 16
+        Files sent to a worker at a time.
+
+    Returns
+    -------
+    list of str
+        The files that were rewritten.
 
     Example
     -------
@@ -49,109 +341,47 @@ def change_nml(file_path, root_dir, verbose=False, outpath=None, abs_outpaths=Fa
     )
     """
 
-    # Keys representing output files that may be redirected
-    SPECIAL_KEYS = {
-        "FLAST": ".last", "FMODPT": ".full", "FSTOR": ".store", "FTRACK": ".track",
-        "FSHORT": ".short", "FPMOD": ".pmod", "FPENV": ".penv", "FPATM": ".atm",
-        "FSNU": ".snu", "FSCOMP": ".excomp"
-    }
+    # === Index the input tree once (reused from disk while it is unchanged) ===
+    input_root = os.path.join(root_dir, 'input')
+    input_index = load_input_index(input_root, verbose=verbose)
 
-    def has_excluded_template(val):
-        """Ignore template/dummy file entries that should not be replaced."""
-        return any(x in val.lower() for x in ['template', 'dummy', 'replace', 'default'])
+    # === Locate all .nml1 and .nml2 files ===
+    file_paths = [file_path] if isinstance(file_path, (str, os.PathLike)) else list(file_path)
+    jobs = []
+    for base in file_paths:
+        for nml_file in sorted(Path(base).glob("**/*.nml[12]")):
+            jobs.append((str(nml_file), str(base), input_root, outpath, abs_outpaths))
 
-    def parse_nml_file(nml_path):
-        """Read and parse key-value pairs from a .nml file, ignoring comments."""
-        with open(nml_path, 'r') as f:
-            lines = f.readlines()
+    n_workers = min(n_workers or os.cpu_count() or 1, max(1, len(jobs) // chunksize))
 
-        # Remove inline and full-line comments
-        clean_lines = [line.split('!')[0].strip() for line in lines if line.strip() and not line.strip().startswith('!')]
-        joined = "\n".join(clean_lines)
-
-        # Extract entries like KEY = value
-        entries = re.findall(r'([A-Z0-9_]+)\s*=\s*([^,\n]+)', joined, re.IGNORECASE)
-        nml = {}
-        for key, val in entries:
-            key = key.upper()
-            val = val.strip().strip('"')
-            nml[key] = val
-        return nml
-
-    def resolve_file_paths(nml_file, nml_dict):
-        """
-        Adjust file paths in the nml_dict:
-        - General keys: Search in root_dir/input recursively.
-        - Special keys: Construct new path in outpath.
-        """
-        input_root = os.path.join(root_dir, 'input')
-
-        for key, val in nml_dict.items():
-            if not isinstance(val, str) or has_excluded_template(val):
-                continue
-
-            # General file keys (not in SPECIAL_KEYS)
-            if '/' in val and key not in SPECIAL_KEYS:
-                filename = os.path.basename(val)
-                candidates = glob(os.path.join(input_root, '**', filename), recursive=True)
-                if candidates:
-                    if abs_outpaths:
-                        resolved = os.path.abspath(candidates[0])
-                    else:
-                        resolved = os.path.relpath(candidates[0], start = file_path)
-                    nml_dict[key] = f'"{resolved}"'
-                    if verbose:
-                        print(f"✅ {key} auto-resolved -> {resolved}")
-                continue
-
-            # Output file keys
-            if key in SPECIAL_KEYS and outpath:
-                nml_base = os.path.basename(nml_file).replace(".nml1", "")
-                constructed = os.path.join(outpath, f"{nml_base}{SPECIAL_KEYS[key]}")
-                nml_dict[key] = f'"{constructed}"'
-                if verbose:
-                    print(f"🏗️ {key} redirected -> {constructed}")
-
-        return nml_dict
-
-    def write_updated_nml(nml_path, updated_dict):
-        """
-        Overwrite original .nml file with updated values.
-        Keeps original formatting and unmodified lines.
-        """
-        with open(nml_path, 'r') as f:
-            original = f.readlines()
-
-        updated_lines = []
-        for line in original:
-            stripped = line.strip()
-            if '=' not in stripped or stripped.startswith('!'):
-                updated_lines.append(line)
-                continue
-
-            key = stripped.split('=')[0].strip().upper()
-            if key in updated_dict:
-                new_line = f" {key} = {updated_dict[key]}\n"
-                updated_lines.append(new_line)
-            else:
-                updated_lines.append(line)
-
-        with open(nml_path, 'w') as f:
-            f.writelines(updated_lines)
-
-    # === Locate and process all relevant .nml1 and .nml2 files ===
-    target_dir = Path(file_path)
-    nml_files = list(target_dir.glob("**/*.nml[1]"))  # Matches .nml1 only
-
-    for nml_file in tqdm(nml_files, desc="Updating .nml files"):
-        if verbose:
-            print(f"\n🔧 Updating: {nml_file}")
-        try:
-            nml_dict = parse_nml_file(nml_file)
-            nml_dict = resolve_file_paths(nml_file, nml_dict)
-            write_updated_nml(nml_file, nml_dict)
-        except Exception as e:
-            print(f"❌ Error updating {nml_file.name}: {e}")
+    # === Process them, in a pool if there are enough ===
+    if n_workers > 1:
+        executor = ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(input_index,))
+        results = executor.map(_update_nml_job, jobs, chunksize=chunksize)
+    else:
+        executor = None
+        _init_worker(input_index)
+        results = map(_update_nml_job, jobs)
+
+    written = []
+    try:
+        for nml_file, was_written, messages, error in tqdm(results, total=len(jobs), desc="Updating .nml files"):
+            if verbose:
+                print(f"\n🔧 Updating: {nml_file}" + ("" if was_written or error else " (unchanged)"))
+            for message in messages:
+                if verbose or message.startswith('⚠️'):
+                    print(message)
+            if error is not None:
+                print(f"❌ Error updating {os.path.basename(nml_file)}: {error}")
+            elif was_written:
+                written.append(nml_file)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if verbose:
+        print(f"\n✅ {len(written)} of {len(jobs)} .nml files rewritten")
+    return written
 
 
 # Optional: Allow execution from command line or scripts
@@ -168,7 +398,8 @@ if __name__ == "__main__":
             "$ change_nml.py --files <nml_dir> --root ../yrec --verbose --out ./out\n"),
             formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("--files", "-f",
-                        help="Directory in which NML1 file(s) may be found",
+                        help="Directory (or directories) in which NML1/NML2 files may be found",
+                        nargs="+",
                         required=True)
     parser.add_argument("--root", "-r",
                         help="YREC root directory. Must contain 'input' dir.",
@@ -184,6 +415,10 @@ if __name__ == "__main__":
                         help="Make paths written to output files absolute instead of relative.",
                         default=False,
                         action="store_true")
+    parser.add_argument("--workers", "-j",
+                        help="Number of worker processes (default: one per CPU).",
+                        type=int,
+                        default=None)
     args = parser.parse_args()
 
     # Minimal usage example
@@ -195,5 +430,6 @@ if __name__ == "__main__":
         root_dir=args.root,
         outpath=args.out,
         abs_outpaths=args.abs,
-        verbose=args.verbose
+        verbose=args.verbose,
+        n_workers=args.workers
     )
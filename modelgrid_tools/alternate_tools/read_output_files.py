@@ -2,33 +2,36 @@
 read_output_files.py
 
 This file contains functions to read .track, .last, and .store outputs
-from a YREC run into Pandas dataframes
+from a YREC run into Pandas dataframes (or, for .last files, NumPy structured arrays)
+
+StoreFile is a random-access alternative to read_store_file for large .store
+files: it memory-maps the file, indexes the models once (the index is saved
+next to the file as <fname>.idx.npz) and only parses the models you ask for.
+The same indexing layer (IndexedOutputFile) backs lazy readers for the other
+model files YREC writes: .pmod, .penv, .atm, .full, .short and .excomp
+(ModelProfileFile; open_output_file picks the reader by extension).
 
 read_track_table here is an alternative to the eponmous function in load_yrec_tracks.py
 We recommend using load_yrec_tracks due to its extra capabilities
 (such as reading multiple .track files at once and sorting the outputs)
 but we have kept read_track_table as an option.
 '''
+import io
+import mmap
+import os
+import re
+import sys
+from collections.abc import Sequence
+from functools import lru_cache
+from glob import glob
 import pandas as pd
-from astropy.io import ascii
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main_tools'))
+from fileio import atomic_write # shared with main_tools
 
-def read_track_table(fname):
-	''' Read YREC .track output into a Pandas dataframe
-	
-		Parameters
-		---------
-		fname :  str
-			File that you want to read. Should be a .track file output from YREC
-	
-		Returns
-		-------
-		track : pandas DataFrame
-			Table of the parameters of a star's evolution at all timesteps of the YREC run
-	'''
-	track=ascii.read(fname, format="fixed_width_no_header",
-		names=('Step', 'Shls', 'Age_gyr', 'LogL_lsun', 'LogR_rsun', 'Log_g', 'log_Teff', 'Mco_core', 'Mco_env', 'Rco_env',
+
+TRACK_NAMES = ['Step', 'Shls', 'Age_gyr', 'LogL_lsun', 'LogR_rsun', 'Log_g', 'log_Teff', 'Mco_core', 'Mco_env', 'Rco_env',
 		'Tco_env', 'Dco_env', 'Pco_env', 'Oco_env', 'LogT_cen', 'LogD_cen', 'logP_cen', 'Beta_cen', 'Eta_cen', 'X_cen',
 		'Y_cen', 'Z_cen', 'ppI_lsun', 'ppII_lsun', 'ppIII_lsun', 'CNO_lsun', '3a_lsun', 'HeC_lsun', 'Egrav_lsun',
 		'Neut_lsun', 'Cl_snu', 'Ga_snu', 'pp_neut', 'pep_neut', 'hep_neut', 'Be7_neut', 'B8_neut', 'N13_neut', 'O15_neut',
@@ -36,57 +39,430 @@ def read_track_table(fname):
 		'He3_sur', 'C12_sur', 'C13_sur', 'N14_sur', 'N15_sur', 'O16_sur', 'O17_sur', 'O18_sur', ' H2_sur', 'Li6_sur',
 		'Li7_sur', 'Be9_sur', 'X_sur', 'Y_sur', 'Z_sur', 'Z_X_sur', 'Jtot', 'KE_rot_tot', 'I_tot', 'I_cz', 'Omega_sur',
 		'Omega_cen', 'Prot_sur_d', 'Vrot_kms', 'TauCZ_s', 'MHshell_base', 'MHshell_mid', 'MHshell_top', 'RHshell_base',
-		'RHShell_mid', 'RHshell_top', 'logP_phot', 'Mass_msun'),
-		col_starts=[0, 9, 17, 33, 50, 65, 81, 98, 113, 129, 141, 153, 165, 177, 189, 205, 
+		'RHShell_mid', 'RHshell_top', 'logP_phot', 'Mass_msun'] # .track column names
+TRACK_COL_STARTS = [0, 9, 17, 33, 50, 65, 81, 98, 113, 129, 141, 153, 165, 177, 189, 205, 
 		221, 237, 253, 269, 285, 301, 317, 333, 349, 365, 381, 397, 413, 429, 445, 
 		455, 465, 475, 485, 495, 505, 515, 525, 535, 545, 555, 565, 581, 597, 613, 
 		629, 645, 661, 677, 693, 709, 725, 741, 757, 773, 789, 805, 821, 837, 853,
 		869, 885, 901, 917, 933, 949, 965, 981, 997, 1013, 1029, 1045, 1061, 1077,
-		1094, 1109, 1125, 1141, 1157, 1173, 1189, 1205] )
-	track = track.to_pandas()
-	track = track.drop(0).reset_index(drop=True)
-	for k in track.columns:
+		1094, 1109, 1125, 1141, 1157, 1173, 1189, 1205]
+
+LAST_NAMES = ['SHELL','MASS','RADIUS','LUMINOSITY','PRESSURE','TEMPERATURE','DENSITY','OMEGA','C','H1',
+	         'He4','METALS','He3','C12','C13','N14','N15','O16','O17','O18','H2','Li6','Li7','Be9'] # .last column names
+LAST_COL_STARTS = [0,7,24,42,66,84,102,120,144,146,158,170,182,198,214,230,246,262,278,
+	        294,310,326,342,358]
+
+STORE_NAMES = ['SHELL','MASS','RADIUS','LUMINOSITY','PRESSURE','TEMPERATURE','DENSITY','OMEGA',
+	 'C','H1','He4','METALS','He3','C12','C13','N14','N15','O16','O17','O18','H2','Li6',
+	 'Li7','Be9','OPAC','GRAV','DELR','DEL','DELA','V_CONV','GAM1','HII','HEII','HEIII',
+	 'BETA','ETA','PPI','PPII','PPIII','CNO','3HE','E_NUC','E_NEU','E_GRAV','A','RP/RE',
+	 'FP','FT','J/M','MOMENT','DEL_KE','V_ES','V_GSF','V_SS','VTOT'] # .store column names
+
+# Fortran drops the 'E' when an exponent needs three digits (e.g. 1.0-100)
+FORTRAN_EXPONENT = re.compile(r'([0-9.])([+-]\d{3})$')
+
+
+def fortran_float(token):
+	''' Convert one Fortran-formatted number to float.
+		Exponent overflow tokens such as '1.0-100' are read as 1.0E-100,
+		anything else that cannot be read becomes NaN. '''
+	try:
+		return float(token)
+	except ValueError:
 		try:
-			track[k] = track[k].astype(float)
-		except: # errors arise once X_cen gets below 1e-99
-			track[k]  = 0 # but that's basically 0
-	return track
+			return float(FORTRAN_EXPONENT.sub(r'\1E\2', token.strip()))
+		except ValueError:
+			return np.nan
+
+
+def _tokens_to_float(tokens):
+	''' Convert a 2D array of string tokens to floats in one call.
+		If that fails, only the columns holding bad cells are converted value by value. '''
+	try:
+		return tokens.astype(float)
+	except ValueError:
+		values = np.empty(tokens.shape)
+		for k in range(tokens.shape[1]):
+			try:
+				values[:, k] = tokens[:, k].astype(float)
+			except ValueError:
+				values[:, k] = [fortran_float(tok) for tok in tokens[:, k]]
+		return values
+
+
+def _store_block_to_frame(rows, names, usecols=None):
+	''' Convert the shell rows of one stored model into a DataFrame.
+		Only the columns at positions usecols (default: all) are converted.
+		The 'C' column (convective flag, T/F) becomes a boolean column. '''
+	if usecols is None:
+		usecols = list(range(len(names)))
+	selected = [names[k] for k in usecols]
+	flag = names.index('C')
+	if not rows:
+		model = pd.DataFrame(np.empty((0, len(usecols))), columns=selected)
+		if 'C' in selected:
+			model['C'] = model['C'].astype(bool)
+		return model
+
+	try:
+		values = np.loadtxt(io.StringIO(''.join(rows)), ndmin=2, usecols=usecols,
+			converters={flag: lambda s: float(s.strip() in ('T', b'T'))})
+	except ValueError: # e.g. exponent overflow such as 1.0-100
+		tokens = np.array([line.split() for line in rows])
+		tokens[:, flag] = np.where(tokens[:, flag] == 'T', '1', '0')
+		values = _tokens_to_float(tokens[:, usecols])
+
+	model = pd.DataFrame(values, columns=selected)
+	if 'C' in selected:
+		model['C'] = model['C'] == 1
+	return model
+
+
+def _select_columns(names, columns, fname=''):
+	''' Positions of the requested column names (all columns if columns is None) '''
+	if columns is None:
+		return list(range(len(names)))
+	if isinstance(columns, str):
+		columns = [columns]
+	missing = [c for c in columns if c not in names]
+	if missing:
+		raise ValueError(f"Columns not found in {fname or 'file'}: {', '.join(missing)}")
+	return [names.index(c) for c in columns]
+
+def _line_matrix(raw, skip_rows):
+	''' Pack the data lines of a fixed-width file into an (nrows, width) uint8 matrix.
+
+		Blank lines and '#' comment lines are dropped, then the first skip_rows
+		lines. When every kept line has the same length (the usual case for
+		YREC output) the matrix is a zero-copy strided view of raw. '''
+	buf = np.frombuffer(raw, dtype=np.uint8)
+	newlines = np.flatnonzero(buf == 10)
+	starts = np.concatenate(([0], newlines + 1))
+	ends = np.concatenate((newlines, [len(buf)]))
+	if len(buf) and buf[-1] == 10:
+		starts, ends = starts[:-1], ends[:-1]
+	cr = (ends > starts) & (buf[np.maximum(ends - 1, 0)] == 13) if len(buf) else np.zeros(len(ends), bool)
+	ends = ends - cr
+
+	# first non-blank character of each line decides blank / comment;
+	# look at the first 16 bytes of every line at once, and only fall back
+	# to Python for lines that start with a longer run of blanks
+	head = starts[:, None] + np.arange(16)
+	in_line = head < ends[:, None]
+	head_chars = np.where(in_line, buf[np.minimum(head, len(buf) - 1)], 32) if len(buf) else np.full(head.shape, 32)
+	nonblank = (head_chars != 32) & (head_chars != 9)
+	found = nonblank.any(1)
+	first_char = head_chars[np.arange(len(starts)), nonblank.argmax(1)]
+	keep = found & (first_char != 35) # '#'
+	for i in np.flatnonzero(~found & (ends - starts > 16)):
+		stripped = raw[starts[i]:ends[i]].lstrip()
+		keep[i] = bool(stripped) and not stripped.startswith(b'#')
+	starts, ends = starts[keep][skip_rows:], ends[keep][skip_rows:]
+
+	nrows = len(starts)
+	lengths = ends - starts
+	width = int(lengths.max()) if nrows else 1
+	stride = starts[1] - starts[0] if nrows > 1 else width + 1
+	if nrows and (lengths == width).all() and (np.diff(starts) == stride).all() and stride > width:
+		return np.lib.stride_tricks.as_strided(buf[starts[0]:], shape=(nrows, width), strides=(stride, 1))
+	lines = [raw[i:j] for i, j in zip(starts, ends)]
+	chars = np.array(lines, dtype=f'S{width}').view(np.uint8).reshape(nrows, width).copy()
+	chars[chars == 0] = 32 # short lines are padded with blanks
+	return chars
+
+# Exact powers of ten 10^0 .. 10^22 (the largest exactly representable in float64)
+_POW10 = 10.0 ** np.arange(23)
+# Where long double has a 64-bit mantissa (x86), mantissas of 16-18 digits are
+# decoded in it too: m (< 2^63) and 10^0 .. 10^27 are exact there
+_EXTENDED = np.finfo(np.longdouble).nmant >= 63
+_POW10_LONG = np.array([10 ** k for k in range(28)], dtype=np.longdouble)
+
+# Reduces a row to its layout: digits -> '0', signs -> ' '
+_LAYOUT = bytes.maketrans(b'123456789+-eE', b'000000000  EE')
+
+@lru_cache(maxsize=None)
+def _e_format_layout(row):
+	''' Positions of '.', 'E', the mantissa digits, the exponent digits and the
+		blanks/signs in one E-format field (a row reduced with _LAYOUT), or None. '''
+	dot, e = row.find(b'.'), row.find(b'E')
+	if row.count(b'.') != 1 or row.count(b'E') != 1 or not 0 <= dot < e < len(row) - 1:
+		return None
+	digits = np.flatnonzero(np.frombuffer(row, dtype=np.uint8) == 48)
+	mant, expo = digits[digits < e], digits[digits > e]
+	if not len(mant) or not len(expo) or len(mant) > (18 if _EXTENDED else 15):
+		return None
+	other = np.flatnonzero(np.frombuffer(row, dtype=np.uint8) == 32)
+	if len(mant) + len(expo) + len(other) + 2 != len(row):
+		return None # some other character
+	return dot, e, mant, expo, other
+
+def _fixed_format_floats(chars):
+	''' Vectorized decoder for one column written with a single Fortran E format.
+
+		YREC writes each .track/.last column with one format, so '.', 'E' and
+		every digit sit at the same byte position in every row. The digits are
+		then combined with a single matrix product. The result is exact (and
+		identical to float()) for mantissas of <= 15 digits and decimal scale
+		|p| <= 22, and, with extended precision, for 16-18 digits and |p| <= 27;
+		other rows are left as NaN and flagged for the caller.
+
+		Returns (values, redo) with redo a boolean mask of rows to convert another
+		way, or None if the rows do not share one layout. '''
+	if len(chars) == 0:
+		return None
+	layout = _e_format_layout(chars[0].tobytes().translate(_LAYOUT))
+	if layout is None:
+		return None
+	dot, e, mant, expo, other = layout
+
+	# every row must have its digits, '.' and 'E' in the same places,
+	# and only blanks or signs anywhere else
+	mant_digits = chars[:, mant] - 48
+	expo_digits = chars[:, expo] - 48
+	signs = chars[:, other]
+	if not ((mant_digits < 10).all() and (expo_digits < 10).all()
+			and (chars[:, dot] == 46).all() and ((chars[:, e] | 32) == 101).all()
+			and ((signs == 32) | (signs == 43) | (signs == 45)).all()):
+		return None
+
+	# float64 operands keep the products on the BLAS path (uint8 @ float64 is a slow generic loop)
+	p = expo_digits.astype(np.float64) @ _POW10[len(expo) - 1::-1]
+	neg = signs == 45
+	p = (np.where(neg[:, other > e].any(1), -p, p) - np.count_nonzero(mant > dot)).astype(np.int64)
+	if len(mant) <= 15:
+		m = mant_digits.astype(np.float64) @ _POW10[len(mant) - 1::-1]
+		redo = np.abs(p) > 22
+		scale = _POW10[np.where(redo, 0, np.abs(p))]
+		values = np.where(p >= 0, m * scale, m / scale)
+	else:
+		m = (mant_digits.astype(np.int64) @ (10 ** np.arange(len(mant) - 1, -1, -1))).astype(np.longdouble)
+		redo = np.abs(p) > 27
+		scale = _POW10_LONG[np.where(redo, 0, np.abs(p))]
+		exact = np.where(p >= 0, m * scale, m / scale) # rounded once, to 64 bits
+		values = exact.astype(np.float64)
+		# rounding that again to 53 bits is the correctly rounded value unless it
+		# fell exactly halfway between two doubles (spacing/4 below a power of 2)
+		off = np.abs(exact - values)
+		half = np.spacing(values).astype(np.longdouble) / 2
+		redo |= (off == half) | (off == half / 2)
+	values = np.where(neg[:, other < e].any(1), -values, values)
+	values[redo] = np.nan
+	return values, redo
+
+def _fixed_format_ints(chars):
+	''' Vectorized decoder for a column of right-aligned unsigned integers (SHELL, Step).
+
+		Returns the values as float64, or None if any row holds anything but
+		leading blanks and digits (or more than 15 digits). '''
+	n, w = chars.shape
+	if n == 0 or w > 15 or not set(chars[0].tobytes()) <= set(b' 0123456789'):
+		return None # cheap rejection of float columns on the first row
+	digits = chars - 48
+	is_digit = digits < 10
+	# each row: blanks, then at least one digit up to the end of the column
+	if not (is_digit[:, -1].all() and ((chars == 32) | is_digit).all()
+			and (is_digit[:, 1:] >= is_digit[:, :-1]).all()):
+		return None
+	return np.where(is_digit, digits, 0).astype(np.float64) @ _POW10[w - 1::-1]
+
+def _cells_to_float(cells):
+	''' Convert an array of byte-string cells to float. A cell that fails is read
+		on its own with fortran_float, the rest of the column is unaffected. '''
+	try:
+		return cells.astype(float)
+	except ValueError: # e.g. X_cen below 1e-99 is written as 1.0-100
+		return np.array([fortran_float(cell.decode()) for cell in cells])
 
-def read_last_file(fname): 
+def _float_column(sub, fast):
+	''' Finish one column from its _fixed_format_floats result (None: not a single E format):
+		rows the fast decoder could not handle go through _cells_to_float. '''
+	width = sub.shape[1]
+	if fast is None:
+		return _cells_to_float(np.ascontiguousarray(sub).view(f'S{width}').ravel())
+	values, redo = fast
+	if redo.any():
+		values[redo] = _cells_to_float(np.ascontiguousarray(sub[redo]).view(f'S{width}').ravel())
+	return values
+
+def _fixed_width_columns(fname, names, col_starts, usecols, skip_rows=1, flag_columns=()):
+	''' Decode fixed-width columns straight from the file bytes.
+
+		Blank lines and '#' comment lines are dropped, then the first skip_rows
+		lines (e.g. the column-name row). Each requested column is sliced out of
+		the resulting byte matrix in bulk by its col_starts offsets and decoded
+		in one vectorized step (see _fixed_format_ints and
+		_fixed_format_floats). Columns that do not
+		follow a single E format go through NumPy's string-to-float cast, and a
+		cell that still fails is read on its own with fortran_float (so 1.0-100
+		becomes 1e-100 and garbage becomes NaN); the rest of its column is
+		unaffected. Columns named in flag_columns ('T'/'F') become bool.
+
+		Returns
+		-------
+		columns : dict of str -> np.ndarray
+			One array per requested column, in the order of usecols.
+	'''
+	with open(fname, 'rb') as f:
+		raw = f.read()
+	chars = _line_matrix(raw, skip_rows)
+	nrows, width = chars.shape
+
+	ends = list(col_starts[1:]) + [width]
+	columns = {}
+	for k in usecols:
+		start, end = min(col_starts[k], width), min(ends[k], width)
+		if end <= start: # column beyond the end of every line
+			columns[names[k]] = np.full(nrows, np.nan)
+			continue
+		sub = chars[:, start:end]
+		if names[k] in flag_columns:
+			columns[names[k]] = (sub == 84).any(1) # 'T'
+			continue
+		ints = _fixed_format_ints(sub)
+		if ints is not None:
+			columns[names[k]] = ints
+			continue
+		columns[names[k]] = _float_column(sub, _fixed_format_floats(sub))
+	return columns
+
+def read_track_table(fname, columns=None):
+	''' Read YREC .track output into a Pandas dataframe
+
+		Columns are sliced out by their fixed-width positions (TRACK_COL_STARTS)
+		and converted in bulk with NumPy; see benchmarks/bench_fixed_width.py.
+	
+		Parameters
+		---------
+		fname :  str
+			File that you want to read. Should be a .track file output from YREC
+		columns : list of str (default = None)
+			Names of the columns to read (see TRACK_NAMES). If None, all columns are read.
+	
+		Returns
+		-------
+		track : pandas DataFrame
+			Table of the parameters of a star's evolution at all timesteps of the YREC run
+	'''
+	usecols = _select_columns(TRACK_NAMES, columns, fname)
+	# skip_rows=1 drops the column-name row
+	return pd.DataFrame(_fixed_width_columns(fname, TRACK_NAMES, TRACK_COL_STARTS, usecols, skip_rows=1), copy=False)
+
+def read_last_file(fname, columns=None): 
 	''' Read YREC .last output into a Pandas dataframe.
 	
 		Parameters
 		---------
 		fname :  str
 			File that you want to read. Should be a .track file output from YREC
+		columns : list of str (default = None)
+			Names of the columns to read (see LAST_NAMES). If None, all columns are read.
 	
 		Returns
 		-------
 		last : pandas DataFrame
 			The parameters of a star's structure in the final timestep of the YREC run
 	'''
-	names = ['SHELL','MASS','RADIUS','LUMINOSITY','PRESSURE','TEMPERATURE','DENSITY','OMEGA','C','H1',
-	         'He4','METALS','He3','C12','C13','N14','N15','O16','O17','O18','H2','Li6','Li7','Be9']
-	cols = [0,7,24,42,66,84,102,120,144,146,158,170,182,198,214,230,246,262,278,
-	        294,310,326,342,358]
-	last = ascii.read(fname, format="fixed_width_no_header", data_start=6,
-		names=names, col_starts=cols )
-	last = last.to_pandas()
-	last = last.drop(0).reset_index(drop=True)
-	for k in last.columns:
-		try:
-			last[k] = last[k].astype(float)
-		except:
-			last[k] = [shell == "T" for shell in last[k]]
+	usecols = _select_columns(LAST_NAMES, columns, fname)
+	# 6 header lines, then the column-name row
+	return pd.DataFrame(_fixed_width_columns(fname, LAST_NAMES, LAST_COL_STARTS, usecols,
+		skip_rows=7, flag_columns=('C',)), copy=False)
+
+# dtype of each .last column in read_last_array: SHELL is an integer, C (convective) a 1-byte bool
+LAST_DTYPES = {'SHELL': np.int32, 'C': np.bool_}
+
+def _last_dtype(names, model_field=False):
+	fields = [('MODEL', np.int32)] if model_field else []
+	return np.dtype(fields + [(name, LAST_DTYPES.get(name, np.float64)) for name in names])
+
+def read_last_array(fname, columns=None):
+	''' Read YREC .last output into a NumPy structured array.
+
+		Same decoding as read_last_file(), without the DataFrame: each column is
+		written straight into one field of a record array. SHELL is int32 and the
+		convective flag C is a 1-byte bool.
+
+		Parameters
+		---------
+		fname :  str
+			File that you want to read. Should be a .last file output from YREC
+		columns : list of str (default = None)
+			Names of the columns to read (see LAST_NAMES). If None, all columns are read.
+
+		Returns
+		-------
+		last : np.ndarray (structured)
+			One record per shell, e.g. last['TEMPERATURE'], last['C']
+	'''
+	usecols = _select_columns(LAST_NAMES, columns, fname)
+	names = [LAST_NAMES[k] for k in usecols]
+	decoded = _fixed_width_columns(fname, LAST_NAMES, LAST_COL_STARTS, usecols, skip_rows=7, flag_columns=('C',))
+	last = np.empty(len(decoded[names[0]]) if names else 0, dtype=_last_dtype(names))
+	for name in names:
+		values = decoded[name]
+		if name == 'SHELL':
+			values = np.where(np.isfinite(values), values, -1) # unreadable shell numbers become -1
+		last[name] = values
 	return last
 
-def read_store_file(fname): 
+def read_last_dir(dirname, pattern='*.last', recursive=False, columns=None):
+	''' Read every .last file in a directory into one stacked structured array.
+
+		Parameters
+		---------
+		dirname : str
+			Directory containing the .last files
+		pattern : str (default = '*.last')
+			Glob pattern of the files to read
+		recursive : bool (default = False)
+			If True, also search subdirectories
+		columns : list of str (default = None)
+			Names of the columns to read (see LAST_NAMES). If None, all columns are read.
+
+		Returns
+		-------
+		lasts : np.ndarray (structured)
+			The shells of every model, file after file. The extra MODEL field is the
+			row of the model in index, so lasts[lasts['MODEL'] == k] is model k.
+		index : pandas DataFrame
+			One row per model: file, start, stop (lasts[start:stop] is that model).
+			Files sorted by name; unreadable files are reported and skipped.
+	'''
+	pattern = os.path.join(dirname, '**', pattern) if recursive else os.path.join(dirname, pattern)
+	usecols = _select_columns(LAST_NAMES, columns, dirname)
+	names = [LAST_NAMES[k] for k in usecols]
+
+	models, files = [], []
+	for path in sorted(glob(pattern, recursive=recursive)):
+		try:
+			models.append(read_last_array(path, names))
+		except Exception as e:
+			print(f'Failed to read {os.path.basename(path)}: {e}')
+			continue
+		files.append(os.path.relpath(path, dirname))
+
+	sizes = np.array([len(m) for m in models], dtype=np.int64)
+	stops = np.cumsum(sizes)
+	lasts = np.empty(int(stops[-1]) if len(stops) else 0, dtype=_last_dtype(names, model_field=True))
+	for k, (model, start, stop) in enumerate(zip(models, stops - sizes, stops)):
+		lasts['MODEL'][start:stop] = k
+		for name in names:
+			lasts[name][start:stop] = model[name]
+	index = pd.DataFrame({'file': files, 'start': stops - sizes, 'stop': stops})
+	return lasts, index
+
+def read_store_file(fname, columns=None): 
 	''' Returns a list of dataframes, one for each model stored in .store
+
+	    Each model's shell rows are collected into one buffer and converted
+	    to a float array in a single call. Fortran exponent overflow tokens
+	    (e.g. 1.0-100) are read value by value rather than zeroing the column.
 	
 	    Parameters
 		---------
 		fname :  str
 			File that you want to read. Should be a .store file output from YREC
+		columns : list of str (default = None)
+			Names of the columns to read (see STORE_NAMES). If None, all columns are read.
 	
 		Returns
 		-------
@@ -96,45 +472,407 @@ def read_store_file(fname):
             Ages (in Gyr) corresponding to each model in the models list.
 	
 	'''
+	usecols = _select_columns(STORE_NAMES, columns, fname)
 	model_nums = [] # this isn't currently used for anything. 
 	model_ages = [] # Gyr
-	models = [] # list of dataframes
-	names =['SHELL','MASS','RADIUS','LUMINOSITY','PRESSURE','TEMPERATURE','DENSITY','OMEGA',
-	 'C','H1','He4','METALS','He3','C12','C13','N14','N15','O16','O17','O18','H2','Li6',
-	 'Li7','Be9','OPAC','GRAV','DELR','DEL','DELA','V_CONV','GAM1','HII','HEII','HEIII',
-	 'BETA','ETA','PPI','PPII','PPIII','CNO','3HE','E_NUC','E_NEU','E_GRAV','A','RP/RE',
-	 'FP','FT','J/M','MOMENT','DEL_KE','V_ES','V_GSF','V_SS','VTOT'] # dataframe column names
-	
-	file = open(fname, "r")
-	i = -1
-	flag = False # True while on a line that goes into the current dataframe
-	for line in file:
-		line = line.strip()
-		if line[:4] == 'MOD2':
-			model_nums.append(int(line.split()[1])) # get the model number
-			model_ages.append(float(line[87:102])) # get the age (Gyr)
-			flag = False
-			continue
-		if line[:5] == 'SHELL':
-			i +=1
-			flag = True
-			models.append(pd.DataFrame(columns=names))
-			continue
-		if i > -1 and line.strip() != '' and flag:
-			# print(line.split())
-			models[i].loc[len(models[i])] = line.split()
-		
-	file.close()
-
-	# processing to turn things into floats
-	for model in models:
-		for k in model.columns:
-			if k == 'C':
-				model[k] = [shell == "T" for shell in model[k]]
-			else:
-				try: 
-					model[k] = model[k].astype(float)
-				except: # cannot read numbers less than 1e-99
-					model[k] = 0 # but that's basically 0 anyway
+	blocks = [] # shell rows (raw lines) of each model
 	
+	with open(fname, "r") as file:
+		rows = None # the block currently being filled, None between MOD2 and SHELL
+		for line in file:
+			stripped = line.strip()
+			if stripped[:4] == 'MOD2':
+				model_nums.append(int(stripped.split()[1])) # get the model number
+				model_ages.append(float(stripped[87:102])) # get the age (Gyr)
+				rows = None
+				continue
+			if stripped[:5] == 'SHELL':
+				rows = []
+				blocks.append(rows)
+				continue
+			if rows is not None and stripped != '':
+				rows.append(line)
+
+	models = [_store_block_to_frame(rows, STORE_NAMES, usecols) for rows in blocks]
 	return models, np.array(model_ages)
+
+
+class IndexedOutputFile(Sequence):
+	''' Base class of the lazy, random-access readers of YREC model files
+		(.store, .pmod, .penv, .atm, .full, .short, .excomp).
+
+		The file is memory-mapped and scanned once for the byte range of each
+		model. The index (model number, age and byte range of each model) is
+		saved in a sidecar file, <fname>.idx.npz, which is reused as long as the
+		file's size and mtime, and the way it was segmented, are unchanged.
+		Models are then parsed only when accessed.
+
+		Behaves like a read-only list of DataFrames: len(), indexing, slicing
+		(which returns another lazy reader) and iteration all work without
+		loading every model.
+
+		Subclasses implement _build_index() (returning the arrays named in
+		INDEX_KEYS) and _parse_block(k, block) (the bytes of model k to a
+		DataFrame), and set INDEX_TAG to something that changes whenever the
+		segmentation does.
+	'''
+
+	INDEX_KEYS = ('model_nums', 'ages', 'starts', 'ends')
+	INDEX_TAG = ''
+
+	def __init__(self, fname, sidecar=True):
+		self.fname = fname
+		self.sidecar = sidecar
+		self._file = open(fname, 'rb')
+		size = os.fstat(self._file.fileno()).st_size
+		self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+		index = self._load_index() if sidecar else None
+		if index is None:
+			index = self._build_index()
+			if sidecar:
+				self._save_index(index)
+		for key in self.INDEX_KEYS:
+			setattr(self, self._index_attr(key), index[key])
+
+	# --- index -------------------------------------------------------------
+
+	@property
+	def index_path(self):
+		return self.fname + '.idx.npz'
+
+	@staticmethod
+	def _index_attr(key):
+		''' Attribute holding an index array: byte offsets are private, model_nums and ages public '''
+		return '_' + key if key in ('heads', 'starts', 'ends') else key
+
+	def _index_tag(self):
+		return type(self).__name__ + ':' + self.INDEX_TAG
+
+	def _stamp(self):
+		st = os.stat(self.fname)
+		return st.st_size, st.st_mtime_ns
+
+	def _build_index(self):
+		raise NotImplementedError
+
+	def _load_index(self):
+		try:
+			with np.load(self.index_path, allow_pickle=False) as npz:
+				if tuple(npz['stamp']) != self._stamp() or str(npz['tag']) != self._index_tag():
+					return None # file (or segmentation) changed since the index was built
+				return {k: npz[k] for k in self.INDEX_KEYS}
+		except (OSError, KeyError, ValueError):
+			return None
+
+	def _save_index(self, index):
+		stamp = np.array(self._stamp(), dtype=np.int64)
+		try:
+			atomic_write(self.index_path, lambda f: np.savez(f, stamp=stamp, tag=np.array(self._index_tag()), **index))
+		except OSError as e: # e.g. read-only directory; the index is just rebuilt next time
+			print(f"Could not save index for {os.path.basename(self.fname)}: {e}")
+
+	# --- access ------------------------------------------------------------
+
+	def _parse_block(self, k, block):
+		raise NotImplementedError
+
+	def model(self, k):
+		''' Parse and return model k (0-based position in the file) as a DataFrame '''
+		if k < 0:
+			k += len(self)
+		if not 0 <= k < len(self):
+			raise IndexError(f'model index {k} out of range for {len(self)} models')
+		return self._parse_block(k, self._mm[self._starts[k]:self._ends[k]])
+
+	def nearest_index(self, age):
+		''' Position of the model whose age (Gyr) is closest to age '''
+		if not len(self):
+			raise IndexError('no models in file')
+		if np.isnan(self.ages).all():
+			raise ValueError(f'no model ages in {os.path.basename(self.fname)}')
+		return int(np.nanargmin(np.abs(self.ages - age)))
+
+	def nearest_age(self, age):
+		''' Parse and return the model whose age (Gyr) is closest to age '''
+		return self.model(self.nearest_index(age))
+
+	def __len__(self):
+		return len(self._starts)
+
+	def __getitem__(self, k):
+		if isinstance(k, slice):
+			view = object.__new__(type(self))
+			view.__dict__.update(self.__dict__)
+			for key in self.INDEX_KEYS:
+				attr = self._index_attr(key)
+				setattr(view, attr, getattr(self, attr)[k])
+			return view
+		return self.model(k)
+
+	def __iter__(self):
+		for k in range(len(self)):
+			yield self.model(k)
+
+	def close(self):
+		''' Release the memory map. Slices of this reader become unusable too. '''
+		if isinstance(self._mm, mmap.mmap):
+			self._mm.close()
+		self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def __repr__(self):
+		return f'{type(self).__name__}({self.fname!r}, {len(self)} models)'
+
+
+class StoreFile(IndexedOutputFile):
+	''' Lazy, random-access reader for a YREC .store file.
+
+		Models are located by their MOD2/SHELL header lines; see
+		IndexedOutputFile for the index and the list-like interface.
+
+		Parameters
+		---------
+		fname : str
+			File that you want to read. Should be a .store file output from YREC
+		sidecar : bool (default = True)
+			If True, read/write the index in <fname>.idx.npz
+		columns : list of str (default = None)
+			Names of the columns to parse for each model (see STORE_NAMES). If None, all columns.
+
+		Example
+		-------
+		with StoreFile('m100fehp000_base.store') as store:
+			print(len(store), store.ages[:5])
+			model = store.nearest_age(4.568) # DataFrame of the model closest to 4.568 Gyr
+			last_ten = store[-10:] # still lazy
+	'''
+
+	HEADERS = (b'MOD2', b'SHELL')
+	INDEX_TAG = 'MOD2/SHELL'
+
+	def __init__(self, fname, sidecar=True, columns=None):
+		self._usecols = _select_columns(STORE_NAMES, columns, fname)
+		super().__init__(fname, sidecar)
+
+	def _find_headers(self):
+		''' Offsets of all MOD2/SHELL lines as sorted (line_start, keyword) pairs.
+			Uses mmap.find, which is much faster than a line-anchored regex on GB files. '''
+		mm = self._mm
+		found = []
+		for keyword in self.HEADERS:
+			pos = mm.find(keyword)
+			while pos >= 0:
+				line_start = mm.rfind(b'\n', 0, pos) + 1
+				if not mm[line_start:pos].strip(): # keyword starts the line
+					found.append((line_start, keyword))
+				pos = mm.find(keyword, pos + len(keyword))
+		return sorted(found)
+
+	def _build_index(self):
+		''' Scan the mapped file once for MOD2/SHELL lines '''
+		mm = self._mm
+		model_nums, ages, starts, ends = [], [], [], []
+		num, age = -1, np.nan # from the most recent MOD2 line
+		for line_start, keyword in self._find_headers():
+			line_end = mm.find(b'\n', line_start)
+			line_end = len(mm) if line_end < 0 else line_end
+			if starts and ends[-1] < 0:
+				ends[-1] = line_start # the previous model stops at this header
+			if keyword == b'MOD2':
+				stripped = mm[line_start:line_end].decode().strip()
+				num = int(stripped.split()[1])
+				age = float(stripped[87:102])
+			else:
+				model_nums.append(num)
+				ages.append(age)
+				starts.append(line_end + 1)
+				ends.append(-1)
+		if starts and ends[-1] < 0:
+			ends[-1] = len(mm)
+		return {'model_nums': np.array(model_nums, dtype=np.int64),
+			'ages': np.array(ages, dtype=float),
+			'starts': np.array(starts, dtype=np.int64),
+			'ends': np.array(ends, dtype=np.int64)}
+
+	def _parse_block(self, k, block):
+		rows = [line for line in block.decode().splitlines(keepends=True) if line.strip()]
+		return _store_block_to_frame(rows, STORE_NAMES, self._usecols)
+
+
+# Bytes that can start a line of numbers (digits, sign, decimal point)
+NUMERIC_START = np.zeros(256, dtype=bool)
+NUMERIC_START[np.frombuffer(b'0123456789+-.', dtype=np.uint8)] = True
+SCAN_CHUNK = 1 << 26 # bytes of the file classified at once when indexing
+
+def _classify_lines(mm, chunk=SCAN_CHUNK):
+	''' Classify every line of a mapped file, chunk by chunk.
+
+		Yields (line_starts, kinds) per chunk, where kinds is 1 for a line of
+		numbers, 2 for any other text and 0 for a blank line. Only the first
+		non-blank byte of each line is looked at, so a GB file is classified
+		in a few vectorized passes. '''
+	pos, size = 0, len(mm)
+	while pos < size:
+		stop = size
+		if pos + chunk < size: # end the chunk after its last newline
+			cut = mm.rfind(b'\n', pos, pos + chunk)
+			if cut < 0: # a line longer than the chunk
+				cut = mm.find(b'\n', pos + chunk)
+			stop = size if cut < 0 else cut + 1
+		buf = np.frombuffer(mm, dtype=np.uint8, count=stop - pos, offset=pos)
+		newlines = np.flatnonzero(buf == 10)
+		starts = np.concatenate([[0], newlines + 1])
+		ends = np.concatenate([newlines, [len(buf)]])
+		keep = starts < len(buf)
+		starts, ends = starts[keep], ends[keep]
+
+		# The first non-blank byte of a line is the first word start at or after the line start
+		printable = buf > 32
+		word_start = printable.copy()
+		word_start[1:] &= ~printable[:-1]
+		words = np.append(np.flatnonzero(word_start), len(buf) - 1) # sentinel: at least one position
+		first = words[np.searchsorted(words, starts)]
+		filled = (first < ends) & (buf[first] > 32)
+		kinds = np.where(filled, np.where(NUMERIC_START[buf[first]], 1, 2), 0)
+		yield starts + pos, kinds
+		pos = stop
+
+
+# Model number and age (Gyr) in the header of a model, e.g. 'MODEL 2 AGE 0.500' or 'MODEL NO. 2, AGE(GYR) = 5.0D-01'
+HEADER_MODEL_NUMBER = re.compile(r'\bMODEL\b(?:\s*(?:NO\.?|NUMBER|#))?\s*[=:]?\s*(\d+)', re.I)
+HEADER_MODEL_AGE = re.compile(r'\bAGE\b(?:\s*\(GYR\))?\s*[=:]?\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[EeDd]?[-+]\d+)?)', re.I)
+
+def _table_names(header, ncols):
+	''' Column names of a model block: the last header line if it has one word per column, else col1..colN '''
+	for line in reversed(header.splitlines()):
+		words = line.split()
+		if words:
+			if len(words) == ncols:
+				return words
+			break
+	return [f'col{k + 1}' for k in range(ncols)]
+
+
+class ModelProfileFile(IndexedOutputFile):
+	''' Lazy, random-access reader for the YREC model files with no fixed
+		reader of their own: .pmod, .penv, .atm, .full, .short and .excomp
+		(the FPMOD, FPENV, FPATM, FMODPT, FSHORT and FSCOMP outputs).
+
+		These are read as a sequence of models, each made of one or more lines
+		of text (the header) followed by a table of numbers. A model starts at
+		every line matching model_start (by default MODEL_START, a line
+		beginning with MODEL). In a file with no such line the segmentation is
+		heuristic: a model starts at every text line that follows a line of
+		numbers.
+
+		The model number and age (Gyr) of each model are read from its header
+		with the MODEL_NUMBER and MODEL_AGE regexes (the values after the MODEL
+		and AGE labels, as in 'MODEL 2 AGE 0.500'); models whose header has
+		neither get -1 and NaN.
+
+		Text lines inside a table (e.g. the section labels of .full printouts)
+		are skipped. Numbers are read with fortran_float's rules (1.0-100 is
+		1e-100, anything unreadable is NaN). Columns are named after the last
+		header line if it has one word per column, else col1..colN.
+
+		Parameters
+		---------
+		fname : str
+			File that you want to read
+		sidecar : bool (default = True)
+			If True, read/write the index in <fname>.idx.npz
+		model_start : bytes (default = None)
+			Regex matching the first line of every model. If None, MODEL_START.
+
+		Example
+		-------
+		with open_output_file('m100fehp000_base.pmod') as pmod: # a ModelProfileFile
+			print(len(pmod), pmod.model_nums[:5], pmod.ages[:5])
+			profile = pmod.nearest_age(4.568) # DataFrame of the model closest to 4.568 Gyr
+			print(pmod.header(-1))
+	'''
+
+	INDEX_KEYS = ('model_nums', 'ages', 'heads', 'starts', 'ends')
+	MODEL_START = rb'^ *MODEL\b'
+	MODEL_NUMBER = HEADER_MODEL_NUMBER
+	MODEL_AGE = HEADER_MODEL_AGE
+
+	def __init__(self, fname, sidecar=True, model_start=None):
+		self.model_start = self.MODEL_START if model_start is None else model_start
+		super().__init__(fname, sidecar)
+
+	def _index_tag(self):
+		return super()._index_tag() + repr((self.model_start, self.MODEL_NUMBER.pattern, self.MODEL_AGE.pattern))
+
+	def _header_info(self, header):
+		''' (model number, age in Gyr) from the header text of a model; -1 and NaN when absent '''
+		num = self.MODEL_NUMBER.search(header)
+		age = self.MODEL_AGE.search(header)
+		return (int(num.group(1)) if num else -1,
+			fortran_float(age.group(1).replace('D', 'E').replace('d', 'e')) if age else np.nan)
+
+	def _build_index(self):
+		''' Scan the mapped file once for the header and table of each model '''
+		mm = self._mm
+		heads, tables = [], []
+		previous = 0 # kind of the last non-blank line of the previous chunk
+		for starts, kinds in _classify_lines(mm):
+			starts, kinds = starts[kinds > 0], kinds[kinds > 0]
+			before = np.concatenate([[previous], kinds[:-1]])
+			heads.append(starts[((kinds == 2) & (before != 2)) | ((kinds == 1) & (before == 0))])
+			tables.append(starts[(kinds == 1) & (before != 1)])
+			if len(kinds):
+				previous = kinds[-1]
+		heads = np.concatenate(heads).astype(np.int64) if heads else np.zeros(0, dtype=np.int64)
+		tables = np.concatenate(tables).astype(np.int64) if tables else np.zeros(0, dtype=np.int64)
+		if self.model_start is not None:
+			found = [m.start() for m in re.finditer(self.model_start, mm, re.M)]
+			if found or not len(mm):
+				heads = np.array(found, dtype=np.int64)
+			elif self.model_start != self.MODEL_START: # only a pattern passed by the caller is worth a warning
+				print(f"⚠️ No line of {os.path.basename(self.fname)} matches {self.model_start!r}; "
+					"models are split at each header instead.")
+
+		ends = np.append(heads[1:], len(mm)).astype(np.int64)
+		at = np.searchsorted(tables, heads)
+		starts = np.where(at < len(tables), tables[np.minimum(at, len(tables) - 1)], len(mm)) if len(tables) \
+			else ends.copy()
+		starts = np.minimum(starts, ends) # a model with no numbers is empty
+
+		info = [self._header_info(mm[h:s].decode(errors='replace')) for h, s in zip(heads, starts)]
+		return {'model_nums': np.array([num for num, _ in info], dtype=np.int64),
+			'ages': np.array([age for _, age in info], dtype=float),
+			'heads': heads, 'starts': starts, 'ends': ends}
+
+	def header(self, k):
+		''' Header text (the lines before the table) of model k '''
+		return self._mm[self._heads[k]:self._starts[k]].decode(errors='replace')
+
+	def _parse_block(self, k, block):
+		rows = [line.split() for line in block.splitlines()]
+		rows = [row for row in rows if row and NUMERIC_START[row[0][0]]] # drop blank and text lines
+		ncols = max((len(row) for row in rows), default=0)
+		if any(len(row) != ncols for row in rows): # ragged table: pad short rows
+			rows = [row + [b'nan'] * (ncols - len(row)) for row in rows]
+		tokens = np.array(rows, dtype=bytes).reshape(len(rows), ncols)
+		values = _tokens_to_float(tokens.astype(str))
+		return pd.DataFrame(values, columns=_table_names(self.header(k), ncols))
+
+
+# Lazy reader of each YREC model file, by extension
+OUTPUT_READERS = {'.store': StoreFile, '.pmod': ModelProfileFile, '.penv': ModelProfileFile,
+	'.atm': ModelProfileFile, '.full': ModelProfileFile, '.short': ModelProfileFile, '.excomp': ModelProfileFile}
+
+def open_output_file(fname, **kwargs):
+	''' Open a YREC model file with the lazy reader for its extension (see OUTPUT_READERS).
+		Keyword arguments are passed to the reader, e.g. columns= for .store, model_start= for the others. '''
+	ext = os.path.splitext(fname)[1]
+	if ext not in OUTPUT_READERS:
+		raise ValueError(f"No reader for '{ext}' files (known: {', '.join(OUTPUT_READERS)})")
+	return OUTPUT_READERS[ext](fname, **kwargs)
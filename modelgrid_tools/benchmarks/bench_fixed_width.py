@@ -0,0 +1,83 @@
+"""
+bench_fixed_width.py
+
+Times the NumPy fixed-width decoder behind read_track_table()/read_last_file()
+against the previous astropy.io.ascii implementation (needs astropy installed),
+and read_last_array() (structured array, no DataFrame) against read_last_file().
+
+Usage:
+    python bench_fixed_width.py [nrows] [repeats]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from astropy.io import ascii
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'alternate_tools'))
+from read_output_files import (read_track_table, read_last_file, read_last_array,  # noqa: E402
+                               TRACK_NAMES, TRACK_COL_STARTS, LAST_NAMES, LAST_COL_STARTS)
+from synthetic import write_track, write_last  # noqa: E402
+
+
+def read_track_table_astropy(fname):
+    """The original read_track_table()."""
+    track = ascii.read(fname, format="fixed_width_no_header", names=TRACK_NAMES, col_starts=TRACK_COL_STARTS)
+    track = track.to_pandas()
+    track = track.drop(0).reset_index(drop=True)
+    for k in track.columns:
+        try:
+            track[k] = track[k].astype(float)
+        except Exception:
+            track[k] = 0
+    return track
+
+
+def read_last_file_astropy(fname):
+    """The original read_last_file()."""
+    last = ascii.read(fname, format="fixed_width_no_header", data_start=6, names=LAST_NAMES,
+                      col_starts=LAST_COL_STARTS)
+    last = last.to_pandas()
+    last = last.drop(0).reset_index(drop=True)
+    for k in last.columns:
+        try:
+            last[k] = last[k].astype(float)
+        except Exception:
+            last[k] = [shell == "T" for shell in last[k]]
+    return last
+
+
+def best_time(func, path, repeats):
+    """Best CPU time of func(path): steadier than wall time on a shared node (the file is in the page cache)."""
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.process_time()
+        func(path)
+        best = min(best, time.process_time() - t0)
+    return best
+
+
+def compare(label, old, new, path, repeats):
+    pd.testing.assert_frame_equal(old(path), new(path), check_exact=True)
+    t_old = best_time(old, path, repeats)
+    t_new = best_time(new, path, repeats)
+    print(f'{label:6s} astropy {t_old * 1e3:8.1f} ms | numpy {t_new * 1e3:7.1f} ms | speedup {t_old / t_new:6.1f}x')
+
+
+def main(nrows=5000, repeats=10):
+    with tempfile.TemporaryDirectory() as tmp:
+        track = write_track(os.path.join(tmp, 'm100fehp000_bench.track'), nrows=nrows)
+        last = write_last(os.path.join(tmp, 'm100fehp000_bench.last'), nshells=nrows)
+        print(f'{nrows} rows ({os.path.getsize(track) / 1e6:.1f} MB .track)')
+        compare('.track', read_track_table_astropy, read_track_table, track, repeats)
+        compare('.last', read_last_file_astropy, read_last_file, last, repeats)
+        t_df = best_time(read_last_file, last, repeats)
+        t_arr = best_time(read_last_array, last, repeats)
+        print(f'.last  DataFrame {t_df * 1e3:6.1f} ms | structured array {t_arr * 1e3:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
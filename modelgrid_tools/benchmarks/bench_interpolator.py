@@ -0,0 +1,60 @@
+"""
+bench_interpolator.py
+
+Measures the throughput (stars/s) of GridInterpolator on a synthetic
+mass-[Fe/H] grid, for the bisection search and for the EEP scan used when
+log g is not monotonic along the tracks.
+
+Usage:
+    python bench_interpolator.py [n_stars] [chunk_size]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main_tools'))
+from eep import build_eeps  # noqa: E402
+from grid_interpolator import GridInterpolator  # noqa: E402
+from synthetic import track_values, TRACK_NAMES  # noqa: E402
+
+
+def synthetic_grid(masses=np.round(np.arange(0.7, 1.51, 0.05), 2), fehs=(-0.5, -0.25, 0.0, 0.25), nrows=2000):
+    """(DataFrame, file name) pairs named like make_MFeHgrid output."""
+    tracks = []
+    for feh in fehs:
+        for k, mass in enumerate(masses):
+            values = track_values(nrows + 10 * k, mass=mass, seed=k)
+            values[:, 2] *= 1 + 0.1 * feh
+            feh_str = ('p' if feh > 0 else 'm') + f'{int(round(abs(feh) * 100)):03d}'
+            tracks.append((pd.DataFrame(values, columns=TRACK_NAMES),
+                           f'm{int(round(mass * 100)):03d}feh{feh_str}_bench.track'))
+    return tracks
+
+
+def main(n_stars=1_000_000, chunk_size=5000):
+    t0 = time.perf_counter()
+    eeps = build_eeps(synthetic_grid())
+    interp = GridInterpolator(eeps)
+    print(f'{interp}, built in {time.perf_counter() - t0:.2f} s')
+
+    rng = np.random.default_rng(1)
+    mass = rng.uniform(0.7, 1.5, n_stars)
+    feh = rng.uniform(-0.5, 0.25, n_stars)
+    logg = rng.uniform(4.3, 4.5, n_stars)
+
+    results = {}
+    for label, monotonic in (('bisection', True), ('EEP scan', False)):
+        interp.monotonic = monotonic
+        t0 = time.perf_counter()
+        results[label] = interp(mass, feh, logg, columns=['Age_gyr', 'LogL_lsun'], chunk_size=chunk_size)
+        dt = time.perf_counter() - t0
+        print(f'{label:10s}: {n_stars / dt:10.0f} stars/s ({results[label]["Age_gyr"].notna().mean():.1%} on the grid)')
+    pd.testing.assert_frame_equal(results['bisection'], results['EEP scan'], check_exact=False, rtol=1e-12)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
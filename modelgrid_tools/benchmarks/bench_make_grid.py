@@ -0,0 +1,63 @@
+"""
+bench_make_grid.py
+
+Times make_MFeHgrid() on a synthetic base namelist pair and YREC input tree,
+against the per-cell path it replaced (update_namelists() re-reading the base
+namelists from disk for every cell, timed on a sample of cells), and a second
+run of the same grid, where every file is unchanged and skipped.
+
+Usage:
+    python bench_make_grid.py [n_masses] [n_fehs]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main_tools'))
+import make_modelgrid  # noqa: E402
+from make_modelgrid import make_MFeHgrid  # noqa: E402
+from update_nml import update_namelists  # noqa: E402
+from synthetic import write_base_namelists, write_input_tree  # noqa: E402
+
+
+def main(n_masses=250, n_fehs=40):
+    masses = np.round(0.30 + 0.01 * np.arange(n_masses), 2)
+    fehs = np.round(-1.0 + 0.05 * np.arange(n_fehs), 2)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # make_MFeHgrid parses the starting-model names on 'z', so the paths are kept relative
+        os.chdir(tmp)
+        try:
+            os.makedirs('grid')
+            write_base_namelists('grid', 'base')
+            write_input_tree('input', make_modelgrid.mass_stringoptions, make_modelgrid.Z_stringoptions)
+
+            t0 = time.perf_counter()
+            names = make_MFeHgrid(masses, fehs, 'base', 'grid', 'output', 'input')
+            dt = time.perf_counter() - t0
+            n_cells = n_masses * n_fehs
+            print(f'{n_cells} cells: {dt:.2f} s ({n_cells / dt:.0f} cells/s, {2 * n_cells} files)')
+            t0 = time.perf_counter()
+            make_MFeHgrid(masses, fehs, 'base', 'grid', 'output', 'input', skip_unchanged=True)
+            print(f'same grid again (unchanged files skipped): {time.perf_counter() - t0:.2f} s')
+
+            # Per-cell baseline: read, update and write both base namelists for each cell
+            sample = min(200, n_cells)
+            updates = {'RSCLM(1)': '1.0', 'ZOPAL951': '0.0170', 'FATM': '"input/atmos/x.tab"'}
+            t0 = time.perf_counter()
+            for k in range(sample):
+                update_namelists('grid/base.nml1', 'grid/base.nml2', f'grid/sample{k}', updates, verbose=False)
+            per_cell = (time.perf_counter() - t0) / sample
+            print(f'per-cell re-read: {per_cell * 1e3:.2f} ms/cell ({per_cell * n_cells:.1f} s for the grid, '
+                  f'without the per-cell NUMRUN parse and models/dbl glob)')
+            assert os.path.exists(names[-1][-1] + '.nml2')
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,65 @@
+"""
+bench_tracker.py
+
+Times the single-pass tracker() against the previous two-pass implementation
+(readlines() to find '#Version', then pandas read_csv with a regex separator).
+Most of the time of both is float parsing, so the gain is modest (about
+1.2-1.5x here); tests/test_tracker.py checks that the results agree.
+
+Usage:
+    python bench_tracker.py [nrows] [repeats]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'main_tools'))
+from Tracker import tracker  # noqa: E402
+from synthetic import write_track  # noqa: E402
+
+
+def tracker_two_pass(filepath):
+    """The original tracker(): read every line, then let pandas re-read the file."""
+    start = []
+    with open(filepath, 'r') as fp:
+        lines = fp.readlines()
+        for idx, row in enumerate(lines):
+            if '#Version' in row:
+                start.append(idx)
+    return pd.read_csv(filepath, header='infer', skiprows=start[-1] + 1,
+                       sep=r'\s+', float_precision='legacy')
+
+
+def best_time(func, path, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(nrows=5000, repeats=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_track(os.path.join(tmp, 'm100fehp000_bench.track'), nrows=nrows)
+        size_mb = os.path.getsize(path) / 1e6
+
+        old = tracker_two_pass(path)
+        new = tracker(path)
+        pd.testing.assert_frame_equal(old, new, check_exact=False, rtol=1e-12)
+
+        t_old = best_time(tracker_two_pass, path, repeats)
+        t_new = best_time(tracker, path, repeats)
+
+    print(f'{nrows} rows, {size_mb:.1f} MB')
+    print(f'two-pass tracker : {t_old * 1e3:8.1f} ms')
+    print(f'single-pass      : {t_new * 1e3:8.1f} ms')
+    print(f'speedup          : {t_old / t_new:8.2f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
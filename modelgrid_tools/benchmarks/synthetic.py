@@ -0,0 +1,173 @@
+"""
+synthetic.py
+
+Writes synthetic YREC-like output files for the benchmark scripts in this folder.
+The layout follows the fixed-width column positions used by read_output_files.py,
+so both the whitespace readers (tracker) and the fixed-width readers can be timed
+on the same file. It also writes base namelists and a YREC input tree for
+bench_make_grid.py.
+"""
+
+import os
+
+import numpy as np
+
+
+TRACK_NAMES = ['Step', 'Shls', 'Age_gyr', 'LogL_lsun', 'LogR_rsun', 'Log_g', 'log_Teff', 'Mco_core',
+    'Mco_env', 'Rco_env', 'Tco_env', 'Dco_env', 'Pco_env', 'Oco_env', 'LogT_cen', 'LogD_cen', 'logP_cen',
+    'Beta_cen', 'Eta_cen', 'X_cen', 'Y_cen', 'Z_cen', 'ppI_lsun', 'ppII_lsun', 'ppIII_lsun', 'CNO_lsun',
+    '3a_lsun', 'HeC_lsun', 'Egrav_lsun', 'Neut_lsun', 'Cl_snu', 'Ga_snu', 'pp_neut', 'pep_neut', 'hep_neut',
+    'Be7_neut', 'B8_neut', 'N13_neut', 'O15_neut', 'F17_neut', 'diag1', 'diag2', 'He3_cen', 'C12_cen',
+    'C13_cen', 'N14_cen', 'N15_cen', 'O16_cen', 'O17_cen', 'O18_cen', 'He3_sur', 'C12_sur', 'C13_sur',
+    'N14_sur', 'N15_sur', 'O16_sur', 'O17_sur', 'O18_sur', 'H2_sur', 'Li6_sur', 'Li7_sur', 'Be9_sur',
+    'X_sur', 'Y_sur', 'Z_sur', 'Z_X_sur', 'Jtot', 'KE_rot_tot', 'I_tot', 'I_cz', 'Omega_sur', 'Omega_cen',
+    'Prot_sur_d', 'Vrot_kms', 'TauCZ_s', 'MHshell_base', 'MHshell_mid', 'MHshell_top', 'RHshell_base',
+    'RHShell_mid', 'RHshell_top', 'logP_phot', 'Mass_msun']
+
+TRACK_COL_STARTS = [0, 9, 17, 33, 50, 65, 81, 98, 113, 129, 141, 153, 165, 177, 189, 205,
+    221, 237, 253, 269, 285, 301, 317, 333, 349, 365, 381, 397, 413, 429, 445,
+    455, 465, 475, 485, 495, 505, 515, 525, 535, 545, 555, 565, 581, 597, 613,
+    629, 645, 661, 677, 693, 709, 725, 741, 757, 773, 789, 805, 821, 837, 853,
+    869, 885, 901, 917, 933, 949, 965, 981, 997, 1013, 1029, 1045, 1061, 1077,
+    1094, 1109, 1125, 1141, 1157, 1173, 1189, 1205]
+
+
+def _widths(col_starts, last_width=16):
+    return list(np.diff(col_starts)) + [last_width]
+
+
+def _format_row(values, widths, n_int=0):
+    cells = []
+    for k, (v, w) in enumerate(zip(values, widths)):
+        if k < n_int:
+            cells.append(f'{int(v):>{w}d}')
+        else:
+            cells.append(f'{v:>{w}.{max(w - 8, 1)}E}')
+    return ''.join(cells)
+
+
+def track_values(nrows, mass=1.0, seed=0):
+    """Return a (nrows, 83) array that evolves roughly like a low-mass track."""
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(0.1, 0.9, size=(nrows, len(TRACK_NAMES)))
+    t = np.linspace(0.0, 1.0, nrows)
+    values[:, 0] = np.arange(1, nrows + 1)
+    values[:, 1] = 800 + (np.arange(nrows) % 200)
+    values[:, 2] = 1e-5 + 13.0 * t**2 / mass**2.5
+    values[:, 3] = np.where(t < 0.7, 0.1 * t, 0.07 + 10 * np.clip(t - 0.7, 0, None)**1.5)
+    values[:, 4] = np.where(t < 0.7, 0.05 * t, 0.035 + 3 * np.clip(t - 0.7, 0, None)**1.5)
+    values[:, 5] = 4.44 - 2 * values[:, 4] + np.log10(mass)
+    values[:, 6] = 3.76 - 0.3 * np.clip(t - 0.6, 0, None)
+    values[:, 19] = np.clip(0.71 * (1 - t / 0.6), 0, None)
+    values[:, 20] = 0.98 - values[:, 19]
+    values[:, 40:42] = 0.0
+    values[:, 82] = mass
+    return values
+
+
+def write_track(path, nrows=5000, mass=1.0, seed=0):
+    """Write a synthetic .track file with metadata, a '#Version' line and a fixed-width table."""
+    widths = _widths(TRACK_COL_STARTS)
+    values = track_values(nrows, mass=mass, seed=seed)
+    with open(path, 'w') as f:
+        f.write('# YREC synthetic track for benchmarking\n')
+        f.write('# NUMRUN = 1\n')
+        f.write('#Version 5.1c\n')
+        f.write(''.join(f'{n:>{w}s}' for n, w in zip(TRACK_NAMES, widths)) + '\n')
+        for row in values:
+            f.write(_format_row(row, widths, n_int=2) + '\n')
+    return path
+
+
+STORE_NAMES = ['SHELL', 'MASS', 'RADIUS', 'LUMINOSITY', 'PRESSURE', 'TEMPERATURE', 'DENSITY', 'OMEGA',
+    'C', 'H1', 'He4', 'METALS', 'He3', 'C12', 'C13', 'N14', 'N15', 'O16', 'O17', 'O18', 'H2', 'Li6',
+    'Li7', 'Be9', 'OPAC', 'GRAV', 'DELR', 'DEL', 'DELA', 'V_CONV', 'GAM1', 'HII', 'HEII', 'HEIII',
+    'BETA', 'ETA', 'PPI', 'PPII', 'PPIII', 'CNO', '3HE', 'E_NUC', 'E_NEU', 'E_GRAV', 'A', 'RP/RE',
+    'FP', 'FT', 'J/M', 'MOMENT', 'DEL_KE', 'V_ES', 'V_GSF', 'V_SS', 'VTOT']
+
+
+def write_store(path, nmodels=20, nshells=2000, seed=0):
+    """
+    Write a synthetic .store file: for each model a MOD2 line (age in Gyr at
+    characters 87:102), a SHELL header line, and one row per shell.
+    """
+    rng = np.random.default_rng(seed)
+    ages = np.sort(rng.uniform(0.01, 10.0, nmodels))
+    with open(path, 'w') as f:
+        for m, age in enumerate(ages):
+            f.write(f'MOD2 {m + 1:6d}'.ljust(87) + f'{age:15.8E}' + '  0.00000000E+00\n')
+            f.write(' ' + ' '.join(f'{n:>11s}' for n in STORE_NAMES) + '\n')
+            values = rng.uniform(0.0, 1.0, size=(nshells, len(STORE_NAMES)))
+            for s, row in enumerate(values):
+                cells = [f'{s + 1:5d}'] + [f'{v:15.8E}' for v in row[1:8]] \
+                    + ['T' if row[8] > 0.5 else 'F'] + [f'{v:15.8E}' for v in row[9:]]
+                f.write(' ' + ' '.join(cells) + '\n')
+            f.write('\n')
+    return path
+
+
+LAST_NAMES = ['SHELL', 'MASS', 'RADIUS', 'LUMINOSITY', 'PRESSURE', 'TEMPERATURE', 'DENSITY', 'OMEGA', 'C',
+    'H1', 'He4', 'METALS', 'He3', 'C12', 'C13', 'N14', 'N15', 'O16', 'O17', 'O18', 'H2', 'Li6', 'Li7', 'Be9']
+LAST_COL_STARTS = [0, 7, 24, 42, 66, 84, 102, 120, 144, 146, 158, 170, 182, 198, 214, 230, 246, 262, 278,
+    294, 310, 326, 342, 358]
+
+
+def write_last(path, nshells=2000, seed=0):
+    """
+    Write a synthetic .last file: six header lines, a column-name line and
+    one fixed-width row per shell (convective flag 'T'/'F' in column C).
+    """
+    rng = np.random.default_rng(seed)
+    widths = _widths(LAST_COL_STARTS)
+    with open(path, 'w') as f:
+        for k in range(6):
+            f.write(f' YREC synthetic .last header line {k + 1}\n')
+        f.write(''.join(f'{n:>{w}s}' for n, w in zip(LAST_NAMES, widths)) + '\n')
+        values = rng.uniform(0.0, 1.0, size=(nshells, len(LAST_NAMES)))
+        for s, row in enumerate(values):
+            cells = [f'{s + 1:>{widths[0]}d}'] \
+                + [f'{v:>{w}.{max(w - 8, 1)}E}' for v, w in zip(row[1:8], widths[1:8])] \
+                + [f"{'T' if row[8] > 0.5 else 'F':>{widths[8]}s}"] \
+                + [f'{v:>{w}.{max(w - 8, 1)}E}' for v, w in zip(row[9:], widths[9:])]
+            f.write(''.join(cells) + '\n')
+    return path
+
+
+# Keys make_MFeHgrid sets, split between the two namelists as in a YREC base run
+NML1_KEYS = ['RSCLM(1)', 'RSCLX(1)', 'RSCLZ(1)', 'FFIRST', 'FLAST', 'FMODPT', 'FSTOR', 'FTRACK', 'FSHORT',
+    'FPMOD', 'FPENV', 'FPATM', 'FSNU', 'FSCOMP']
+NML2_KEYS = ['ZOPAL951', 'FOPALE06', 'FATM', 'FcondOpacP', 'FALLARD', 'FSCVH', 'FSCVHE', 'FSCVZ', 'FFERMI',
+    'FPUREZ', 'FLIV95', 'FALEX06']
+
+
+def write_base_namelists(base_fpath, base_fname, numrun=2, filler=150):
+    """
+    Write a synthetic base .nml1/.nml2 pair with every key make_MFeHgrid sets,
+    NUMRUN = numrun envelope abundances and `filler` other parameters (with comments) per file.
+    """
+    def assignment(key, k):
+        if key.startswith('F'):
+            return f" {key} = 'base/input/file{k}.dat'   ! {key} path\n"
+        return f" {key} = {0.1 * (k + 1):.6f}   ! {key}\n"
+
+    nml1 = [' $CONTROL\n', f' NUMRUN = {numrun}\n']
+    nml1 += [assignment(key, k) for k, key in enumerate(NML1_KEYS)]
+    for k in range(numrun):
+        nml1 += [f' XENV0A({k + 1}) = 0.7\n', f' ZENV0A({k + 1}) = 0.02\n']
+    nml2 = [' $PHYSICS\n'] + [assignment(key, k) for k, key in enumerate(NML2_KEYS)]
+    for lines in (nml1, nml2):
+        for k in range(filler):
+            lines.append(f' ! parameter {k}\n' if k % 5 == 0 else f' PARAM{k} = {k}.0D0\n')
+        lines.append(' $END\n')
+    for ext, lines in (('.nml1', nml1), ('.nml2', nml2)):
+        with open(f'{base_fpath}/{base_fname}{ext}', 'w') as f:
+            f.writelines(lines)
+
+
+def write_input_tree(yrec_inputpath, mass_strings, z_strings):
+    """Write empty starting models {yrec_inputpath}/models/dbl/m<mass>gs98z<z>_Dbl.first."""
+    dbl = os.path.join(yrec_inputpath, 'models', 'dbl')
+    os.makedirs(dbl, exist_ok=True)
+    for mass in mass_strings:
+        for z in z_strings:
+            open(os.path.join(dbl, f'm{mass}gs98z{z}_Dbl.first'), 'w').close()
@@ -4,14 +4,147 @@ tracker.py
 
 Reads a YREC `.track` file into a pandas DataFrame.
 
-This function scans for the last `#Version` line in the file 
-and skips all preceding lines before reading the actual data table.
+The file is read once as raw bytes. The byte offset of the last `#Version`
+line is located directly in that buffer, and the numeric block that follows
+the column-name header is converted straight into a NumPy array
+(see benchmarks/bench_tracker.py for timings against the old two-pass reader).
+
+TrackFollower reads a .track file that YREC is still writing: each poll()
+returns only the complete rows appended since the previous call.
 """
 
+import io
+import os
+import re
+
+import numpy as np
 import pandas as pd
 
 
-def tracker(filepath):
+# Fortran drops the 'E' when an exponent needs three digits (e.g. 1.0-100)
+_FORTRAN_EXPONENT = re.compile(rb'([0-9.])([+-]\d{3})$')
+
+
+def _fortran_float(token):
+    """
+    Convert a single Fortran-formatted token to float.
+
+    Handles exponent overflow tokens such as `1.0-100`. Anything that still
+    cannot be read becomes NaN.
+    """
+    try:
+        return float(token)
+    except ValueError:
+        fixed = _FORTRAN_EXPONENT.sub(rb'\1E\2', token.strip())
+        try:
+            return float(fixed)
+        except ValueError:
+            return np.nan
+
+
+def _tokens_to_float(tokens):
+    """
+    Convert a 2D array of byte-string tokens to float64 in one step.
+
+    If any cell fails to convert, only the offending columns are retried
+    value by value, so one bad cell does not spoil the rest of the table.
+    """
+    try:
+        return tokens.astype(np.float64)
+    except ValueError:
+        values = np.empty(tokens.shape, dtype=np.float64)
+        for k in range(tokens.shape[1]):
+            try:
+                values[:, k] = tokens[:, k].astype(np.float64)
+            except ValueError:
+                values[:, k] = [_fortran_float(tok) for tok in tokens[:, k]]
+        return values
+
+
+def _is_int_token(token):
+    """True if a token looks like a plain integer (e.g. the Step column)."""
+    return token.lstrip(b'+-').isdigit()
+
+
+def _find_table_start(raw, filepath):
+    """
+    Return (header_line, data_offset) for the table after the last '#Version'.
+    """
+    # Step 1: Find the byte offset of the last '#Version' line.
+    version = raw.rfind(b'#Version')
+    if version < 0:
+        raise ValueError(f"No '#Version' line found in file: {filepath}")
+
+    # Step 2: The column-name header is the first non-blank line after it.
+    pos = raw.find(b'\n', version)
+    while pos >= 0:
+        end = raw.find(b'\n', pos + 1)
+        line = raw[pos + 1:end if end >= 0 else len(raw)]
+        if line.strip():
+            return line, (end + 1 if end >= 0 else len(raw))
+        pos = end
+    raise ValueError(f"No column header after '#Version' in file: {filepath}")
+
+
+def _select_columns(names, columns, filepath=''):
+    """
+    Return the positions of the requested column names (all columns if None).
+    """
+    if columns is None:
+        return list(range(len(names)))
+    if isinstance(columns, str):
+        columns = [columns]
+    missing = [c for c in columns if c not in names]
+    if missing:
+        raise ValueError(f"Columns not found in {filepath or 'file'}: {', '.join(missing)}")
+    return [names.index(c) for c in columns]
+
+
+def _parse_table(block, names, usecols=None):
+    """
+    Parse a whitespace-separated numeric block into a DataFrame.
+
+    The fast path hands the whole block to NumPy's C reader in one call.
+    Blocks it rejects (Fortran exponent overflow, ragged or blank lines) fall
+    back to a tokenized parse where short rows are padded with NaN (like
+    pandas) and bad cells are fixed value by value.
+
+    Only the columns at positions `usecols` (default: all) are converted and
+    allocated, in that order.
+
+    Lines starting with '#' inside the block are skipped, and an empty block
+    gives float64 columns (see tracker() for how this differs from pandas).
+    """
+    ncols = len(names)
+    if usecols is None:
+        usecols = list(range(ncols))
+    selected = [names[k] for k in usecols]
+    block = block.rstrip()
+    if not block:
+        return pd.DataFrame(np.empty((0, len(usecols))), columns=selected)
+
+    first_row = block[:block.find(b'\n')].split() if b'\n' in block else block.split()
+    try:
+        if len(first_row) != ncols:
+            raise ValueError('column count does not match the header')
+        values = np.loadtxt(io.BytesIO(block), dtype=np.float64, ndmin=2, usecols=usecols)
+    except ValueError:
+        rows = [line.split() for line in block.split(b'\n') if line.strip() and not line.lstrip().startswith(b'#')]
+        tokens = np.full((len(rows), ncols), b'nan', dtype=object)
+        for i, row in enumerate(rows):
+            tokens[i, :len(row)] = row[:ncols]
+        values = _tokens_to_float(tokens[:, usecols].astype(bytes))
+
+    track = pd.DataFrame(values, columns=selected)
+
+    # Integer columns (Step, Shls) keep an integer dtype, as pandas would infer
+    for j, k in enumerate(usecols):
+        if k < len(first_row) and _is_int_token(first_row[k]) and np.all(np.mod(values[:, j], 1) == 0):
+            track[names[k]] = values[:, j].astype(np.int64)
+    return track
+
+
+def tracker(filepath, columns=None):
     """
     Reads a YREC .track file into a pandas DataFrame.
 
@@ -19,47 +152,149 @@ def tracker(filepath):
     ----------
     filepath : str
         Full path to the .track file.
+    columns : list of str, optional
+        Names of the columns to read (e.g. ['Age_gyr', 'LogL_lsun', 'X_cen']).
+        Only these columns are converted and stored, in the order given.
+        If None, all columns are read.
 
     Returns
     -------
     pd.DataFrame
         The track data read from the file.
+
+    Notes
+    -----
+    Two cases differ from the previous pandas.read_csv reader:
+    comment lines ('#...') inside the table are skipped, where read_csv kept
+    them as rows of strings (turning every column into object dtype); and a
+    table with a header but no rows gives float64 columns instead of object.
     """
 
-    # Step 1: Create a list to store the line numbers where '#Version' appears.
-    start = []
+    # Step 1: Read the file once, as bytes.
+    with open(filepath, 'rb') as fp:
+        raw = fp.read()
 
-    # Step 2: Open the file for reading.
-    with open(filepath, 'r') as fp:
-        # Step 3: Read all lines into memory.
-        lines = fp.readlines()
+    # Step 2: Locate the header line after the last '#Version' and the start of the data.
+    header, data_start = _find_table_start(raw, filepath)
+    names = header.decode().split()
+    usecols = _select_columns(names, columns, filepath)
 
-        # Step 4: Loop over each line with its index.
-        for idx, row in enumerate(lines):
-            # Step 5: If '#Version' is found in the line, store its index.
-            if '#Version' in row:
-                start.append(idx)
+    # Step 3: Convert the numeric block straight into a DataFrame.
+    return _parse_table(raw[data_start:], names, usecols)
 
-    # Step 6: If no '#Version' line is found, raise an error.
-    if not start:
-        raise ValueError(f"No '#Version' line found in file: {filepath}")
 
-    # Step 7: The data table starts right after the last '#Version' line.
-    skiprows = start[-1] + 1
+class TrackFollower:
+    """
+    Incremental reader for a .track file that is still being written.
 
-    # Step 8: Use pandas to read the file into a DataFrame, skipping metadata lines.
-    track = pd.read_csv(
-        filepath,
-        header='infer',            # Automatically detect header from first data row
-        skiprows=skiprows,          # Skip lines before data starts
-        sep=r'\s+',                 # Split on any whitespace
-        float_precision='legacy'    # Maintain original float precision
-    )
+    The follower remembers the byte offset it has read up to. Each poll()
+    reads only the bytes appended since then and returns the complete rows
+    among them; a partially written last line is left for the next poll.
+    If YREC restarts and writes a new '#Version' header, the column names
+    are re-read and only rows after the newest header are returned (the
+    same rule tracker() applies). A file that shrinks is read again from
+    the start.
 
-    # Step 9: Return the resulting DataFrame.
-    return track
+    Parameters
+    ----------
+    filepath : str
+        Full path to the .track file (it does not need to exist yet).
+    columns : list of str, optional
+        Names of the columns to return (e.g. ['Age_gyr', 'X_cen', 'LogL_lsun']).
+
+    Attributes
+    ----------
+    offset : int
+        Byte offset up to which the file has been consumed.
+    rows_read : int
+        Number of rows returned since the last header.
+    headers_read : int
+        Number of '#Version' headers seen (more than 1 means the run restarted).
+
+    Example
+    -------
+    follower = TrackFollower("/path/to/run.track", columns=['Age_gyr', 'X_cen', 'LogL_lsun'])
+    while running:
+        new_rows = follower.poll()
+        if len(new_rows) and new_rows['X_cen'].iloc[-1] < 1e-4:
+            stop_run()
+    """
+
+    def __init__(self, filepath, columns=None):
+        self.filepath = filepath
+        self.columns = columns
+        self.names = None
+        self.usecols = None
+        self.offset = 0
+        self.rows_read = 0
+        self.headers_read = 0
+
+    def _empty(self):
+        names = [self.names[k] for k in self.usecols] if self.names is not None else list(self.columns or [])
+        return pd.DataFrame(np.empty((0, len(names))), columns=names)
+
+    def reset(self):
+        """Forget everything read so far; the next poll() starts from the top of the file."""
+        self.names = None
+        self.usecols = None
+        self.offset = 0
+        self.rows_read = 0
+
+    def poll(self, final=False):
+        """
+        Return the rows completed since the previous poll.
+
+        Parameters
+        ----------
+        final : bool, default False
+            If True, also consume a last line that has no trailing newline
+            (use once the run has finished).
+
+        Returns
+        -------
+        pd.DataFrame
+            The new rows (possibly empty).
+        """
+        try:
+            size = os.path.getsize(self.filepath)
+        except FileNotFoundError:
+            return self._empty()  # the run has not created the file yet
+        if size < self.offset:
+            self.reset()  # file was truncated or rewritten
+
+        with open(self.filepath, 'rb') as fp:
+            fp.seek(self.offset)
+            chunk = fp.read()
+
+        # Only consume complete lines
+        end = len(chunk) if final else chunk.rfind(b'\n') + 1
+        chunk = chunk[:end]
+        if not chunk:
+            return self._empty()
+
+        # A (new) header: re-read the column names, keep only rows after it
+        data_start = 0
+        version = chunk.rfind(b'#Version')
+        if version >= 0 or self.names is None:
+            try:
+                header, data_start = _find_table_start(chunk, self.filepath)
+            except ValueError:
+                if version >= 0:
+                    # header line not written yet; come back to this '#Version' line
+                    self.offset += chunk.rfind(b'\n', 0, version) + 1
+                return self._empty()
+            self.names = header.decode().split()
+            self.usecols = _select_columns(self.names, self.columns, self.filepath)
+            self.rows_read = 0
+            self.headers_read += 1
+
+        self.offset += len(chunk)
+        rows = _parse_table(chunk[data_start:], self.names, self.usecols)
+        self.rows_read += len(rows)
+        return rows
 
 
 # Example usage (uncomment for testing):
 # df = tracker("/path/to/file.track")
 # print(df.head())
+# ages = tracker("/path/to/file.track", columns=['Age_gyr', 'LogL_lsun'])
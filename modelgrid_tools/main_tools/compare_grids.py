@@ -0,0 +1,305 @@
+"""
+compare_grids.py
+
+Compares two mass-[Fe/H] grids of YREC tracks, e.g. the same grid run with
+two atmosphere tables or opacities, to see which regions of the grid moved
+and by how much.
+
+Tracks are paired by the mass and [Fe/H] in their make_MFeHgrid file names
+(m###feh####_<base>.track), so the base names of the two grids can differ.
+Each pair is aligned either on age (both tracks interpolated onto the same
+log-spaced ages, over the age range they share) or on EEP (see eep.py), and
+the maximum and RMS absolute differences of every compared column are
+computed. Pairs are processed in batches: a batch of tracks is concatenated
+and interpolated with one np.searchsorted, so the differences of a whole
+batch are a few array operations. Batches can be spread over processes.
+
+Example:
+    from compare_grids import compare_grids, difference_map
+    table = compare_grids('grid_opal/output', 'grid_op/output', align='eep', n_workers=8)
+    print(difference_map(table, 'log_Teff'))       # max |dlog Teff| on the mass x [Fe/H] grid
+"""
+
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from load_yrec_tracks import find_track_files, read_track
+from make_modelgrid import filestr_to_MFeH
+
+
+# Columns compared by default (when present in the tracks)
+DEFAULT_COLUMNS = ('LogL_lsun', 'log_Teff', 'LogR_rsun', 'Log_g', 'X_cen', 'Y_cen', 'Z_sur')
+
+# Columns the alignment needs, read from every track whatever is compared
+EEP_COLUMNS = ('Age_gyr', 'X_cen', 'LogL_lsun', 'log_Teff')
+
+
+def _grid_files(track_dir, recursive=True):
+    """{(mass, [Fe/H]): path} of the grid tracks in a directory (duplicates and other names are reported)."""
+    files = {}
+    for filepath in find_track_files(track_dir, recursive):
+        decoded = filestr_to_MFeH(filepath)
+        if decoded is None:
+            print(f"⚠️ '{os.path.basename(filepath)}' is not named like a grid track; skipped.")
+            continue
+        key = decoded[:2]
+        if key in files:
+            print(f"⚠️ Several tracks at M={key[0]}, [Fe/H]={key[1]} in {track_dir}; "
+                  f"keeping {os.path.basename(files[key])}.")
+            continue
+        files[key] = filepath
+    return files
+
+
+def pair_tracks(grid_a, grid_b, recursive=True):
+    """
+    Pair the tracks of two grids by (mass, [Fe/H]).
+
+    Returns
+    -------
+    pairs : list of (mass, feh, path_a, path_b)
+        Sorted by ([Fe/H], mass).
+    only_a, only_b : list of str
+        Tracks with no counterpart in the other grid.
+    """
+    files_a = _grid_files(grid_a, recursive)
+    files_b = _grid_files(grid_b, recursive)
+    shared = sorted(set(files_a) & set(files_b), key=lambda key: (key[1], key[0]))
+    pairs = [(mass, feh, files_a[(mass, feh)], files_b[(mass, feh)]) for mass, feh in shared]
+    only_a = sorted(path for key, path in files_a.items() if key not in files_b)
+    only_b = sorted(path for key, path in files_b.items() if key not in files_a)
+    return pairs, only_a, only_b
+
+
+def _interp_tracks(x_list, values_list, targets):
+    """
+    Linear interpolation of many tracks at once.
+
+    x_list : increasing x of each track; values_list : (n_rows, n_columns) of each track;
+    targets : (n_tracks, n_points) x at which each track is wanted.
+    Every track is shifted into its own range of one concatenated axis, so all
+    the targets are bracketed by a single np.searchsorted. NaN outside a track.
+    """
+    lengths = np.array([len(x) for x in x_list])
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    spans = np.array([x[-1] - x[0] for x in x_list])
+    shift = np.concatenate([[0.0], np.cumsum(spans + 1.0)[:-1]]) - np.array([x[0] for x in x_list])
+    x = np.concatenate([x + s for x, s in zip(x_list, shift)])
+    values = np.concatenate(values_list)
+
+    t = targets + shift[:, None]
+    i = np.searchsorted(x, t, side='right') - 1
+    i = np.clip(i, starts[:, None], np.maximum(ends - 2, starts)[:, None])
+    dx = x[np.minimum(i + 1, len(x) - 1)] - x[i]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = np.where(dx > 0, (t - x[i]) / dx, 0.0)
+    out = values[i] + w[:, :, None] * (values[np.minimum(i + 1, len(x) - 1)] - values[i])
+    inside = (targets >= np.array([x[0] for x in x_list])[:, None]) & \
+             (targets <= np.array([x[-1] for x in x_list])[:, None]) & (lengths[:, None] > 1)
+    out[~inside] = np.nan
+    return out
+
+
+def _align_age(tracks_a, tracks_b, columns, n_points):
+    """(n_pairs, n_points, n_columns) values of both grids at shared log-spaced ages."""
+    def log_age(df):
+        age = np.maximum.accumulate(df['Age_gyr'].to_numpy(dtype=np.float64))
+        return np.log10(np.clip(age, 1e-12, None))
+
+    def first_age(x):
+        """First positive log age (the starting model can have age 0)."""
+        positive = x > -12
+        return x[np.argmax(positive)] if positive.any() else np.nan
+
+    x_a = [log_age(df) for df in tracks_a]
+    x_b = [log_age(df) for df in tracks_b]
+    lo = np.array([max(first_age(xa), first_age(xb)) for xa, xb in zip(x_a, x_b)])
+    hi = np.array([min(xa[-1], xb[-1]) for xa, xb in zip(x_a, x_b)])
+    overlap = np.isfinite(lo) & (hi > lo)
+    frac = np.linspace(0.0, 1.0, n_points)
+    targets = np.where(overlap[:, None], lo[:, None] * (1 - frac) + hi[:, None] * frac, np.nan)  # exact at both ends
+
+    values_a = [df[columns].to_numpy(dtype=np.float64) for df in tracks_a]
+    values_b = [df[columns].to_numpy(dtype=np.float64) for df in tracks_b]
+    return _interp_tracks(x_a, values_a, targets), _interp_tracks(x_b, values_b, targets)
+
+
+def _align_eep(tracks_a, tracks_b, columns):
+    """(n_pairs, n_eeps, n_columns) values of both grids at the same EEPs."""
+    from eep import build_eeps
+
+    def by_key(tracks):
+        # Tracks are named by position, so the rows of the (re-sorted) EEP grid map back onto the pairs
+        # (_compare_batch leaves out empty tracks, which build_eeps cannot use)
+        eeps = build_eeps([(df, str(k)) for k, df in enumerate(tracks)], columns=columns)
+        out = np.full((len(tracks), eeps.n_eeps, len(columns)), np.nan)
+        out[[int(name) for name in eeps.names]] = eeps.values
+        return out
+
+    return by_key(tracks_a), by_key(tracks_b)
+
+
+def _compare_batch(job):
+    """
+    Worker of compare_grids(): read one batch of track pairs and return (summary rows, errors, empty),
+    so that pairs that cannot be read are reported by the parent process, in order.
+    Pairs where either track has no rows cannot be aligned; they are left out of the
+    comparison and returned in `empty` as (file_a, file_b).
+    """
+    pairs, columns, align, n_points, cache, cache_dir = job
+    read_columns = list(dict.fromkeys(list(EEP_COLUMNS) + list(columns)))
+    rows, tracks_a, tracks_b, errors, empty = [], [], [], [], []
+    for mass, feh, path_a, path_b in pairs:
+        try:
+            df_a = read_track(path_a, cache, cache_dir, read_columns)
+            df_b = read_track(path_b, cache, cache_dir, read_columns)
+        except Exception as e:
+            errors.append(f"{os.path.basename(path_a)} / {os.path.basename(path_b)}: {e}")
+            continue
+        if not len(df_a) or not len(df_b):
+            empty.append((path_a, path_b))
+            continue
+        tracks_a.append(df_a)
+        tracks_b.append(df_b)
+        rows.append({'mass': mass, 'feh': feh,
+                     'file_a': os.path.basename(path_a), 'file_b': os.path.basename(path_b)})
+
+    if not rows:
+        return None, errors, empty
+    if align == 'age':
+        values_a, values_b = _align_age(tracks_a, tracks_b, list(columns), n_points)
+    else:
+        values_a, values_b = _align_eep(tracks_a, tracks_b, list(columns))
+
+    diff = np.abs(values_a - values_b)
+    both = ~np.isnan(diff)
+    n_compared = both[:, :, 0].sum(axis=1) if diff.shape[2] else np.zeros(len(rows), dtype=np.int64)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # pairs with nothing to compare give NaN
+        max_diff = np.nanmax(diff, axis=1)
+        rms_diff = np.sqrt(np.nanmean(diff**2, axis=1))
+
+    table = pd.DataFrame(rows)
+    table['n_points'] = n_compared
+    stats = {}
+    for c, name in enumerate(columns):
+        stats[f'{name}_max'] = max_diff[:, c]
+        stats[f'{name}_rms'] = rms_diff[:, c]
+    return pd.concat([table, pd.DataFrame(stats)], axis=1), errors, empty
+
+
+def compare_grids(
+    grid_a,
+    grid_b,
+    columns=None,
+    align='age',
+    n_points=500,
+    recursive=True,
+    batch_size=32,
+    n_workers=1,
+    cache=True,
+    cache_dir=None
+):
+    """
+    Compare every pair of matching tracks of two grids.
+
+    Parameters
+    ----------
+    grid_a, grid_b : str
+        Directories of the two grids' .track files (make_MFeHgrid names).
+    columns : list of str, optional
+        Track columns to compare. Defaults to the DEFAULT_COLUMNS present in the tracks;
+        'Age_gyr' can be added when align='eep'.
+    align : {'age', 'eep'}, default 'age'
+        'age' compares the tracks at `n_points` log-spaced ages over their shared age range;
+        'eep' compares them EEP by EEP (eep.build_eeps), up to the last EEP both reach.
+    n_points : int, default 500
+        Number of ages compared per pair when align='age'.
+    recursive : bool, default True
+        Whether to search subdirectories for .track files.
+    batch_size : int, default 32
+        Track pairs read and compared together (and sent to a worker at once).
+    n_workers : int or None, default 1
+        Number of processes. None uses every CPU.
+    cache, cache_dir
+        As in load_yrec_tracks(): tracks go through the on-disk track cache.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per pair, sorted by ([Fe/H], mass): mass, feh, file_a, file_b, n_points
+        (ages or EEPs compared) and the maximum and RMS absolute difference of each column
+        ('<column>_max', '<column>_rms'; NaN if the tracks do not overlap).
+        Tracks found in only one grid are listed in table.attrs['only_a'] and ['only_b'],
+        and pairs left unmatched because a track has no rows in table.attrs['empty']
+        as (path_a, path_b).
+    """
+    if align not in ('age', 'eep'):
+        raise ValueError("align must be 'age' or 'eep'")
+    pairs, only_a, only_b = pair_tracks(grid_a, grid_b, recursive)
+    for label, paths in (('A', only_a), ('B', only_b)):
+        if paths:
+            print(f"⚠️ {len(paths)} tracks only in grid {label} (see table.attrs['only_{label.lower()}']).")
+    if not pairs:
+        raise ValueError(f"No tracks with the same mass and [Fe/H] in {grid_a} and {grid_b}")
+
+    if columns is None:
+        sample = read_track(pairs[0][2], cache, cache_dir)
+        columns = [c for c in DEFAULT_COLUMNS if c in sample.columns]
+    elif isinstance(columns, str):
+        columns = [columns]
+    if align == 'age':
+        columns = [c for c in columns if c != 'Age_gyr']  # the ages are equal by construction
+
+    jobs = [(pairs[k:k + batch_size], columns, align, n_points, cache, cache_dir)
+            for k in range(0, len(pairs), batch_size)]
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if n_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(jobs))) as executor:
+            results = list(executor.map(_compare_batch, jobs))
+    else:
+        results = map(_compare_batch, jobs)
+
+    tables, empty = [], []
+    for table, errors, batch_empty in results:
+        for error in errors:
+            print(f"Failed to read {error}")
+        empty.extend(batch_empty)
+        if table is not None:
+            tables.append(table)
+    if empty:
+        print(f"⚠️ {len(empty)} track pairs not compared because a track is empty (see table.attrs['empty']).")
+    if not tables:
+        raise ValueError("No track pairs could be compared")
+    table = pd.concat(tables, ignore_index=True)
+    table.attrs['only_a'] = only_a
+    table.attrs['only_b'] = only_b
+    table.attrs['empty'] = empty
+    return table
+
+
+def difference_map(table, column, stat='max'):
+    """
+    One statistic of compare_grids() laid out on the grid: a mass x [Fe/H] DataFrame.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        Output of compare_grids().
+    column : str
+        Compared column, e.g. 'log_Teff'.
+    stat : {'max', 'rms'}, default 'max'
+    """
+    return table.pivot_table(index='mass', columns='feh', values=f'{column}_{stat}', aggfunc='first')
+
+
+# Example usage (uncomment for testing):
+# table = compare_grids('grid_a/output', 'grid_b/output', align='eep', n_workers=4)
+# print(table.sort_values('log_Teff_max', ascending=False).head())
+# print(difference_map(table, 'LogL_lsun', stat='rms'))
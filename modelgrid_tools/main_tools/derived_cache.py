@@ -0,0 +1,201 @@
+"""
+derived_cache.py
+
+On-disk cache for products derived from a set of .track files (EEP grids,
+isochrones, derived columns, ...).
+
+An entry is keyed on the name and content hash of every source file plus the
+parameters of the derivation (e.g. iso_round, the EEP definitions), so it is
+reused only if neither the data nor the recipe changed. The names are part of
+the key because the products carry them (track names, and the mass and
+[Fe/H] decoded from them), so a renamed grid is derived again. File hashes are
+memoized on (size, mtime_ns): re-opening an unchanged grid costs one stat per
+file, and a file is hashed again only when it was touched. Because the key is
+the content, a re-run that writes identical tracks still hits the cache.
+
+Entries are pickles in one folder. Each read refreshes the entry's mtime, and
+after every write the least recently used entries are deleted until the
+folder holds at most `max_bytes`.
+
+Example:
+    from derived_cache import DerivedCache
+    dcache = DerivedCache("/path/to/grid/.yrec_cache/derived")
+    eeps = dcache.get_or_compute('eeps', track_files, {'n_points': (200, 150, 100, 150, 200)},
+                                 lambda: build_eeps(track_list))
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+from fileio import atomic_write
+
+
+DERIVED_DIRNAME = 'derived'
+HASHES_FILENAME = 'file_hashes.json'
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+class DerivedCache:
+    """
+    Size-bounded LRU cache of derived grid products, keyed on source content.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Folder holding the entries (created if needed).
+    max_bytes : int, default 2 GiB
+        Total size the entries are trimmed to after each write.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hashes_path = os.path.join(cache_dir, HASHES_FILENAME)
+        try:
+            with open(self._hashes_path) as f:
+                self._hashes = json.load(f)
+        except (OSError, ValueError):
+            self._hashes = {}
+        self._hashes_changed = False
+
+    def __repr__(self):
+        return f"DerivedCache('{self.cache_dir}', max_bytes={self.max_bytes})"
+
+    # ------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------
+    def file_digest(self, filepath):
+        """
+        SHA-1 of a file's content, recomputed only if its size or mtime changed.
+        """
+        filepath = os.path.abspath(filepath)
+        st = os.stat(filepath)
+        memo = self._hashes.get(filepath)
+        if memo is not None and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        digest = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self._hashes[filepath] = [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+        self._hashes_changed = True
+        return digest.hexdigest()
+
+    def key(self, kind, sources, params=None):
+        """
+        Cache key of a derived product.
+
+        Parameters
+        ----------
+        kind : str
+            Name of the product (e.g. 'eeps', 'isochrones').
+        sources : list of str
+            Source files the product is derived from (order matters).
+        params : dict, optional
+            Parameters of the derivation; must be JSON-serializable (tuples and
+            NumPy arrays are converted to lists).
+        """
+        key = hashlib.sha1(kind.encode())
+        for filepath in sources:
+            key.update(os.path.basename(filepath).encode() + b'\0')
+            key.update(self.file_digest(filepath).encode())
+        key.update(json.dumps(params or {}, sort_keys=True, default=_jsonable).encode())
+        self.save_hashes()
+        return f'{kind}_{key.hexdigest()[:24]}'
+
+    def save_hashes(self):
+        """Write the memoized file hashes if any were added."""
+        if not self._hashes_changed:
+            return
+        data = json.dumps(self._hashes).encode()
+        try:
+            atomic_write(self._hashes_path, lambda f: f.write(data))
+            self._hashes_changed = False
+        except OSError as e:
+            print(f"⚠️ Could not write {HASHES_FILENAME}: {e}")
+
+    # ------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    def get(self, key):
+        """Return the cached object, or None if there is no (readable) entry. An unreadable entry is deleted."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                obj = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:  # truncated or corrupt pickle: any error can come out of pickle.load
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return obj
+
+    def put(self, key, obj):
+        """Store an object, then evict least recently used entries beyond max_bytes."""
+        try:
+            atomic_write(self._entry_path(key), lambda f: pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            print(f"⚠️ Could not write derived cache entry {key}: {e}")
+            return
+        self.evict()
+
+    def entries(self):
+        """List of (path, size, mtime) of the entries, least recently used first."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self, max_bytes=None):
+        """Delete least recently used entries until the cache holds at most max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def get_or_compute(self, kind, sources, params, compute):
+        """
+        Return the cached product for (kind, sources, params), computing and storing it on a miss.
+        """
+        key = self.key(kind, sources, params)
+        obj = self.get(key)
+        if obj is None:
+            obj = compute()
+            self.put(key, obj)
+        return obj
+
+
+def _jsonable(obj):
+    """json.dumps fallback for sets and NumPy scalars and arrays."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    return repr(obj)
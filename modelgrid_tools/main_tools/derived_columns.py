@@ -0,0 +1,225 @@
+"""
+derived_columns.py
+
+Quantities derived from .track columns (Teff, radius, asteroseismic scalings,
+Rossby number, ...), computed for a whole list of tracks at once.
+
+Each derived column is registered once with the columns it needs. A
+DerivedColumns object concatenates those columns over every track of a list,
+evaluates the formula in one vectorized call and splits the result back per
+track. Columns are computed on first access only, and with a DerivedCache
+(see derived_cache.py) they are stored next to the other derived products of
+the grid, keyed on the content of the .track files and on the formula (with
+the values of the constants it reads, such as TEFF_SUN), so a later session
+reads them back instead of recomputing them.
+
+Derived columns can depend on other derived columns (numax uses Teff_K).
+
+Example:
+    from load_yrec_tracks import load_yrec_tracks
+    out = load_yrec_tracks("/path/to/grid", load_derived=True)
+    derived = out['derived_columns']['grid_yrectracks']
+    numax = derived['numax_uHz']             # one array per track
+    df = derived.track(0, ['Teff_K', 'Rossby'])
+
+    from derived_columns import register
+    @register('Teff_eff_K', requires=('Teff_K',))
+    def _(Teff_K):
+        return 0.98 * Teff_K
+"""
+
+import hashlib
+
+import numpy as np
+
+
+# Solar reference values of the scaling relations
+TEFF_SUN = 5772.0   # K
+LOGG_SUN = 4.438    # cgs
+NUMAX_SUN = 3090.0  # muHz
+DNU_SUN = 135.1     # muHz
+
+# name -> (function, required columns); filled by register()
+DERIVED_COLUMNS = {}
+
+
+def register(name, requires):
+    """
+    Decorator adding a derived column to the registry.
+
+    The function receives the required columns (concatenated over all tracks)
+    as NumPy arrays, in the order of `requires`, and returns one array of the
+    same length. Registering an existing name replaces it.
+    """
+    if isinstance(requires, str):
+        requires = (requires,)
+
+    def decorator(func):
+        DERIVED_COLUMNS[name] = (func, tuple(requires))
+        return func
+    return decorator
+
+
+@register('Teff_K', requires=('log_Teff',))
+def _teff(log_Teff):
+    return 10.0**log_Teff
+
+
+@register('L_lsun', requires=('LogL_lsun',))
+def _luminosity(LogL_lsun):
+    return 10.0**LogL_lsun
+
+
+@register('R_rsun', requires=('LogR_rsun',))
+def _radius(LogR_rsun):
+    return 10.0**LogR_rsun
+
+
+@register('numax_uHz', requires=('Log_g', 'Teff_K'))
+def _numax(Log_g, Teff_K):
+    return NUMAX_SUN * 10.0**(Log_g - LOGG_SUN) / np.sqrt(Teff_K / TEFF_SUN)
+
+
+@register('Dnu_uHz', requires=('Mass_msun', 'R_rsun'))
+def _delta_nu(Mass_msun, R_rsun):
+    return DNU_SUN * np.sqrt(Mass_msun / R_rsun**3)
+
+
+@register('Rossby', requires=('Prot_sur_d', 'TauCZ_s'))
+def _rossby(Prot_sur_d, TauCZ_s):
+    # No convective envelope (TauCZ_s = 0) gives NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(TauCZ_s > 0, Prot_sur_d * 86400.0 / TauCZ_s, np.nan)
+
+
+def _hash_code(digest, code, namespace):
+    """
+    Add a code object to a hash: its bytecode, its constants (nested functions and
+    comprehensions recursively) and the values of the module-level constants it reads
+    (e.g. TEFF_SUN), so that changing a reference value changes the fingerprint.
+    Modules and functions it calls are left out.
+    """
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _hash_code(digest, const, namespace)
+        else:
+            digest.update(repr(const).encode())
+    for global_name in code.co_names:
+        value = namespace.get(global_name)
+        if isinstance(value, np.ndarray):
+            digest.update(global_name.encode() + value.tobytes())
+        elif isinstance(value, (bool, int, float, complex, str, bytes, tuple, frozenset, np.generic)):
+            digest.update(f'{global_name}={value!r}'.encode())
+
+
+def _recipe(name):
+    """Fingerprint of a derived column's formula (and those it depends on), for the cache key."""
+    func, requires = DERIVED_COLUMNS[name]
+    digest = hashlib.sha1(repr(requires).encode())
+    _hash_code(digest, func.__code__, func.__globals__)
+    for dep in requires:
+        if dep in DERIVED_COLUMNS:
+            digest.update(_recipe(dep).encode())
+    return digest.hexdigest()[:16]
+
+
+class DerivedColumns:
+    """
+    Lazily computed derived columns of a list of tracks.
+
+    Parameters
+    ----------
+    track_list : list of (pd.DataFrame, str)
+        Tracks, e.g. one of the lists in load_yrec_tracks()['star_lists'].
+    dcache : DerivedCache, optional
+        Where computed columns are stored and looked up. Needs `sources`.
+    sources : list of str, optional
+        The .track files of the list, in order (the cache key).
+    params : dict, optional
+        Extra parameters of the cache key (e.g. how the tracks were loaded).
+
+    Notes
+    -----
+    d[name] returns one array per track (views into one concatenated array),
+    d.values(name) the concatenated array, d.track(k, names) and d.frames(names)
+    the tracks with derived columns appended.
+    """
+
+    def __init__(self, track_list, dcache=None, sources=None, params=None):
+        self.names = [name for _, name in track_list]
+        self._tracks = [df for df, _ in track_list]
+        self._splits = np.cumsum([len(df) for df in self._tracks])[:-1]
+        self._dcache = dcache if sources is not None else None
+        self._sources = sources
+        self._params = params or {}
+        self._values = {}
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __repr__(self):
+        return f"DerivedColumns({len(self)} tracks, computed={list(self._values)})"
+
+    def available(self):
+        """Registered derived columns whose inputs are in the tracks."""
+        return [name for name in DERIVED_COLUMNS if self._can_compute(name)]
+
+    def _can_compute(self, name, seen=()):
+        if self._tracks and name in self._tracks[0].columns:
+            return True
+        if name not in DERIVED_COLUMNS or name in seen:
+            return False
+        return all(self._can_compute(dep, seen + (name,)) for dep in DERIVED_COLUMNS[name][1])
+
+    def _input(self, name):
+        """A track column (or derived column) concatenated over every track."""
+        if self._tracks and name in self._tracks[0].columns:
+            return np.concatenate([df[name].to_numpy() for df in self._tracks])
+        return self.values(name)
+
+    def values(self, name):
+        """Derived column `name` concatenated over every track (computed or read back on first access)."""
+        if name in self._values:
+            return self._values[name]
+        if name not in DERIVED_COLUMNS:
+            raise KeyError(f"'{name}' is not a registered derived column (see derived_columns.register)")
+        if not self._can_compute(name):
+            missing = [dep for dep in DERIVED_COLUMNS[name][1] if not self._can_compute(dep)]
+            raise KeyError(f"'{name}' needs columns the tracks do not have: {', '.join(missing)}")
+
+        func, requires = DERIVED_COLUMNS[name]
+
+        def compute():
+            return np.asarray(func(*[self._input(dep) for dep in requires]))
+
+        if self._dcache is None:
+            values = compute()
+        else:
+            params = {**self._params, 'column': name, 'recipe': _recipe(name)}
+            values = self._dcache.get_or_compute('derived_column', self._sources, params, compute)
+        self._values[name] = values
+        return values
+
+    def __getitem__(self, name):
+        return np.split(self.values(name), self._splits)
+
+    def __contains__(self, name):
+        return name in DERIVED_COLUMNS and self._can_compute(name)
+
+    def track(self, k, names=None):
+        """Track k with the derived columns `names` (default: every available one) appended."""
+        names = self.available() if names is None else names
+        start = self._splits[k - 1] if k > 0 else 0
+        stop = start + len(self._tracks[k])
+        return self._tracks[k].assign(**{name: self.values(name)[start:stop] for name in names})
+
+    def frames(self, names=None):
+        """List of (DataFrame, file name) with derived columns appended, like load_yrec_tracks() star lists."""
+        return [(self.track(k, names), fname) for k, fname in enumerate(self.names)]
+
+
+# Example usage (uncomment for testing):
+# derived = DerivedColumns(out['star_lists']['grid_yrectracks'])
+# print(derived.available())
+# print(derived.track(0, ['Teff_K', 'numax_uHz', 'Dnu_uHz']).head())
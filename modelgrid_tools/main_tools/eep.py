@@ -0,0 +1,502 @@
+"""
+eep.py
+
+Equivalent evolutionary phases (EEPs) for YREC tracks.
+
+Every track is cut at a few primary EEPs and each interval between them is
+resampled onto a fixed number of secondary EEPs, spaced evenly in a distance
+along the track (a weighted path length in log L, log Teff and log age, as in
+Dotter 2016, ApJS 222, 8). Row k of every resampled track is then the same
+phase for every mass and [Fe/H], which is what isochrones and grid
+interpolation need.
+
+Primary EEPs (row positions in the original track):
+    PreMS    first model of the track
+    ZAMS     X_cen has dropped by `zams_dx` below its initial value
+    IAMS     X_cen <= 0.3
+    TAMS     X_cen <= 1e-4 (the same cut load_yrec_tracks uses for subgiants)
+    RGBBase  first model after TAMS where log L rises `rgb_slope` times faster
+             than log Teff falls (the star turns up the giant branch)
+    RGBTip   maximum log L after RGBBase (only if the track turns over)
+
+A whole grid is processed in one batch: the tracks are concatenated, the
+primary EEPs are found with segment-wise reductions (np.minimum.reduceat) and
+every target EEP of every track is bracketed with a single np.searchsorted,
+by shifting each track's distance axis into its own range. EEPAccumulator
+builds the same grid one track at a time, for grids larger than memory.
+
+Example:
+    from load_yrec_tracks import load_yrec_tracks
+    from eep import build_eeps
+    out = load_yrec_tracks("/path/to/grid", load_subgiants=False)
+    eeps = build_eeps(out['star_lists']['grid_yrectracks'])
+    ages = eeps['Age_gyr']          # (n_tracks, n_eeps)
+    df = eeps.track(0)              # one resampled track as a DataFrame
+"""
+
+import numpy as np
+import pandas as pd
+
+from make_modelgrid import filestr_to_MFeH
+
+
+PRIMARY_EEPS = ('PreMS', 'ZAMS', 'IAMS', 'TAMS', 'RGBBase', 'RGBTip')
+
+# Secondary EEPs in each interval between consecutive primary EEPs
+DEFAULT_POINTS = (200, 150, 100, 150, 200)
+
+# Columns resampled by default (when present in the tracks)
+DEFAULT_COLUMNS = ('Age_gyr', 'LogL_lsun', 'LogR_rsun', 'Log_g', 'log_Teff', 'X_cen', 'Y_cen',
+                   'Z_sur', 'Mass_msun')
+
+# Weights of the distance metric along a track
+DEFAULT_WEIGHTS = {'log_Teff': 10.0, 'LogL_lsun': 1.0, 'log_age': 0.05}
+
+
+class EEPGrid:
+    """
+    Tracks of a grid resampled onto common EEPs.
+
+    Attributes
+    ----------
+    values : np.ndarray
+        (n_tracks, n_eeps, n_columns) array; NaN after the last primary EEP a track reaches.
+    columns : list of str
+        Column names of the last axis of `values`.
+    names : list of str
+        Track file names, sorted by ([Fe/H], mass).
+    mass, feh : np.ndarray
+        Initial mass and [Fe/H] of each track (from the file name, else Mass_msun; [Fe/H] NaN if unknown).
+    primary : np.ndarray
+        (n_tracks, n_primary) row positions of the primary EEPs in the original tracks (-1 if not reached).
+    primary_eeps : np.ndarray
+        EEP number of each primary EEP in the resampled tracks.
+    """
+
+    def __init__(self, values, columns, names, mass, feh, primary, primary_eeps):
+        self.values = values
+        self.columns = list(columns)
+        self.names = list(names)
+        self.mass = mass
+        self.feh = feh
+        self.primary = primary
+        self.primary_eeps = primary_eeps
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"EEPGrid({len(self)} tracks, {self.n_eeps} EEPs, columns={self.columns})"
+
+    @property
+    def n_eeps(self):
+        return self.values.shape[1]
+
+    def __getitem__(self, column):
+        """(n_tracks, n_eeps) array of one column."""
+        return self.values[:, :, self.columns.index(column)]
+
+    def n_reached(self):
+        """Number of valid EEPs of each track."""
+        return np.count_nonzero(~np.isnan(self.values[:, :, 0]), axis=1)
+
+    def track(self, k):
+        """Track k as a DataFrame with an 'EEP' column (rows past its last EEP are dropped)."""
+        n = self.n_reached()[k]
+        df = pd.DataFrame(self.values[k, :n], columns=self.columns)
+        df.insert(0, 'EEP', np.arange(n))
+        return df
+
+    def frames(self):
+        """List of (DataFrame, file name), in the same form as load_yrec_tracks() star lists."""
+        return [(self.track(k), name) for k, name in enumerate(self.names)]
+
+
+def _first_where(mask, lower, starts, ends, seg):
+    """
+    Per track, the first row >= lower[k] where mask is True, or -1.
+    A track with lower[k] == -1 (previous EEP not reached) gives -1.
+    """
+    n = len(mask)
+    idx = np.arange(n)
+    lower_rows = lower[seg]
+    cand = np.where(mask & (idx >= lower_rows) & (lower_rows >= 0), idx, n)
+    first = np.minimum.reduceat(cand, starts)
+    first[(first >= ends) | (lower < 0)] = -1
+    return first
+
+
+def _stack(tracks, names):
+    """Concatenate each of the given columns over every track: {name: float64 array of all rows}."""
+    return {name: np.concatenate([df[name].to_numpy() for df in tracks]).astype(np.float64, copy=False)
+            for name in names}
+
+
+def _segments(lengths):
+    """Start and end row of each track in the concatenated arrays, and the track number of each row."""
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    return starts, starts + lengths, np.repeat(np.arange(len(lengths)), lengths)
+
+
+def _primary_eeps(X, L, T, lengths, zams_dx=0.0015, rgb_slope=5.0, stride=5):
+    """find_primary_eeps() on concatenated X_cen, log L and log Teff arrays."""
+    starts, ends, seg = _segments(lengths)
+
+    prems = starts.copy()
+    zams = _first_where(X < X[starts][seg] - zams_dx, prems, starts, ends, seg)
+    iams = _first_where(X <= 0.3, zams, starts, ends, seg)
+    tams = _first_where(X <= 1e-4, iams, starts, ends, seg)
+
+    rgb, tip = _rgb_eeps(L, T, tams, starts, ends, seg, rgb_slope, stride)
+
+    primary = np.stack([prems, zams, iams, tams, rgb, tip], axis=1)
+    return np.where(primary >= 0, primary - starts[:, None], -1)
+
+
+def _rgb_eeps(L, T, tams, starts, ends, seg, rgb_slope=5.0, stride=5):
+    """RGBBase and RGBTip rows (in the concatenated arrays) after the given TAMS rows."""
+    ahead = np.minimum(np.arange(len(L)) + stride, ends[seg] - 1)
+    dL = L[ahead] - L
+    dT = T - T[ahead]
+    rgb = _first_where((dL > 0) & (dT >= 0) & (dL >= rgb_slope * dT), tams, starts, ends, seg)
+
+    # RGB tip: brightest model after RGBBase, if the track turns over after it
+    after = (np.arange(len(L)) >= rgb[seg]) & (rgb[seg] >= 0)
+    L_after = np.where(after, L, -np.inf)
+    L_max = np.maximum.reduceat(L_after, starts)
+    tip = _first_where(after & (L_after == L_max[seg]), rgb, starts, ends, seg)
+    tip[tip == ends - 1] = -1  # still climbing at the last model: the tip was not reached
+    return rgb, tip
+
+
+def find_primary_eeps(tracks, zams_dx=0.0015, rgb_slope=5.0, stride=5):
+    """
+    Find the primary EEPs of a batch of tracks.
+
+    Parameters
+    ----------
+    tracks : list of pd.DataFrame
+        Tracks with X_cen, LogL_lsun and log_Teff columns (none of them empty).
+    zams_dx : float, default 0.0015
+        Drop of X_cen below its initial value that marks the ZAMS.
+    rgb_slope : float, default 5.0
+        Minimum d(log L) / -d(log Teff) that marks the base of the RGB.
+    stride : int, default 5
+        Number of models over which that slope is measured (smooths numerical noise).
+
+    Returns
+    -------
+    np.ndarray
+        (n_tracks, len(PRIMARY_EEPS)) row positions within each track, -1 where not reached.
+    """
+    col = _stack(tracks, ('X_cen', 'LogL_lsun', 'log_Teff'))
+    lengths = np.array([len(df) for df in tracks])
+    return _primary_eeps(col['X_cen'], col['LogL_lsun'], col['log_Teff'], lengths, zams_dx, rgb_slope, stride)
+
+
+# Evolutionary phases recorded by PhaseIndex, in track order
+PHASES = ('preMS', 'MS', 'SGB', 'RGB', 'postRGB')
+
+
+class PhaseIndex:
+    """
+    Row ranges of the evolutionary phases of every track in a list.
+
+    The boundaries are found once for the whole list (in the same batch way
+    as the primary EEPs): ZAMS, TAMS (first model with X_cen <= 1e-4, the
+    subgiant cut of load_yrec_tracks), RGBBase and RGBTip. Selecting a phase
+    then only slices each track with .iloc[start:stop], which returns a view
+    of the loaded data instead of a copy, so selecting phases over thousands
+    of tracks costs one slice per track and no extra memory.
+
+    A phase a track never reaches is empty. Without LogL_lsun and log_Teff
+    columns, everything after the TAMS is counted as SGB.
+
+    Parameters
+    ----------
+    track_list : list of (pd.DataFrame, str) or list of pd.DataFrame
+        Tracks with at least an X_cen column, e.g. one of the load_yrec_tracks() star lists.
+    zams_dx, rgb_slope, stride
+        As in find_primary_eeps().
+
+    Attributes
+    ----------
+    bounds : np.ndarray
+        (n_tracks, len(PHASES) + 1) row positions; phase j of track k is rows bounds[k, j]:bounds[k, j + 1].
+    """
+
+    def __init__(self, track_list, zams_dx=0.0015, rgb_slope=5.0, stride=5):
+        entries = [item if isinstance(item, tuple) else (item, f'track_{k}') for k, item in enumerate(track_list)]
+        self.tracks = [df for df, _ in entries]
+        self.names = [name for _, name in entries]
+        lengths = np.array([len(df) for df in self.tracks], dtype=np.int64)
+        self.bounds = np.zeros((len(entries), len(PHASES) + 1), dtype=np.int64)
+        self.bounds[:, 1:] = lengths[:, None]
+
+        nonempty = np.flatnonzero(lengths > 0)
+        if not len(nonempty):
+            return
+        tracks = [self.tracks[k] for k in nonempty]
+        has_hr = all('LogL_lsun' in df.columns and 'log_Teff' in df.columns for df in tracks)
+        col = _stack(tracks, ('X_cen', 'LogL_lsun', 'log_Teff') if has_hr else ('X_cen',))
+        starts, ends, seg = _segments(lengths[nonempty])
+
+        X = col['X_cen']
+        zams = _first_where(X < X[starts][seg] - zams_dx, starts, starts, ends, seg)
+        tams = _first_where(X <= 1e-4, starts, starts, ends, seg)
+        if has_hr:
+            rgb, tip = _rgb_eeps(col['LogL_lsun'], col['log_Teff'], tams, starts, ends, seg, rgb_slope, stride)
+            tip = np.where(tip >= 0, tip + 1, -1)  # the tip model belongs to the RGB
+        else:
+            rgb = tip = np.full(len(tracks), -1)
+
+        # Phase starts within each track; a boundary that was not reached is the end of the track,
+        # and each boundary is at most the next one (so skipped phases are empty)
+        cuts = np.stack([zams, tams, rgb, tip], axis=1)
+        cuts = np.where(cuts >= 0, cuts - starts[:, None], lengths[nonempty][:, None])
+        cuts = np.minimum.accumulate(cuts[:, ::-1], axis=1)[:, ::-1]
+        self.bounds[nonempty, 1:-1] = cuts
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __repr__(self):
+        return f"PhaseIndex({len(self)} tracks, phases={PHASES})"
+
+    def _span(self, first, last=None):
+        if last is None:
+            last = first
+        if first not in PHASES or last not in PHASES:
+            raise ValueError(f"Unknown phase; choose from {PHASES}")
+        j0, j1 = PHASES.index(first), PHASES.index(last)
+        if j1 < j0:
+            raise ValueError(f"'{last}' comes before '{first}'")
+        return j0, j1 + 1
+
+    def rows(self, first, last=None):
+        """
+        (n_tracks, 2) array of the [start, stop) rows of a phase, or of the
+        consecutive phases from `first` to `last`.
+        """
+        j0, j1 = self._span(first, last)
+        return self.bounds[:, [j0, j1]]
+
+    def select(self, first, last=None, skip_empty=True):
+        """
+        Slice every track to a phase (or the consecutive phases from `first` to `last`).
+
+        Returns
+        -------
+        list of (pd.DataFrame, str)
+            Row slices (views) of the tracks, with their file names.
+        """
+        j0, j1 = self._span(first, last)
+        selected = []
+        for df, name, (start, stop) in zip(self.tracks, self.names, self.bounds[:, [j0, j1]]):
+            if stop > start or not skip_empty:
+                selected.append((df.iloc[start:stop], name))
+        return selected
+
+
+def _track_mass_feh(df, name):
+    """Initial mass and [Fe/H] of a track, from its file name (else Mass_msun, [Fe/H] unknown)."""
+    decoded = filestr_to_MFeH(name)
+    if decoded is not None:
+        return decoded[0], decoded[1]
+    return (float(df['Mass_msun'].iloc[0]) if 'Mass_msun' in df.columns else np.nan), np.nan
+
+
+def _check_options(n_points, weights):
+    if len(n_points) != len(PRIMARY_EEPS) - 1:
+        raise ValueError(f"n_points needs {len(PRIMARY_EEPS) - 1} entries, one per interval between primary EEPs")
+    return DEFAULT_WEIGHTS if weights is None else weights
+
+
+def _resample(tracks, columns, n_points, weights, **primary_kwargs):
+    """
+    Core of build_eeps(): resample non-empty tracks onto common EEPs.
+    Returns (values, primary, primary_eeps) in the order of `tracks`.
+    """
+    # Every column needed below, converted once per track
+    metric = [name for name in weights if name != 'log_age']
+    needed = list(dict.fromkeys(['X_cen', 'LogL_lsun', 'log_Teff', 'Age_gyr'] + metric + list(columns)))
+    col = _stack(tracks, needed)
+
+    lengths = np.array([len(df) for df in tracks])
+    starts, ends, seg = _segments(lengths)
+    primary = _primary_eeps(col['X_cen'], col['LogL_lsun'], col['log_Teff'], lengths, **primary_kwargs)
+
+    # Distance along each track, measured from its first model
+    step_sq = np.zeros(lengths.sum())
+    for name, w in weights.items():
+        values = np.log10(np.clip(col['Age_gyr'], 1e-12, None)) if name == 'log_age' else col[name]
+        step_sq += w * np.diff(values, prepend=values[0])**2
+    step = np.sqrt(step_sq)
+    step[starts] = 0.0
+    # cumulative sum per track (a global cumsum minus offsets would round differently per batch)
+    dist = np.concatenate([np.cumsum(step[a:b]) for a, b in zip(starts, ends)])
+
+    # Target distances: n_points[j] EEPs from primary j up to (not including) primary j+1, then the last primary
+    n_eeps = int(np.sum(n_points)) + 1
+    primary_eeps = np.concatenate([[0], np.cumsum(n_points)])
+    targets = np.full((len(tracks), n_eeps), np.nan)
+    for j, n in enumerate(n_points):
+        a, b = primary[:, j], primary[:, j + 1]
+        ok = (a >= 0) & (b >= 0)
+        d_a = dist[starts[ok] + a[ok]]
+        d_b = dist[starts[ok] + b[ok]]
+        frac = np.arange(n) / n
+        targets[ok, primary_eeps[j]:primary_eeps[j + 1]] = d_a[:, None] + (d_b - d_a)[:, None] * frac
+        last = ok & ((j + 1 == len(n_points)) | (primary[:, min(j + 2, len(PRIMARY_EEPS) - 1)] < 0))
+        targets[last, primary_eeps[j + 1]] = dist[starts[last] + b[last]]
+
+    # Bracket every target with one searchsorted for the whole batch (each track's distances
+    # shifted into their own range), then weight with the unshifted distances so a track
+    # gets the same values whether it is resampled alone or in a batch
+    shift = np.arange(len(tracks)) * (dist.max() + 1.0)
+    valid = ~np.isnan(targets)
+    track_of = np.nonzero(valid)[0]
+    t = targets[valid]
+    lo = np.searchsorted(dist + shift[seg], t + shift[track_of], side='right') - 1
+    lo = np.clip(lo, starts[track_of], np.maximum(ends[track_of] - 2, starts[track_of]))
+    hi = np.minimum(lo + 1, ends[track_of] - 1)
+    span = dist[hi] - dist[lo]
+    w = np.divide(t - dist[lo], span, out=np.zeros_like(t), where=span > 0)
+
+    values = np.full((len(tracks), n_eeps, len(columns)), np.nan)
+    for c, name in enumerate(columns):
+        y = col[name]
+        values[:, :, c][valid] = y[lo] + w * (y[hi] - y[lo])
+    return values, primary, primary_eeps
+
+
+def _sorted_grid(values, columns, names, mass, feh, primary, primary_eeps):
+    """EEPGrid with the tracks sorted by ([Fe/H], mass)."""
+    mass, feh = np.asarray(mass, dtype=np.float64), np.asarray(feh, dtype=np.float64)
+    order = np.lexsort((mass, feh))
+    return EEPGrid(values[order], columns, [names[k] for k in order], mass[order], feh[order],
+                   primary[order], primary_eeps)
+
+
+def build_eeps(track_list, columns=None, n_points=DEFAULT_POINTS, weights=None, **primary_kwargs):
+    """
+    Resample a grid of tracks onto common EEPs.
+
+    Parameters
+    ----------
+    track_list : list of (pd.DataFrame, str) or list of pd.DataFrame
+        Tracks, e.g. one of the lists in load_yrec_tracks()['star_lists'].
+    columns : list of str, optional
+        Columns to resample. Defaults to the DEFAULT_COLUMNS present in the tracks.
+    n_points : sequence of int, default DEFAULT_POINTS
+        Number of secondary EEPs between each pair of consecutive primary EEPs.
+    weights : dict, optional
+        Weights of the distance metric: any track columns plus 'log_age'
+        (log10 of Age_gyr). Defaults to DEFAULT_WEIGHTS.
+    **primary_kwargs
+        Passed to find_primary_eeps() (zams_dx, rgb_slope, stride).
+
+    Returns
+    -------
+    EEPGrid
+        Tracks sorted by ([Fe/H], mass), resampled onto sum(n_points) + 1 EEPs.
+    """
+    weights = _check_options(n_points, weights)
+
+    entries = [item if isinstance(item, tuple) else (item, f'track_{k}') for k, item in enumerate(track_list)]
+    empty = [name for df, name in entries if len(df) == 0]
+    for name in empty:
+        print(f"⚠️ '{name}' is empty; skipped.")
+    entries = [(df, name) for df, name in entries if len(df) > 0]
+    if not entries:
+        raise ValueError("No tracks to resample")
+    tracks = [df for df, _ in entries]
+
+    if columns is None:
+        columns = [c for c in DEFAULT_COLUMNS if c in tracks[0].columns]
+    elif isinstance(columns, str):
+        columns = [columns]
+
+    values, primary, primary_eeps = _resample(tracks, columns, n_points, weights, **primary_kwargs)
+    mass, feh = zip(*[_track_mass_feh(df, name) for df, name in entries])
+    return _sorted_grid(values, columns, [name for _, name in entries], mass, feh, primary, primary_eeps)
+
+
+class EEPAccumulator:
+    """
+    Builds an EEPGrid one track at a time, for grids that do not fit in memory.
+
+    Each track passed to add() is resampled onto the EEPs right away and only
+    its (n_eeps, n_columns) EEP array is kept, so peak memory is one raw track
+    (or `batch_size` of them) plus the EEP arrays, whatever the grid size.
+    The result is the same as build_eeps() on the whole list.
+
+    Parameters
+    ----------
+    columns, n_points, weights, **primary_kwargs
+        As in build_eeps().
+    batch_size : int, default 1
+        Number of raw tracks held before they are resampled together. Larger
+        batches are faster (fewer, larger NumPy calls) but hold more raw tracks.
+
+    Example
+    -------
+    acc = EEPAccumulator()
+    for list_name, fname, df in iter_tracks("/path/to/grid"):
+        acc.add(df, fname)
+    eeps = acc.grid()
+    """
+
+    def __init__(self, columns=None, n_points=DEFAULT_POINTS, weights=None, batch_size=1, **primary_kwargs):
+        self.weights = _check_options(n_points, weights)
+        self.columns = [columns] if isinstance(columns, str) else columns
+        self.n_points = n_points
+        self.batch_size = max(1, batch_size)
+        self.primary_kwargs = primary_kwargs
+        self._pending = []
+        self._values, self._primary = [], []
+        self._names, self._mass, self._feh = [], [], []
+        self._primary_eeps = None
+
+    def __len__(self):
+        return len(self._names) + len(self._pending)
+
+    def add(self, df, name):
+        """Add one track (its EEP array is computed once `batch_size` tracks are pending)."""
+        if len(df) == 0:
+            print(f"⚠️ '{name}' is empty; skipped.")
+            return
+        if self.columns is None:
+            self.columns = [c for c in DEFAULT_COLUMNS if c in df.columns]
+        self._pending.append((df, name))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        tracks = [df for df, _ in self._pending]
+        values, primary, self._primary_eeps = _resample(tracks, self.columns, self.n_points, self.weights,
+                                                        **self.primary_kwargs)
+        self._values.append(values)
+        self._primary.append(primary)
+        for df, name in self._pending:
+            mass, feh = _track_mass_feh(df, name)
+            self._names.append(name)
+            self._mass.append(mass)
+            self._feh.append(feh)
+        self._pending = []
+
+    def grid(self):
+        """Return the EEPGrid of every track added so far, sorted by ([Fe/H], mass)."""
+        self._flush()
+        if not self._values:
+            raise ValueError("No tracks to resample")
+        return _sorted_grid(np.concatenate(self._values), self.columns, self._names, self._mass, self._feh,
+                            np.concatenate(self._primary), self._primary_eeps)
+
+
+# Example usage (uncomment for testing):
+# out = load_yrec_tracks("/path/to/grid", load_subgiants=False)
+# eeps = build_eeps(out['star_lists']['grid_yrectracks'])
+# print(eeps, eeps.primary[:5])
@@ -0,0 +1,68 @@
+"""
+fileio.py
+
+atomic_write(): the one way the tools write a file that other runs read back
+(caches, indexes, packed grids, namelists).
+
+The content goes to a temporary file next to the target, which is then
+renamed over it, so readers see either the old file or the complete new one,
+never a partial write. The temporary name is unique to the process and
+thread, so parallel writers never share one, and it is created with open(),
+so it gets the usual umask permissions rather than mkstemp's 0600. When the
+target already exists its permission bits are copied over, so rewriting a
+file does not change its mode.
+
+Example:
+    from fileio import atomic_write
+    atomic_write("/path/to/index.npz", lambda f: np.savez(f, **arrays))
+"""
+
+import os
+import shutil
+import threading
+
+
+def atomic_write(path, write, text=False, fsync=False):
+    """
+    Write a file through a temporary file in the same folder and rename it into place.
+
+    Parameters
+    ----------
+    path : str
+        File to write.
+    write : callable
+        Called with the open temporary file; writes the content.
+    text : bool, default False
+        Open the temporary file in text mode (newline='', so line endings are
+        written as given) instead of binary mode.
+    fsync : bool, default False
+        Flush the content to disk before the rename, so that after a crash the
+        file holds either the old or the new content (the rename alone only
+        orders the two for other processes).
+
+    If write() or the rename fails, the temporary file is removed and the
+    exception is raised; path is left as it was.
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(folder, f'.{name}.{os.getpid()}-{threading.get_ident()}.tmp')
+    try:
+        with open(tmp_path, 'w', newline='') if text else open(tmp_path, 'wb') as f:
+            write(f)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            shutil.copymode(path, tmp_path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Example usage (uncomment for testing):
+# atomic_write("/tmp/example.txt", lambda f: f.write("hello\n"), text=True)
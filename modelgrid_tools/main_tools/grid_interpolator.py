@@ -0,0 +1,222 @@
+"""
+grid_interpolator.py
+
+Interpolates a mass-[Fe/H] grid of YREC tracks to the mass, [Fe/H] and log g
+of many stars at once, returning ages (and any other EEP column).
+
+The EEP tracks (eep.py) are arranged once into a (n_feh, n_mass, n_eeps)
+cube along the sorted unique mass and [Fe/H] values of the grid, which is the
+index used for every query: a star's bracketing tracks are found with
+np.searchsorted on the two axes, its track is the bilinear blend of the four
+corner tracks, and the EEP where that track reaches the star's log g (searched
+from the ZAMS onward) gives the interpolated values. When log g never
+increases along the grid's tracks the crossing is found by bisection, else
+by scanning the EEPs. Stars are processed in
+chunks so memory stays bounded for catalogs of millions of stars
+(see benchmarks/bench_interpolator.py for the throughput in stars/s).
+
+Example:
+    from eep import build_eeps
+    from grid_interpolator import GridInterpolator
+    interp = GridInterpolator(build_eeps(out['star_lists']['grid_yrectracks']))
+    result = interp(catalog['mass'], catalog['feh'], catalog['logg'], columns=['Age_gyr', 'LogR_rsun'])
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _axis_weights(axis, x):
+    """
+    Bracketing positions and linear weight of x on a sorted axis.
+    Returns (i0, i1, w, inside); a single-value axis puts all the weight on it,
+    and only x at that value is inside.
+    """
+    if len(axis) == 1:
+        zeros = np.zeros(len(x), dtype=np.int64)
+        return zeros, zeros, np.zeros(len(x)), np.isclose(x, axis[0], rtol=0, atol=1e-9)
+    i0 = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+    w = (x - axis[i0]) / (axis[i0 + 1] - axis[i0])
+    inside = (x >= axis[0]) & (x <= axis[-1])
+    return i0, i0 + 1, w, inside
+
+
+class GridInterpolator:
+    """
+    Vectorized interpolation of an EEP grid in mass, [Fe/H] and log g.
+
+    Parameters
+    ----------
+    eeps : EEPGrid
+        Output of eep.build_eeps() for a mass-[Fe/H] grid (needs a 'Log_g' column).
+    start_eep : int, optional
+        First EEP searched for the log g crossing. Defaults to the ZAMS.
+
+    Attributes
+    ----------
+    mass_axis, feh_axis : np.ndarray
+        Sorted unique masses and [Fe/H] values of the grid.
+    feh_known : bool
+        False if no track name carries an [Fe/H] (feh_axis is then [0.]).
+    cube : np.ndarray
+        (n_feh, n_mass, n_eeps, n_columns) EEP values; NaN where a track is missing.
+
+    Notes
+    -----
+    A grid with a single mass or [Fe/H] value is only interpolated along the
+    other axis, and stars must sit at that value. When no track name carries
+    an [Fe/H] the grid is taken as single-metallicity and the [Fe/H] of the
+    stars is ignored. Stars outside the grid, or whose log g is not reached
+    by all four bracketing tracks, get NaN. Two tracks at the same mass and
+    [Fe/H] raise a ValueError.
+    """
+
+    def __init__(self, eeps, start_eep=None):
+        if 'Log_g' not in eeps.columns:
+            raise ValueError("The EEP grid needs a 'Log_g' column")
+        feh = eeps.feh
+        self.feh_known = not np.isnan(feh).all()
+        if not self.feh_known:  # no [Fe/H] in the file names: a single-metallicity grid
+            feh = np.zeros(len(eeps))
+        if np.isnan(feh).any() or np.isnan(eeps.mass).any():
+            raise ValueError("Every track needs a mass and [Fe/H] (decoded from the make_MFeHgrid file name)")
+
+        self.columns = list(eeps.columns)
+        self.mass_axis = np.unique(eeps.mass)
+        self.feh_axis = np.unique(feh)
+        self.cube = np.full((len(self.feh_axis), len(self.mass_axis)) + eeps.values.shape[1:], np.nan)
+        f = np.searchsorted(self.feh_axis, feh)
+        m = np.searchsorted(self.mass_axis, eeps.mass)
+        cell = f * len(self.mass_axis) + m
+        cells, counts = np.unique(cell, return_counts=True)
+        if (counts > 1).any():
+            duplicates = [', '.join(eeps.names[k] for k in np.flatnonzero(cell == c)) for c in cells[counts > 1]]
+            raise ValueError("Several tracks at the same mass and [Fe/H]: " + '; '.join(duplicates))
+        self.cube[f, m] = eeps.values
+        self.start_eep = int(eeps.primary_eeps[1]) if start_eep is None else start_eep
+
+        # Log g from start_eep on, one contiguous row per (feh, mass) track: the array searched for every star
+        n_mass = len(self.mass_axis)
+        self._logg = np.ascontiguousarray(
+            self.cube[:, :, self.start_eep:, self.columns.index('Log_g')].reshape(-1, self.cube.shape[2] - self.start_eep))
+        self._n_mass = n_mass
+
+        # If log g never increases along any track, the blend of four tracks doesn't either,
+        # and the crossing can be found by bisection instead of scanning every EEP
+        steps = np.diff(self._logg, axis=1)
+        self.monotonic = bool(np.all((steps <= 0) | np.isnan(steps)))
+
+    def __repr__(self):
+        return (f"GridInterpolator({len(self.mass_axis)} masses x {len(self.feh_axis)} [Fe/H], "
+                f"{self.cube.shape[2]} EEPs)")
+
+    def _chunk(self, mass, feh, logg, columns):
+        n = len(mass)
+        out = np.full((n, len(columns) + 1), np.nan)
+
+        m0, m1, wm, in_m = _axis_weights(self.mass_axis, mass)
+        f0, f1, wf, in_f = _axis_weights(self.feh_axis, feh)
+        corners = [(f0, m0, (1 - wf) * (1 - wm)), (f0, m1, (1 - wf) * wm),
+                   (f1, m0, wf * (1 - wm)), (f1, m1, wf * wm)]
+
+        cells = [(fi * self._n_mass + mi, w) for fi, mi, w in corners]
+        n_e = self._logg.shape[1]
+
+        def blended_logg(rows, eep):
+            """Log g of the blended track of stars `rows` at EEP positions `eep` (relative to start_eep)."""
+            return sum(w[rows] * self._logg[cell[rows], eep] for cell, w in cells)
+
+        if self.monotonic:
+            # Bisection for the first EEP at or below the star's log g (NaN, past a track's end, counts as below)
+            every = np.arange(n)
+            lo = np.zeros(n, dtype=np.int64)
+            hi = np.full(n, n_e, dtype=np.int64)
+            for _ in range(int(np.ceil(np.log2(n_e + 1)))):
+                mid = np.minimum((lo + hi) // 2, n_e - 1)
+                value = blended_logg(every, mid)
+                below = (value <= logg) | np.isnan(value)
+                hi = np.where(below & (lo < hi), mid, hi)
+                lo = np.where(~below & (lo < hi), mid + 1, lo)
+            k = lo
+            ok = (k > 0) & (k < n_e)
+            k_safe = np.clip(k, 1, n_e - 1)
+            g_hi = blended_logg(every, k_safe - 1)
+            g_lo = blended_logg(every, k_safe)
+            found = ok & ~np.isnan(g_lo) & ~np.isnan(g_hi) & in_m & in_f
+            rows = np.flatnonzero(found)
+            if not len(rows):
+                return out
+            k, g_hi, g_lo = k[rows], g_hi[rows], g_lo[rows]
+        else:
+            # Log g along the blended track of each star, from start_eep on
+            track_logg = None
+            for cell, w in cells:
+                term = self._logg.take(cell, axis=0)
+                term *= w[:, None]
+                if track_logg is None:
+                    track_logg = term
+                else:
+                    track_logg += term
+
+            # First EEP at or below the star's log g (NaN EEPs compare False)
+            below = track_logg <= logg[:, None]
+            k = np.argmax(below, axis=1)
+            found = below[np.arange(n), k] & (k > 0) & in_m & in_f
+            rows = np.flatnonzero(found)
+            if not len(rows):
+                return out
+            k = k[rows]
+            g_hi = track_logg[rows, k - 1]
+            g_lo = track_logg[rows, k]
+
+        frac = (g_hi - logg[rows]) / (g_hi - g_lo)
+        out[rows, 0] = self.start_eep + k - 1 + frac
+
+        # Blend only the two EEPs around the crossing, for the requested columns
+        eep_a = self.start_eep + k - 1
+        for c, name in enumerate(columns):
+            j = self.columns.index(name)
+            at_a = sum(w[rows] * self.cube[fi[rows], mi[rows], eep_a, j] for fi, mi, w in corners)
+            at_b = sum(w[rows] * self.cube[fi[rows], mi[rows], eep_a + 1, j] for fi, mi, w in corners)
+            out[rows, c + 1] = at_a + frac * (at_b - at_a)
+        return out
+
+    def __call__(self, mass, feh, logg, columns=('Age_gyr',), chunk_size=5000):
+        """
+        Interpolate the grid to each star.
+
+        Parameters
+        ----------
+        mass, feh, logg : array-like
+            Mass (Msun), [Fe/H] and log g of each star.
+        columns : list of str, default ('Age_gyr',)
+            EEP columns to return.
+        chunk_size : int, default 5000
+            Stars per chunk; peak memory is about chunk_size * n_eeps * 20 bytes.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per star: the fractional 'EEP' and the requested columns (NaN if off the grid).
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        missing = [c for c in columns if c not in self.columns]
+        if missing:
+            raise ValueError(f"Columns not in the EEP grid: {', '.join(missing)}")
+        mass = np.asarray(mass, dtype=np.float64).ravel()
+        if not self.feh_known:
+            feh = 0.0
+        feh = np.broadcast_to(np.asarray(feh, dtype=np.float64), mass.shape).ravel()
+        logg = np.broadcast_to(np.asarray(logg, dtype=np.float64), mass.shape).ravel()
+
+        out = np.empty((len(mass), len(columns) + 1))
+        for start in range(0, len(mass), chunk_size):
+            stop = start + chunk_size
+            out[start:stop] = self._chunk(mass[start:stop], feh[start:stop], logg[start:stop], columns)
+        return pd.DataFrame(out, columns=['EEP'] + list(columns))
+
+
+# Example usage (uncomment for testing):
+# interp = GridInterpolator(eeps)
+# print(interp([1.0, 1.05], [0.0, -0.1], [4.2, 3.9]))
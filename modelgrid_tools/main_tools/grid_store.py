@@ -0,0 +1,275 @@
+"""
+grid_store.py
+
+Packs a finished YREC grid (the loose `m113fehm005_base.track` files written by
+make_MFeHgrid) into one binary file, and queries it by mass and [Fe/H].
+
+File layout (`.ygrid`):
+
+    magic         8 bytes, b'YGRID01\\n'
+    data          float64 column arrays, track after track; inside each
+                  track every column is contiguous (nrows values)
+    header        UTF-8 JSON: column names and dtypes, and one entry per track
+                  with its file name, mass, [Fe/H], base name, row offset and
+                  row count
+    trailer       8-byte little-endian header length + the magic again
+
+The header sits at the end so the grid can be written in one streaming pass,
+one track at a time. Mass and [Fe/H] are decoded from each file name with
+make_modelgrid.filestr_to_MFeH() and the tracks are sorted by (mass, [Fe/H]),
+so a query is a binary search on the index. The data is memory-mapped, so a
+query only reads the byte ranges of the tracks and columns it returns.
+
+Example:
+    from grid_store import build_grid_store, GridStore
+    build_grid_store("/path/to/output", "/path/to/grid.ygrid")
+    with GridStore("/path/to/grid.ygrid") as grid:
+        tracks = grid.query(mass=(0.9, 1.1), feh=-0.25, columns=['Age_gyr', 'LogL_lsun', 'log_Teff'])
+        for df, fname in tracks:
+            ...
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from fileio import atomic_write
+from load_yrec_tracks import find_track_files, read_track
+from make_modelgrid import filestr_to_MFeH
+
+
+MAGIC = b'YGRID01\n'
+_TRAILER = struct.Struct('<Q')
+
+
+def build_grid_store(track_dirs, out_path, recursive=True, columns=None, cache=True, cache_dir=None):
+    """
+    Pack every .track file under `track_dirs` into a single grid file.
+
+    Parameters
+    ----------
+    track_dirs : str or list of str
+        Directory or list of directories to search for .track files.
+    out_path : str
+        Path of the grid file to write (conventionally ending in `.ygrid`).
+    recursive : bool
+        Whether to search subdirectories recursively.
+    columns : list of str, optional
+        Only store these columns. By default every column of the first track is
+        stored (columns missing from a later track are filled with NaN).
+    cache : bool, default True
+        Read the tracks through track_cache.py.
+    cache_dir : str, optional
+        Folder for the track cache entries.
+
+    Returns
+    -------
+    pd.DataFrame
+        The track index written to the file (one row per track).
+    """
+    if isinstance(columns, str):
+        columns = [columns]
+    track_files = find_track_files(track_dirs, recursive)
+
+    # Sort by (mass, [Fe/H]) so queries can binary-search the index; undecodable names go last
+    entries = []
+    for filepath in track_files:
+        decoded = filestr_to_MFeH(filepath)
+        if decoded is None:
+            print(f"⚠️ Cannot decode mass/[Fe/H] from '{os.path.basename(filepath)}'; stored without them.")
+            decoded = (np.nan, np.nan, '')
+        entries.append((filepath, *decoded))
+    entries.sort(key=lambda e: (np.isnan(e[1]), e[1], e[2], e[0]))
+
+    tracks = []
+
+    def write(f):
+        nonlocal columns
+        int_columns = None
+        offset = 0
+        f.write(MAGIC)
+        for filepath, mass, feh, base in entries:
+            try:
+                df = read_track(filepath, cache, cache_dir)
+            except Exception as e:
+                print(f"Failed to read {os.path.basename(filepath)} with tracker: {e}")
+                continue
+            if columns is None:
+                columns = [str(c) for c in df.columns]
+            if int_columns is None:
+                int_columns = {c for c in columns if c in df.columns and df[c].dtype.kind in 'iu'}
+
+            block = np.full((len(columns), len(df)), np.nan, dtype='<f8')
+            for j, name in enumerate(columns):
+                if name in df.columns:
+                    block[j] = df[name].to_numpy(dtype=np.float64)
+                if name in int_columns and (name not in df.columns or df[name].dtype.kind not in 'iu'):
+                    int_columns.discard(name)
+            f.write(block.tobytes())
+
+            tracks.append({'file': os.path.basename(filepath), 'mass': mass, 'feh': feh, 'base': base,
+                           'offset': offset, 'nrows': len(df)})
+            offset += block.size
+
+        header = json.dumps({'columns': columns or [],
+                             'int_columns': sorted(int_columns or []),
+                             'tracks': tracks}).encode()
+        f.write(header)
+        f.write(_TRAILER.pack(len(header)) + MAGIC)
+
+    atomic_write(out_path, write)
+
+    print(f"✅ Packed {len(tracks)} tracks into {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB).")
+    return GridStore._index_frame(tracks)
+
+
+class GridStore:
+    """
+    Read-only view of a grid file written by build_grid_store().
+
+    Parameters
+    ----------
+    path : str
+        Path to the `.ygrid` file.
+
+    Attributes
+    ----------
+    columns : list of str
+        Column names stored for every track.
+    index : pd.DataFrame
+        One row per track: file, mass, feh, base, offset, nrows (sorted by mass, then [Fe/H]).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a grid store file: {path}")
+            f.seek(-(_TRAILER.size + len(MAGIC)), os.SEEK_END)
+            trailer = f.read()
+            if trailer[_TRAILER.size:] != MAGIC:
+                raise ValueError(f"Truncated grid store file: {path}")
+            (header_len,) = _TRAILER.unpack(trailer[:_TRAILER.size])
+            f.seek(-(_TRAILER.size + len(MAGIC) + header_len), os.SEEK_END)
+            header = json.loads(f.read(header_len))
+            data_end = f.tell() - header_len
+
+        self.columns = header['columns']
+        self._int_columns = set(header['int_columns'])
+        self.index = self._index_frame(header['tracks'])
+        self._mass = self.index['mass'].to_numpy()
+        self._feh = self.index['feh'].to_numpy()
+        self._offset = self.index['offset'].to_numpy()
+        self._nrows = self.index['nrows'].to_numpy()
+        n_values = (data_end - len(MAGIC)) // 8
+        self._data = np.memmap(path, dtype='<f8', mode='r', offset=len(MAGIC), shape=(n_values,)) \
+            if n_values else np.empty(0)
+
+    @staticmethod
+    def _index_frame(tracks):
+        index = pd.DataFrame(tracks, columns=['file', 'mass', 'feh', 'base', 'offset', 'nrows'])
+        return index.astype({'mass': float, 'feh': float, 'offset': np.int64, 'nrows': np.int64})
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the memory map."""
+        self._data = None
+
+    def __repr__(self):
+        return f"GridStore('{self.path}', {len(self)} tracks, {len(self.columns)} columns)"
+
+    def _match(self, values, want, lo=0, hi=None, atol=1e-6):
+        """Positions in [lo, hi) whose value equals `want` or lies inside a (min, max) range."""
+        hi = len(values) if hi is None else hi
+        sub = values[lo:hi]
+        if want is None:
+            keep = np.ones(len(sub), dtype=bool)
+        elif np.ndim(want) == 1 and len(want) == 2:
+            keep = (sub >= want[0] - atol) & (sub <= want[1] + atol)
+        else:
+            keep = np.isclose(sub, want, rtol=0, atol=atol)
+        return lo + np.flatnonzero(keep)
+
+    def select(self, mass=None, feh=None):
+        """
+        Return the index rows matching a mass and [Fe/H] selection.
+
+        Parameters
+        ----------
+        mass, feh : float, (min, max) tuple, or None
+            A single value (matched to the file-name precision), an inclusive
+            range, or None for no constraint.
+        """
+        lo, hi = 0, len(self)
+        if mass is not None:
+            lo_m, hi_m = (mass if np.ndim(mass) == 1 else (mass, mass))
+            # the index is sorted by mass (NaN masses last), so a range is a binary search
+            n_valid = int(np.count_nonzero(~np.isnan(self._mass)))
+            lo = int(np.searchsorted(self._mass[:n_valid], lo_m - 1e-6, side='left'))
+            hi = int(np.searchsorted(self._mass[:n_valid], hi_m + 1e-6, side='right'))
+        rows = self._match(self._feh, feh, lo, hi)
+        return self.index.iloc[rows]
+
+    def _frame(self, row, columns):
+        offset, nrows = self._offset[row], self._nrows[row]
+        data = {}
+        for name, j in columns:
+            start = offset + j * nrows
+            values = np.array(self._data[start:start + nrows])  # copies only this byte range
+            data[name] = values.astype(np.int64) if name in self._int_columns else values
+        return pd.DataFrame(data, columns=[name for name, _ in columns])
+
+    def _column_positions(self, columns):
+        if columns is None:
+            columns = self.columns
+        elif isinstance(columns, str):
+            columns = [columns]
+        missing = [c for c in columns if c not in self.columns]
+        if missing:
+            raise ValueError(f"Columns not found in {self.path}: {', '.join(missing)}")
+        return [(c, self.columns.index(c)) for c in columns]
+
+    def track(self, fname, columns=None):
+        """Return one track (by its .track file name) as a DataFrame."""
+        rows = np.flatnonzero(self.index['file'].to_numpy() == os.path.basename(fname))
+        if not len(rows):
+            raise KeyError(f"{fname} is not in {self.path}")
+        return self._frame(rows[0], self._column_positions(columns))
+
+    def query(self, mass=None, feh=None, columns=None):
+        """
+        Return the tracks matching a mass and [Fe/H] selection.
+
+        Parameters
+        ----------
+        mass, feh : float, (min, max) tuple, or None
+            See select().
+        columns : list of str, optional
+            Only read these columns.
+
+        Returns
+        -------
+        list of (pd.DataFrame, str)
+            (track, file name) pairs, as in the lists returned by load_yrec_tracks().
+        """
+        positions = self._column_positions(columns)
+        rows = self.select(mass, feh).index
+        return [(self._frame(row, positions), self.index.at[row, 'file']) for row in rows]
+
+
+# Example usage (uncomment for testing):
+# build_grid_store("/path/to/output", "/path/to/grid.ygrid")
+# grid = GridStore("/path/to/grid.ygrid")
+# print(grid.index.head())
+# tracks = grid.query(mass=(0.9, 1.1), feh=-0.25, columns=['Age_gyr', 'LogL_lsun'])
@@ -0,0 +1,145 @@
+"""
+isochrones.py
+
+Builds isochrones from a grid of EEP tracks (see eep.py).
+
+At fixed [Fe/H], the age of EEP k is a function of initial mass. An isochrone
+of age t is found by interpolating, at every EEP, the tracks onto the mass
+whose age at that EEP is t (in log age). All requested ages and all EEPs are
+handled together: the (EEP, mass) ages are flattened onto one axis, each EEP
+shifted into its own range, so every output column is a single np.interp call
+for hundreds of ages at once.
+
+Isochrones are keyed on their age rounded to `iso_round` decimals.
+load_yrec_tracks(load_isochrones=True) caches them on disk with the other
+derived products (see derived_cache.py).
+
+Example:
+    from eep import build_eeps
+    from isochrones import make_isochrones
+    eeps = build_eeps(out['star_lists']['grid_yrectracks'])
+    isos = make_isochrones(eeps, ages=np.arange(1, 13, 0.05), feh=-0.25)
+    iso = isos[4.5]       # DataFrame: EEP, Mass_init, Age_gyr, LogL_lsun, log_Teff, ...
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Ages (Gyr) used by load_yrec_tracks(load_isochrones=True) when none are given
+DEFAULT_AGES = np.arange(0.5, 14.0, 0.5)
+
+
+def _select_feh(eeps, feh):
+    """Rows of the EEP grid at one [Fe/H] (all rows if the grid has a single, or unknown, [Fe/H])."""
+    if feh is None:
+        known = np.unique(eeps.feh[~np.isnan(eeps.feh)])
+        if len(known) > 1:
+            raise ValueError(f"The grid has several [Fe/H] values ({', '.join(map(str, known))}); pass feh=")
+        return np.arange(len(eeps))
+    rows = np.flatnonzero(np.isclose(eeps.feh, feh, rtol=0, atol=1e-6))
+    if not len(rows):
+        raise ValueError(f"No tracks with [Fe/H] = {feh} in the grid")
+    return rows
+
+
+def _interpolate(mass, values, columns, ages):
+    """
+    Core of make_isochrones().
+
+    mass : (n_tracks,) initial masses; values : (n_tracks, n_eeps, n_columns).
+    Returns an (n_ages, n_eeps, n_columns + 1) array (Mass_init first), NaN where no track brackets the age.
+    """
+    age_col = columns.index('Age_gyr')
+    order = np.argsort(-mass)  # decreasing mass: age at a given EEP increases along this axis
+    mass = mass[order]
+    cube = values[order].transpose(1, 0, 2)  # (n_eeps, n_tracks, n_columns)
+    n_eeps, n_tracks = cube.shape[:2]
+
+    log_age = np.log10(np.clip(cube[:, :, age_col], 1e-12, None))
+    valid = ~np.isnan(cube[:, :, age_col])
+
+    # Keep, at each EEP, only the points where age still increases with decreasing mass
+    filled = np.where(valid, log_age, -np.inf)
+    previous = np.concatenate([np.full((n_eeps, 1), -np.inf), np.maximum.accumulate(filled, axis=1)[:, :-1]], axis=1)
+    keep = valid & (log_age > previous)
+    n_keep = keep.sum(axis=1)
+
+    # Shift each EEP into its own range so one np.interp covers all of them
+    span = np.nanmax(log_age[keep]) - np.nanmin(log_age[keep]) + 1.0 if keep.any() else 1.0
+    base = np.nanmin(log_age[keep]) if keep.any() else 0.0
+    shift = np.arange(n_eeps) * span
+    x = (log_age - base + shift[:, None])[keep]
+    lo = np.where(n_keep > 0, np.where(keep, log_age, np.inf).min(axis=1), np.inf)
+    hi = np.where(n_keep > 0, np.where(keep, log_age, -np.inf).max(axis=1), -np.inf)
+
+    target = np.log10(np.asarray(ages, dtype=np.float64))
+    inside = (target[:, None] >= lo[None, :]) & (target[:, None] <= hi[None, :]) & (n_keep[None, :] > 1)
+    xq = (target[:, None] - base + shift[None, :])[inside]
+
+    out = np.full((len(target), n_eeps, len(columns) + 1), np.nan)
+    mass_grid = np.broadcast_to(mass, (n_eeps, n_tracks))[keep]
+    out[:, :, 0][inside] = np.interp(xq, x, mass_grid)
+    for c in range(len(columns)):
+        out[:, :, c + 1][inside] = np.interp(xq, x, cube[:, :, c][keep])
+    return out
+
+
+def make_isochrones(eeps, ages, feh=None, iso_round=2):
+    """
+    Build isochrones at a list of ages from an EEP grid.
+
+    Parameters
+    ----------
+    eeps : EEPGrid
+        Output of eep.build_eeps() (needs an 'Age_gyr' column).
+    ages : array-like
+        Isochrone ages in Gyr.
+    feh : float, optional
+        [Fe/H] of the tracks to use. Can be omitted if the grid has a single [Fe/H].
+    iso_round : int, default 2
+        Number of decimal places the ages are rounded to (duplicates are built once).
+
+    Returns
+    -------
+    dict
+        {age rounded to iso_round: pd.DataFrame with EEP, Mass_init and the EEP grid columns}.
+        Ages outside the grid give empty DataFrames.
+    """
+    if 'Age_gyr' not in eeps.columns:
+        raise ValueError("The EEP grid needs an 'Age_gyr' column to build isochrones")
+    ages = np.unique(np.round(np.atleast_1d(np.asarray(ages, dtype=np.float64)), iso_round))
+    ages = ages[ages > 0]
+    rows = _select_feh(eeps, feh)
+    mass, values = eeps.mass[rows], eeps.values[rows]
+    columns = ['Mass_init'] + eeps.columns
+    iso = _interpolate(mass, values, eeps.columns, ages)
+
+    isochrones = {}
+    eep_numbers = np.arange(iso.shape[1])
+    for a, age in enumerate(ages):
+        ok = ~np.isnan(iso[a, :, 0])
+        df = pd.DataFrame(iso[a][ok], columns=columns)
+        df.insert(0, 'EEP', eep_numbers[ok])
+        isochrones[round(float(age), iso_round)] = df
+    return isochrones
+
+
+def make_isochrone_sets(eeps, ages=DEFAULT_AGES, iso_round=2):
+    """
+    make_isochrones() for every [Fe/H] of an EEP grid.
+
+    Returns
+    -------
+    dict
+        {[Fe/H]: {age: pd.DataFrame}}; a grid without decodable [Fe/H] gives a single key None.
+    """
+    known = np.unique(eeps.feh[~np.isnan(eeps.feh)])
+    if not len(known):
+        return {None: make_isochrones(eeps, ages, None, iso_round)}
+    return {float(feh): make_isochrones(eeps, ages, feh, iso_round) for feh in known}
+
+
+# Example usage (uncomment for testing):
+# isos = make_isochrones(eeps, ages=[1.0, 4.5, 10.0], feh=0.0)
+# print(isos[4.5].head())
@@ -3,9 +3,12 @@ load_yrec_tracks.py
 
 Function to load YREC stellar evolution tracks from one or more directories,
 with options to create subgiant bundles, EEP tracks grouped by Mass, and isochrones grouped by Age.
+For grids that do not fit in memory, iter_tracks() yields the tracks one at a time and
+stream_yrec_tracks() builds the EEP grids and isochrones from that stream.
 
-If the tracker() function is not already loaded, this script will automatically fetch
-the latest version from the YREC-Wrappers GitHub repository and import it dynamically.
+If the tracker() function is not already loaded, this script imports it from the
+Tracker.py next to it, or else fetches the latest version from the YREC-Wrappers
+GitHub repository and imports it dynamically.
 
 Author: Vincent A. Smedile
 Institution: The Ohio State University
@@ -13,55 +16,246 @@ Date: 2025-08-11
 """
 
 import os
+import sys
 from glob import glob
+from concurrent.futures import ProcessPoolExecutor
 import importlib.util
 import urllib.request
 import tempfile
 
 # ============================================================
-# AUTOLOAD tracker() FROM GITHUB IF NOT ALREADY AVAILABLE
+# AUTOLOAD tracker() FROM Tracker.py (OR GITHUB) IF NOT ALREADY AVAILABLE
 # ============================================================
 try:
     tracker  # test if tracker() is defined in the current scope
 except NameError:
-    print("tracker() not found — fetching from GitHub...")
+    try:
+        # Prefer the Tracker.py that sits next to this file
+        from Tracker import tracker
+    except ImportError:
+        print("tracker() not found — fetching from GitHub...")
     
-    # URL of the raw Tracker.py file in the YREC-Wrappers repo
-    RAW_TRACKER_URL = (
-        "https://github.com/avincesmedile/YREC-Wrappers/blob/main/Tracker.py"
-    )
+        # URL of the raw Tracker.py file in the YREC-Wrappers repo
+        RAW_TRACKER_URL = (
+            "https://github.com/avincesmedile/YREC-Wrappers/blob/main/Tracker.py"
+        )
 
-    try:
-        # Step 1: Download Tracker.py into a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as tmp_file:
-            urllib.request.urlretrieve(RAW_TRACKER_URL, tmp_file.name)
-            tmp_path = tmp_file.name
+        try:
+            # Step 1: Download Tracker.py into a temporary file
+            with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as tmp_file:
+                urllib.request.urlretrieve(RAW_TRACKER_URL, tmp_file.name)
+                tmp_path = tmp_file.name
 
-        # Step 2: Dynamically import the downloaded Tracker.py
-        spec = importlib.util.spec_from_file_location("tracker_module", tmp_path)
-        tracker_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(tracker_module)
+            # Step 2: Dynamically import the downloaded Tracker.py
+            spec = importlib.util.spec_from_file_location("tracker_module", tmp_path)
+            tracker_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(tracker_module)
+            sys.modules["tracker_module"] = tracker_module  # lets worker processes (n_workers > 1) find tracker()
 
-        # Step 3: Assign tracker() to the global scope
-        tracker = tracker_module.tracker
-        print("✅ tracker() loaded successfully from GitHub.")
+            # Step 3: Assign tracker() to the global scope
+            tracker = tracker_module.tracker
+            print("✅ tracker() loaded successfully from GitHub.")
 
-    except Exception as e:
-        raise ImportError(
-            f"❌ Failed to load tracker() from GitHub. "
-            f"Check your internet connection or the repo URL.\nError: {e}"
-        )
+        except Exception as e:
+            raise ImportError(
+                f"❌ Failed to load tracker() from GitHub. "
+                f"Check your internet connection or the repo URL.\nError: {e}"
+            )
 
 # ============================================================
 # load_yrec_tracks begins here!!
 # ============================================================
 
+def read_track(filepath, cache=True, cache_dir=None, columns=None):
+    """
+    Read one .track file with tracker(), going through the on-disk cache if requested.
+    Shared by the other tools that read grid tracks (grid_store, compare_grids).
+
+    Parameters
+    ----------
+    filepath : str
+        Path of the .track file.
+    cache, cache_dir, columns
+        As in load_yrec_tracks().
+    """
+    if cache:
+        try:
+            from track_cache import cached_tracker
+        except ImportError:
+            print("⚠️ track_cache.py not found — reading without cache.")
+        else:
+            return cached_tracker(filepath, tracker, cache_dir=cache_dir, columns=columns)
+    return tracker(filepath, columns=columns)
+
+
+# Columns that stay float64 in compact mode (ages need the full precision to order late models)
+FLOAT64_COLUMNS = ('Age_gyr',)
+
+# Diagnostic and neutrino columns that compact mode drops when they are zero in every track of a list
+def _is_optional_column(name):
+    return name.startswith('diag') or name.endswith(('_neut', '_snu')) or name == 'Neut_lsun'
+
+
+def _table_nbytes(table):
+    return int(table.memory_usage(index=True, deep=True).sum())
+
+
+def _compact_table(table, float32_columns=None):
+    """
+    Downcast float64 columns of a track to float32, in place of the original columns.
+    float32_columns=None downcasts every float64 column except FLOAT64_COLUMNS.
+    """
+    if float32_columns is None:
+        float32_columns = [c for c in table.columns if table[c].dtype == 'float64' and c not in FLOAT64_COLUMNS]
+    else:
+        float32_columns = [c for c in float32_columns if c in table.columns and table[c].dtype == 'float64']
+    if float32_columns:
+        table = table.astype({c: 'float32' for c in float32_columns})
+    return table
+
+
+def _drop_zero_columns(track_list):
+    """
+    Drop the optional diagnostic/neutrino columns that are zero in every track of a list,
+    so the tracks of one list keep the same columns.
+    """
+    if not track_list:
+        return track_list
+    candidates = [c for c in track_list[0][0].columns if _is_optional_column(c)]
+    zero = [c for c in candidates
+            if all(c in df.columns and not df[c].to_numpy().any() for df, _ in track_list)]
+    if not zero:
+        return track_list
+    return [(df.drop(columns=zero), fname) for df, fname in track_list]
+
+
+def _read_track_job(job):
+    """
+    Worker for load_yrec_tracks(n_workers > 1). Returns (table, None) or (None, error message)
+    so that failures are reported by the parent process, in file order.
+    """
+    filepath, cache, cache_dir, columns = job
+    try:
+        return read_track(filepath, cache, cache_dir, columns), None
+    except Exception as e:
+        return None, str(e)
+
+
+def find_track_files(track_dirs, recursive=True):
+    """Sorted .track paths under each directory (str or list of str), in the order of `track_dirs`."""
+    if isinstance(track_dirs, str):
+        track_dirs = [track_dirs]
+    track_files = []
+    for track_dir in track_dirs:
+        # Build search pattern
+        pattern = os.path.join(track_dir, '**', '*.track') if recursive else os.path.join(track_dir, '*.track')
+        track_files.extend(sorted(glob(pattern, recursive=recursive)))
+    return track_files
+
+
+def _list_name(filepath):
+    """Name of the list a track belongs to: its folder name + '_yrectracks'."""
+    foldername = os.path.basename(os.path.dirname(filepath))
+    return os.path.splitext(foldername)[0] + '_yrectracks'
+
+
+def iter_tracks(track_dirs, recursive=True, cache=True, cache_dir=None, columns=None):
+    """
+    Yield YREC tracks one at a time, without keeping them in memory.
+
+    Parameters
+    ----------
+    track_dirs, recursive, cache, cache_dir, columns
+        As in load_yrec_tracks().
+
+    Yields
+    ------
+    (str, str, pd.DataFrame)
+        (list name, file name, track), in the same order load_yrec_tracks() loads them.
+        Files that cannot be read are reported and skipped.
+    """
+    for filepath in find_track_files(track_dirs, recursive):
+        table, error = _read_track_job((filepath, cache, cache_dir, columns))
+        if error is not None:
+            print(f"Failed to read {os.path.basename(filepath)} with tracker: {error}")
+            continue
+        yield _list_name(filepath), os.path.basename(filepath), table
+
+
+def stream_yrec_tracks(
+    track_dirs,
+    recursive=True,
+    load_isochrones=False,
+    iso_round=2,
+    iso_ages=None,
+    cache=True,
+    cache_dir=None,
+    columns=None,
+    batch_size=1
+):
+    """
+    Build EEP grids (and optionally isochrones) for grids larger than memory.
+
+    Tracks are read one at a time with iter_tracks(), reduced to their EEP
+    arrays right away (see eep.EEPAccumulator) and dropped, so peak memory is
+    one raw track (or `batch_size` tracks) plus the EEP arrays, whatever the
+    number of tracks. The results are the same as
+    load_yrec_tracks(load_eeps=True, load_isochrones=...).
+
+    Parameters
+    ----------
+    track_dirs, recursive, iso_round, iso_ages, cache, cache_dir
+        As in load_yrec_tracks().
+    load_isochrones : bool
+        If True, also build isochrones from the EEP grids.
+    columns : list of str, optional
+        Only read these .track columns. They must include the columns used by
+        the EEPs (eep.DEFAULT_COLUMNS, X_cen, LogL_lsun, log_Teff and Age_gyr).
+    batch_size : int, default 1
+        Tracks resampled together (more is faster, but holds more raw tracks).
+
+    Returns
+    -------
+    dict
+        'eep_grids' ({list_name + '_eep': EEPGrid}) and, if requested,
+        'isochrones' ({list_name + '_iso': {[Fe/H]: {Age(Gyr): DataFrame}}}).
+    """
+    from eep import EEPAccumulator
+
+    accumulators = {}
+    for list_name, filename, table in iter_tracks(track_dirs, recursive, cache, cache_dir, columns):
+        if list_name not in accumulators:
+            accumulators[list_name] = EEPAccumulator(batch_size=batch_size)
+        accumulators[list_name].add(table, filename)
+        del table  # only the EEP arrays are kept
+
+    output = {'eep_grids': {list_name + '_eep': acc.grid() for list_name, acc in accumulators.items() if len(acc)}}
+
+    if load_isochrones:
+        from isochrones import make_isochrone_sets, DEFAULT_AGES
+
+        ages = DEFAULT_AGES if iso_ages is None else iso_ages
+        output['isochrones'] = {name[:-len('_eep')] + '_iso': make_isochrone_sets(eeps, ages, iso_round)
+                                for name, eeps in output['eep_grids'].items()}
+    return output
+
+
 def load_yrec_tracks(
     track_dirs,
     recursive=True,
     load_subgiants=True,
     load_all_tracks=True,
-    iso_round=2
+    load_eeps=False,
+    load_isochrones=False,
+    iso_round=2,
+    iso_ages=None,
+    cache=True,
+    cache_dir=None,
+    n_workers=1,
+    columns=None,
+    compact=False,
+    float32_columns=None,
+    load_derived=False
 ):
     """
     Load YREC tracks and optionally create subgiant bundles, EEP tracks, and isochrones.
@@ -73,15 +267,54 @@ def load_yrec_tracks(
     recursive : bool
         Whether to search subdirectories recursively.
     load_subgiants : bool
-        If True, create and return subgiant-only tracks (X_cen <= 1e-4).
+        If True, create and return subgiant-only tracks (from the first model with X_cen <= 1e-4).
+        These are row slices (views) of the full tracks, not copies. The phase boundaries
+        (pre-MS, MS, SGB, RGB, post-RGB) of every track are returned under 'phase_index'
+        as one eep.PhaseIndex per list, e.g. output['phase_index'][name].select('MS').
     load_all_tracks : bool
         If True, load and return all tracks.
     load_eeps : bool
-        If True, group and return EEP tracks by Mass.
+        If True, resample every list of tracks onto common EEPs (see eep.py) and return
+        them under 'eep_grids' as EEPGrid objects, with the tracks sorted by ([Fe/H], Mass).
     load_isochrones : bool
-        If True, group and return isochrones by Age(Gyr).
+        If True, build isochrones from the EEP tracks (see isochrones.py) and return them under
+        'isochrones' as {list_name + '_iso': {[Fe/H]: {Age(Gyr): DataFrame}}}.
     iso_round : int, default 2
         Number of decimal places to round Age(Gyr) values for isochrone grouping.
+    iso_ages : array-like, optional
+        Isochrone ages in Gyr. Defaults to isochrones.DEFAULT_AGES (0.5 to 13.5 Gyr in 0.5 Gyr steps).
+    cache : bool, default True
+        If True, parsed tracks are kept in an on-disk binary cache (see track_cache.py)
+        keyed on each file's path, size and mtime. Unchanged files are then read back
+        without re-parsing the ASCII table; changed files are re-parsed automatically.
+        EEP grids, isochrones and derived columns are also cached (see derived_cache.py), keyed
+        on the names and content of each list's .track files and the parameters that produced them.
+    cache_dir : str, optional
+        Folder for the cache entries. Defaults to a `.yrec_cache` folder next to each .track file
+        (derived products go to `.yrec_cache/derived` in the first of `track_dirs`).
+    n_workers : int or None, default 1
+        Number of processes used to read .track files. None uses every CPU.
+        Results are returned in the same (sorted) file order regardless of n_workers.
+        On platforms that spawn rather than fork (macOS, Windows), import this file as a
+        module instead of running it with %run so the workers can find tracker().
+    columns : list of str, optional
+        Only read these .track columns (by name). 'X_cen' is added when load_subgiants=True.
+        With the cache enabled, a cache miss still caches every column.
+    compact : bool, default False
+        Reduce the memory held by the loaded grid:
+          - float64 columns are downcast to float32 (see float32_columns);
+          - diagnostic and neutrino columns (diag1, diag2, *_neut, *_snu, Neut_lsun)
+            that are zero in every track of a list are dropped;
+          - the (start, stop) subgiant row ranges are also returned under 'subgiant_ranges'.
+        The memory used before and after is printed and returned under 'memory_usage'.
+    float32_columns : list of str, optional
+        Columns to downcast in compact mode. By default every float64 column except
+        Age_gyr is downcast.
+    load_derived : bool, default False
+        If True, return a derived_columns.DerivedColumns per list under 'derived_columns'
+        (Teff_K, R_rsun, numax_uHz, Dnu_uHz, Rossby, ...). Each column is computed for the
+        whole list on first access and, with the cache enabled, stored with the other
+        derived products so later loads read it back.
 
     Returns
     -------
@@ -95,42 +328,86 @@ def load_yrec_tracks(
 
     # 2. Prepare container for loaded tracks
     star_lists = {} if load_all_tracks else None
+    list_files = {}  # source .track paths of each list, for the derived-product cache
+    if isinstance(columns, str):
+        columns = [columns]
+    if columns is not None and load_subgiants and 'X_cen' not in columns:
+        columns = list(columns) + ['X_cen']  # needed for the subgiant cut
 
     # 3. Load .track files
     if load_all_tracks:
-        for track_dir in track_dirs:
-            # Build search pattern
-            pattern = os.path.join(track_dir, '**', '*.track') if recursive else os.path.join(track_dir, '*.track')
-            track_files = glob(pattern, recursive=recursive)
-
-            for filepath in track_files:
-                dir_path = os.path.dirname(filepath)
-                foldername = os.path.basename(dir_path)
-                filename = os.path.basename(filepath)
-                list_name = os.path.splitext(foldername)[0] + '_yrectracks'
-
-                try:
-                    table = tracker(filepath)  # call the dynamically loaded tracker()
-                except Exception as e:
-                    print(f"Failed to read {filename} with tracker: {e}")
-                    continue
-
-                if list_name not in star_lists:
-                    star_lists[list_name] = []
-                star_lists[list_name].append((table, filename))
+        # Collect every file first so the reads can be spread over processes
+        jobs = [(filepath, cache, cache_dir, columns) for filepath in find_track_files(track_dirs, recursive)]
+
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        if n_workers > 1 and len(jobs) > 1:
+            chunksize = max(1, len(jobs) // (n_workers * 4))
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(jobs))) as executor:
+                results = list(executor.map(_read_track_job, jobs, chunksize=chunksize))
+        else:
+            results = map(_read_track_job, jobs)
+
+        nbytes_before = 0
+
+        for (filepath, *_), (table, error) in zip(jobs, results):
+            filename = os.path.basename(filepath)
+            list_name = _list_name(filepath)
+
+            if error is not None:
+                print(f"Failed to read {filename} with tracker: {error}")
+                continue
+
+            if compact:
+                nbytes_before += _table_nbytes(table)
+                table = _compact_table(table, float32_columns)
+
+            if list_name not in star_lists:
+                star_lists[list_name] = []
+                list_files[list_name] = []
+            star_lists[list_name].append((table, filename))
+            list_files[list_name].append(filepath)
+
+        if compact:
+            star_lists = {name: _drop_zero_columns(track_list) for name, track_list in star_lists.items()}
 
     output = {}
 
+    # Derived products (EEP grids, isochrones, derived columns) are cached on the names and content
+    # of the source files and the parameters below, so an unchanged grid only costs a stat per file.
+    # Phase boundaries are one pass over each track, cheaper than hashing the files, and are not cached.
+    dcache = None
+    if cache and load_all_tracks and (load_eeps or load_isochrones or load_derived):
+        try:
+            from derived_cache import DerivedCache, DERIVED_DIRNAME
+        except ImportError:
+            print("⚠️ derived_cache.py not found — derived products are not cached.")
+        else:
+            dcache = DerivedCache(os.path.join(cache_dir or os.path.join(track_dirs[0], '.yrec_cache'),
+                                               DERIVED_DIRNAME))
+    load_params = {'columns': columns, 'compact': compact, 'float32_columns': float32_columns}
+
+    def derived(kind, list_name, params, compute):
+        if dcache is None:
+            return compute()
+        return dcache.get_or_compute(kind, list_files[list_name], {**load_params, **params}, compute)
+
     # 4. Subgiant-only lists
     if load_subgiants:
         if not load_all_tracks:
             raise ValueError("load_subgiants=True requires load_all_tracks=True")
 
+        from eep import PhaseIndex
+
+        # Phase boundaries are found once per list; the subgiant tracks are row slices
+        # (views) of the full tracks from the TAMS (X_cen <= 1e-4) to the end
+        phase_index = {}
         subgiant_star_lists = {}
         for list_name, track_list in star_lists.items():
+            phases = PhaseIndex(track_list)
+            phase_index[list_name] = phases
             subgiant_list = []
-            for df, fname in track_list:
-                sg_df = df[df['X_cen'] <= 1e-4].copy()
+            for sg_df, fname in phases.select('SGB', 'postRGB', skip_empty=False):
                 if not sg_df.empty:
                     subgiant_list.append(sg_df)
                 else:
@@ -138,10 +415,58 @@ def load_yrec_tracks(
             subgiant_star_lists[list_name + '_sgb'] = subgiant_list
 
         output['subgiant_star_lists'] = subgiant_star_lists
+        output['phase_index'] = phase_index
+        if compact:
+            output['subgiant_ranges'] = {
+                list_name + '_sgb': [(fname, int(start), int(stop))
+                                     for fname, (start, stop) in zip(phases.names, phases.rows('SGB', 'postRGB'))
+                                     if stop > start]
+                for list_name, phases in phase_index.items()}
+
+    # 5. EEP tracks, one batch per list (isochrones are built from them)
+    if load_eeps or load_isochrones:
+        if not load_all_tracks:
+            raise ValueError("load_eeps=True and load_isochrones=True require load_all_tracks=True")
+        import eep
+
+        eep_params = {'n_points': eep.DEFAULT_POINTS, 'weights': eep.DEFAULT_WEIGHTS,
+                      'eep_columns': eep.DEFAULT_COLUMNS, 'primary_eeps': eep.PRIMARY_EEPS}
+        eep_grids = {}
+        for list_name, track_list in star_lists.items():
+            if track_list:
+                eep_grids[list_name] = derived('eeps', list_name, eep_params,
+                                               lambda track_list=track_list: eep.build_eeps(track_list))
+        if load_eeps:
+            output['eep_grids'] = {list_name + '_eep': eeps for list_name, eeps in eep_grids.items()}
 
+        if load_isochrones:
+            from isochrones import make_isochrone_sets, DEFAULT_AGES
 
-    # 5. Add raw tracks if requested
+            ages = DEFAULT_AGES if iso_ages is None else iso_ages
+            iso_params = {**eep_params, 'iso_ages': ages, 'iso_round': iso_round}
+            output['isochrones'] = {
+                list_name + '_iso': derived('isochrones', list_name, iso_params,
+                                            lambda eeps=eeps: make_isochrone_sets(eeps, ages, iso_round))
+                for list_name, eeps in eep_grids.items()}
+
+    # 6. Derived columns, computed when first accessed
+    if load_derived:
+        if not load_all_tracks:
+            raise ValueError("load_derived=True requires load_all_tracks=True")
+        from derived_columns import DerivedColumns
+
+        output['derived_columns'] = {
+            list_name: DerivedColumns(track_list, dcache, list_files[list_name], load_params)
+            for list_name, track_list in star_lists.items()}
+
+    # 7. Add raw tracks if requested
     if load_all_tracks:
         output['star_lists'] = star_lists
 
+        if compact:
+            nbytes_after = sum(_table_nbytes(df) for track_list in star_lists.values() for df, _ in track_list)
+            output['memory_usage'] = {'before': nbytes_before, 'after': nbytes_after}
+            print(f"✅ Compact mode: {nbytes_before / 1e6:.1f} MB -> {nbytes_after / 1e6:.1f} MB "
+                  f"({len(jobs)} tracks).")
+
     return output
@@ -42,9 +42,11 @@ out: 'norotation_grid/m055fehm025_GSnorot'
 Now you have all the file names for your grid in object
 '''
 
+import os
+import re
 import numpy as np
 import update_nml
-from update_nml import update_namelists
+from update_nml import Namelist, write_nml_files
 from glob import glob
 
 
@@ -53,11 +55,14 @@ def find_numrun(nml1_filename:str):
 	''' Reads .nml1 file and returns the value of the NUMRUNS variable
 		Parameter
 		--------
-		path : str
-			absolute or relative path to the .nml1 file you're checking
+		path : str or Namelist
+			absolute or relative path to the .nml1 file you're checking (or the parsed file)
 
 	'''
-	nml1_lines = update_nml.read_nml(nml1_filename)
+	if isinstance(nml1_filename, Namelist):
+		nml1_lines = nml1_filename.lines
+	else:
+		nml1_lines = update_nml.read_nml(nml1_filename)
 	for line in nml1_lines:
 		stripped = line.strip()
 		if stripped[:6] == 'NUMRUN':
@@ -94,12 +99,30 @@ def ENV0A_params(numrun:int,Xstr:str,Zstr:str):
 		params.append(f'ZENV0A({i+1})')
 	return params, values
 
+# listing of models/dbl for each yrec_inputpath, with the directory mtime it was taken at
+_dbl_listings = {}
+
+def _dbl_models(yrec_inputpath:str):
+	''' Paths of the starting models in {yrec_inputpath}/models/dbl, globbed once
+		and reused until the directory changes (its mtime is checked on every call) '''
+	dbl_path = f'{yrec_inputpath}/models/dbl'
+	try:
+		mtime = os.stat(dbl_path).st_mtime_ns
+	except OSError:
+		return []
+	cached = _dbl_listings.get(dbl_path)
+	if cached is None or cached[0] != mtime:
+		cached = (mtime, glob(f'{dbl_path}/m*'))
+		_dbl_listings[dbl_path] = cached
+	return cached[1]
+
 def get_initialmodel_Zs(mass:float,yrec_inputpath:str):
 	''' For a starting mass, get the accepted z values
 	'''
 	mass_idx = np.where(mass_options == mass)[0][0]
 	mass = mass_stringoptions[mass_idx]
-	lines = glob(f'{yrec_inputpath}/models/dbl/m{mass}*')
+	prefix = f'{yrec_inputpath}/models/dbl/m{mass}'
+	lines = [path for path in _dbl_models(yrec_inputpath) if path.startswith(prefix)]
 	zstrs = []
 	zs = []
 	for line in lines:
@@ -180,7 +203,6 @@ def filestr_to_num(s:str,sig_figs=3,ignore_sign=False):
 		raise Exception(f'{s} has too many digits. It should only have {sig_figs}')
 
 	num = float(s[1:])/tol
-	print(float(s[1:]),tol)
 	return coef * num
 
 # helper function
@@ -226,6 +248,34 @@ def num_to_filestr(z:float,sig_figs=3,ignore_sign=False):
 		return tmp
 	return zname + tmp
 
+# pattern used by make_MFeHgrid for output and namelist names: 'm' + mass + 'feh' + (p/m)FeH + '_' + base_fname
+GRID_FILENAME = re.compile(r'^m(\d{3,4})feh([pm]\d{3})_(.*)$')
+
+# helper function
+def filestr_to_MFeH(fname:str):
+	""" Inverse of the naming used by make_MFeHgrid: decode the mass and [Fe/H] of a grid file
+		Parameters
+		----------
+		fname : string
+			File name or path, e.g. 'output/m113fehm005_a14GSnorot.track'
+
+		Returns
+		----------
+		mass, FeH, base_fname : float, float, string
+			Ex: filestr_to_MFeH('m113fehm005_a14GSnorot.track') = (1.13, -0.05, 'a14GSnorot')
+			Returns None if the name does not follow the grid pattern. """
+	name = fname.replace('\\','/').split('/')[-1]
+	match = GRID_FILENAME.match(name)
+	if match is None:
+		return None
+	mass_str, FeH_str, rest = match.groups()
+	if len(mass_str) == 4: # masses above 10 Msun are written as mass/10 with 4 digits
+		mass = round(10*filestr_to_num(mass_str,sig_figs=4,ignore_sign=True),3)
+	else:
+		mass = filestr_to_num(mass_str,sig_figs=3,ignore_sign=True)
+	base_fname = rest.split('.')[0]
+	return mass, filestr_to_num(FeH_str), base_fname
+
 # helper function
 def find_nearest(a:np.ndarray, value:float):
 	''' Find the index of the element of a closest to value.
@@ -236,7 +286,8 @@ def find_nearest(a:np.ndarray, value:float):
 
 # the actual function!
 def make_MFeHgrid(masses:np.ndarray, FeHs:np.ndarray, base_fname:str, base_fpath:str,
-				yrec_writepath:str, yrec_inputpath:str,X_solar=0.735,Z_solar=0.017,Yp=0.2454):
+				yrec_writepath:str, yrec_inputpath:str,X_solar=0.735,Z_solar=0.017,Yp=0.2454,
+				n_threads=8, skip_unchanged=False):
 	""" Creates a grid of YREC input files with the same base physical assumptions,
 		but run at a range of masses and compositions
 
@@ -270,6 +321,19 @@ def make_MFeHgrid(masses:np.ndarray, FeHs:np.ndarray, base_fname:str, base_fpath
 			Solar Z value. The default is 0.017 from Grevesse & Sauval 1998.
 		Yp : float (default = 0.2454)
 			Primordial He abundance. The default is from the Planck 2018 results.
+		n_threads : int (default = 8)
+			Number of threads writing the namelists. Each file is written to a temporary
+			name and renamed into place, so an interrupted run never leaves a truncated file.
+		skip_unchanged : bool (default = False)
+			If True, namelists that already exist with the same content are not rewritten
+			(their mtimes, and anything keyed on them, stay valid).
+			
+		Notes
+		-----
+		The base namelists are read and indexed once (update_nml.Namelist), NUMRUN is read
+		once and models/dbl is listed once; each cell is then rendered in memory and the
+		files are written a row (one mass) at a time with update_nml.write_nml_files.
+		See benchmarks/bench_make_grid.py.
 			
 		Return
 		------
@@ -281,6 +345,48 @@ def make_MFeHgrid(masses:np.ndarray, FeHs:np.ndarray, base_fname:str, base_fpath
 			you can convert this output to an array to make indexing easier
 		 """
 
+	# The base namelists are read and indexed once; every cell is then rendered from them in memory
+	nml_base = base_fpath + "/" + base_fname
+	base_nml1 = Namelist.read(nml_base + '.nml1')
+	base_nml2 = Namelist.read(nml_base + '.nml2')
+
+	# set envelope abundance labels - the number of parameters that need to be changed 
+	# depends on the value of NUMRUN
+	numrun = find_numrun(base_nml1)
+
+	# change all output file names to have the form 'm0000feh000_{base_fname}'
+	output_file_ends = [".last",".full",".store",".track",".short",".pmod",".penv ",".atm ",".snu",".excomp"]
+	output_file_params = ["FLAST","FMODPT","FSTOR","FTRACK","FSHORT","FPMOD","FPENV","FPATM ","FSNU","FSCOMP"]
+
+	# these are inputs that are not being modifed
+	# but they need to have the correct path leading to them
+	input_filenames = [f'"{yrec_inputpath}{i}"' for i in yrec_inputpath_vals]
+
+	# everything that depends only on [Fe/H]
+	FeH_cells = []
+	for j in range(len(FeHs)):
+		FeH_str = num_to_filestr(FeHs[j])
+
+		# get Z, X from FeH. If you are running an alpha enhanced grid, this will not work!
+		X,Y,Z = FeH_to_XYZ(FeHs[j],Z_solar,X_solar,Yp)
+
+		Xstr = str(X).strip()[:9] # only need 9 digits of information
+		Zstr = str(Z).strip()[:9] # only need 9 digits of information
+
+		# pick the nearest opacity table to match FeHs[j]
+		opbase = yrec_inputpath + '/eos/opal2006/EOSOPAL06Z0'
+		opnum = find_nearest(opaloptions, Z)
+		opname = f'"{opbase}{opalstr[opnum]}"'
+
+		# pick the nearest atmosphere table to match FeHs[j]
+		atmbase = yrec_inputpath +'/atmos/kurucz/atmk1990'
+		# if you change to using Allard atmosphere tables, you'll need to change atmoptions and atmbase
+		atmnum = find_nearest(atmoptions,FeHs[j])
+		atmname = f'"{atmbase}{atmstr[atmnum]}.tab"'
+
+		ENV0A = ENV0A_params(numrun,Xstr,Zstr)
+		FeH_cells.append((FeH_str, Z, Xstr, Zstr, opname, atmname, ENV0A))
+
 	# output an array of the resulting base nml names (index by mass and FeH)
 	nmls_list = []
 	for i in range(len(masses)):
@@ -298,38 +404,12 @@ def make_MFeHgrid(masses:np.ndarray, FeHs:np.ndarray, base_fname:str, base_fpath
 		
 		# set up the element of nmls that will be populated by file names
 		nmls_list.append([])
+		rendered = [] # (file name, text) of this row of the grid, written together
 
-
-		for j in range(len(FeHs)):
-			FeH_str = num_to_filestr(FeHs[j])
-
-			# get Z, X from FeH. If you are running an alpha enhanced grid, this will not work!
-			X,Y,Z = FeH_to_XYZ(FeHs[j],Z_solar,X_solar,Yp)
-
-			Xstr = str(X).strip()[:9] # only need 9 digits of information
-			Zstr = str(Z).strip()[:9] # only need 9 digits of information
-
-			# pick the nearest opacity table to match FeHs[j]
-			opbase = yrec_inputpath + '/eos/opal2006/EOSOPAL06Z0'
-			opnum = find_nearest(opaloptions, Z)
-			opname = f'"{opbase}{opalstr[opnum]}"'
-
-			# pick the nearest atmosphere table to match FeHs[j]
-			atmbase = yrec_inputpath +'/atmos/kurucz/atmk1990'
-			# if you change to using Allard atmosphere tables, you'll need to change atmoptions and atmbase
-			atmnum = find_nearest(atmoptions,FeHs[j])
-			atmname = f'"{atmbase}{atmstr[atmnum]}.tab"'
-
-			# change all output file names to have the form 'm0000feh000_{base_fname}'
-			output_file_ends = [".last",".full",".store",".track",".short",".pmod",".penv ",".atm ",".snu",".excomp"]
-			output_file_params = ["FLAST","FMODPT","FSTOR","FTRACK","FSHORT","FPMOD","FPENV","FPATM ","FSNU","FSCOMP"]
+		for FeH_str, Z, Xstr, Zstr, opname, atmname, ENV0A in FeH_cells:
 			Fname = yrec_writepath + '/m' + mass_str + 'feh' + FeH_str + "_" + base_fname  # name of the output
 			output_filenames = [f'"{Fname}{f_end}"' for f_end in output_file_ends]
 
-			# these are inputs that are not being modifed
-			# but they need to have the correct path leading to them
-			input_filenames = [f'"{yrec_inputpath}{i}"' for i in yrec_inputpath_vals]
-
 			# find the nearest zoptions value to Z
 			Z_idx = find_nearest(Zoptions, Z)
 			Z_Ffirst = Zstr_options[Z_idx]
@@ -337,14 +417,7 @@ def make_MFeHgrid(masses:np.ndarray, FeHs:np.ndarray, base_fname:str, base_fpath
 			# Ffirst is the starting model. I recommend starting with the dbl (deuterium birthline) models
 			Ffirst = f'"{yrec_inputpath}/models/dbl/m{m_Ffirst}gs98z{Z_Ffirst}_Dbl.first"'
 
-			
-			nml_base = base_fpath + "/" + base_fname
 			new_nml_name = base_fpath + '/m' + mass_str + 'feh' + FeH_str +"_" + base_fname
-			
-			# set envelope abundance labels - the number of parameters that need to be changed 
-			# depends on the value of NUMRUN
-			numrun = find_numrun(nml_base+'.nml1') 
-			ENV0A = ENV0A_params(numrun,Xstr,Zstr) 
 
 			params = ['RSCLM(1)','RSCLX(1)','RSCLZ(1)','ZOPAL951','FFIRST','FOPALE06','FATM'] \
 				+ output_file_params + yrec_inputpath_params + ENV0A[0]
@@ -353,18 +426,21 @@ def make_MFeHgrid(masses:np.ndarray, FeHs:np.ndarray, base_fname:str, base_fpath
 
 			changes_dict = dict(zip(params, values))
 
-			
-
-			info = update_namelists(f'{nml_base}.nml1',f'{nml_base}.nml2', new_nml_name, changes_dict, verbose=False)
-			nmls_list[i].append(info['output_files'][0][:-5]) # don't keep .nml1 suffix
+			nml1_lines, nml1_found = base_nml1.updated_lines(changes_dict, new_nml_name)
+			nml2_lines, nml2_found = base_nml2.updated_lines(changes_dict, new_nml_name)
+			rendered.append((new_nml_name + '.nml1', nml1_lines))
+			rendered.append((new_nml_name + '.nml2', nml2_lines))
+			nmls_list[i].append(new_nml_name)
 			
 			# we'll want to track if there are problems with assigning variable names 
-			problems = set(info['missing_params'])
+			problems = set(changes_dict) - nml1_found - nml2_found
 			if problems == set(['ZENV0A(3)','XENV0A(3)']):
 				continue
 			elif problems != set():
 				raise Exception(f'Problem with parameters: \n{problems} \ncould not be changed')
 
+		write_nml_files(rendered, n_threads=n_threads, skip_unchanged=skip_unchanged)
+
 	return nmls_list
 
 opalstr = ['.002632875','.021444000','.020000000','.029000000','.002674883','.018664570',
@@ -0,0 +1,160 @@
+"""
+track_cache.py
+
+On-disk columnar cache for parsed YREC .track files.
+
+Each parsed track is stored as an uncompressed .npz archive holding one array
+per column. Entries are keyed on the absolute path, size and modification time
+of the source file, so a track that is re-run or edited is parsed again (and
+its entry rebuilt) the next time it is loaded. Unchanged tracks are read back
+as binary arrays, which makes loading a large grid I/O-bound instead of
+parse-bound.
+
+By default the cache lives in a `.yrec_cache` folder next to each .track file.
+Pass `cache_dir` to keep every entry in one place instead (e.g. when the track
+directories are read-only).
+
+Example:
+    from Tracker import tracker
+    from track_cache import cached_tracker
+    df = cached_tracker("/path/to/m100fehp000_base.track", tracker)
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from fileio import atomic_write
+
+
+CACHE_DIRNAME = '.yrec_cache'
+
+
+def cache_path(filepath, cache_dir=None):
+    """
+    Return the path of the cache entry for a .track file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the source .track file.
+    cache_dir : str, optional
+        Folder holding the cache entries. Defaults to `.yrec_cache` next to the source file.
+    """
+    filepath = os.path.abspath(filepath)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(filepath), CACHE_DIRNAME)
+    key = hashlib.sha1(filepath.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{os.path.basename(filepath)}.{key}.npz')
+
+
+def _source_stamp(filepath):
+    st = os.stat(filepath)
+    return st.st_size, st.st_mtime_ns
+
+
+def load_cached_track(filepath, cache_dir=None, columns=None):
+    """
+    Read a track back from the cache.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the source .track file.
+    cache_dir : str, optional
+        Folder holding the cache entries.
+    columns : list of str, optional
+        Only read these columns (each column is a separate array in the entry,
+        so the others are never read from disk).
+
+    Returns
+    -------
+    pd.DataFrame or None
+        The cached table, or None if there is no entry, it is stale, or it lacks a requested column.
+    """
+    size, mtime_ns = _source_stamp(filepath)
+    try:
+        with np.load(cache_path(filepath, cache_dir), allow_pickle=False) as npz:
+            if int(npz['__size__']) != size or int(npz['__mtime_ns__']) != mtime_ns:
+                return None
+            names = [str(c) for c in npz['__columns__']]
+            if columns is None:
+                columns = names
+            elif isinstance(columns, str):
+                columns = [columns]
+            return pd.DataFrame({name: npz[f'col{names.index(name)}'] for name in columns})
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_cached_track(filepath, track, cache_dir=None, stamp=None):
+    """
+    Write a parsed track to the cache.
+
+    The entry is written to a temporary file and renamed into place, so a
+    crash never leaves a truncated entry behind.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the source .track file.
+    track : pd.DataFrame
+        The parsed table.
+    cache_dir : str, optional
+        Folder holding the cache entries.
+    stamp : tuple(int, int), optional
+        (size, mtime_ns) of the source as it was when it was read. Taken from disk if not given.
+    """
+    size, mtime_ns = stamp if stamp is not None else _source_stamp(filepath)
+    path = cache_path(filepath, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    arrays = {f'col{k}': track[name].to_numpy() for k, name in enumerate(track.columns)}
+    arrays['__columns__'] = np.array([str(c) for c in track.columns])
+    arrays['__size__'] = np.int64(size)
+    arrays['__mtime_ns__'] = np.int64(mtime_ns)
+
+    atomic_write(path, lambda f: np.savez(f, **arrays))
+
+
+def cached_tracker(filepath, reader, cache_dir=None, columns=None):
+    """
+    Read a .track file through the cache.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the .track file.
+    reader : callable
+        Parser used on a cache miss, usually tracker().
+    cache_dir : str, optional
+        Folder holding the cache entries. Defaults to `.yrec_cache` next to the source file.
+    columns : list of str, optional
+        Only return these columns. A cache miss still parses and caches every
+        column, so later calls can ask for any subset without re-parsing.
+
+    Returns
+    -------
+    pd.DataFrame
+        The track data, from the cache if it is up to date, else freshly parsed.
+    """
+    track = load_cached_track(filepath, cache_dir, columns)
+    if track is not None:
+        return track
+
+    stamp = _source_stamp(filepath)  # taken before reading, so a file that changes mid-read is re-parsed next time
+    track = reader(filepath)
+    try:
+        save_cached_track(filepath, track, cache_dir, stamp=stamp)
+    except OSError as e:
+        print(f"⚠️ Could not write cache entry for {os.path.basename(filepath)}: {e}")
+    if columns is not None:
+        if isinstance(columns, str):
+            columns = [columns]
+        missing = [c for c in columns if c not in track.columns]
+        if missing:
+            raise ValueError(f"Columns not found in {filepath}: {', '.join(missing)}")
+        track = track[list(columns)]
+    return track
@@ -14,17 +14,217 @@ How to use function call:
     - Multiple parameters can be passed. 
 
     - if verbose = False, no warnings or print statements will be displayed. 
+
+    - Namelist parses a file once; any number of updates can then be rendered from it:
+        base = Namelist.read("file.nml1")
+        lines, found = base.updated_lines({"RSCLM": "1.05"}, "m105fehp000_base")
     '''
+import os
 import sys
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from fileio import atomic_write
+
+OUTPUT_FILE_NAMES = ['FLAST','FSTOR','FTRACK','FSHORT','FPMOD','FPENV','FPATM','FMODPT','FSNU','FSCOMP']
 
 def read_nml(filename):
     with open(filename, "r") as f:
         return f.readlines()
 
-def write_nml(filename, lines):
-    with open(filename, "w") as f:
-        f.writelines(lines)
+def write_nml(filename, lines, skip_unchanged=False):
+    '''
+    Write a namelist atomically: the text goes to a temporary file in the same
+    folder, which is flushed to disk and then renamed over filename, so a crash
+    never leaves a truncated file behind. An existing file keeps its permissions.
+    Line endings are written exactly as they are in lines.
+
+    Args:
+        filename (str) : File to write.
+        lines (list of str or str) : Its lines (or whole text).
+        skip_unchanged (bool) : If True and filename already holds exactly this text,
+            leave it alone (its mtime is kept).
+    Returns:
+        bool: True if the file was written.
+    '''
+    data = (lines if isinstance(lines, str) else "".join(lines)).encode()
+    if skip_unchanged:
+        try:
+            if os.path.getsize(filename) == len(data):
+                with open(filename, "rb") as f:
+                    if f.read() == data:
+                        return False
+        except OSError:
+            pass
+    atomic_write(filename, lambda f: f.write(data), fsync=True)
+    return True
+
+def write_nml_files(files, n_threads=8, skip_unchanged=False):
+    '''
+    Write many namelists with write_nml() through a pool of n_threads threads
+    (on network filesystems such as Lustre most of the time is spent waiting on
+    the file server, so writes overlap well).
+
+    Args:
+        files (iterable of (str, list of str or str)) : (file name, lines) pairs.
+        n_threads (int) : Number of writer threads (1 writes in this thread).
+        skip_unchanged (bool) : Leave files that already hold the same text untouched.
+    Returns:
+        list of str: the files that were written (not the skipped ones), in order.
+    '''
+    files = list(files)
+    def write(item):
+        return write_nml(item[0], item[1], skip_unchanged)
+    if n_threads > 1 and len(files) > 1:
+        with ThreadPoolExecutor(max_workers=min(n_threads, len(files))) as executor:
+            written = list(executor.map(write, files))
+    else:
+        written = [write(item) for item in files]
+    return [filename for (filename, _), was_written in zip(files, written) if was_written]
+
+@lru_cache(maxsize=None)
+def _param_pattern(param):
+    # Match param, equal sign, spaces, value, keep all comments
+    return re.compile(rf"^(\s*{re.escape(param)}\s*=\s*)([^\s!]+)", re.IGNORECASE)
+
+@lru_cache(maxsize=None)
+def _output_pattern(fname):
+    return re.compile(rf"^\s*{fname}\s*=\s*['\"]?.*?\.([a-zA-Z0-9_]+)['\"]?(.*)$", re.IGNORECASE)
+
+def _line_key(line):
+    """Normalized key assigned on a line (upper case, no spaces, e.g. 'XENV0A(2)'), or None."""
+    stripped = line.lstrip()
+    if not stripped or stripped.startswith("!") or "=" not in stripped:
+        return None
+    return "".join(stripped.split("=", 1)[0].split()).upper()
+
+@lru_cache(maxsize=None)
+def _param_key(param):
+    """Index key of an update parameter, or None if it has spaces or '=' (then it can only be found by regex)."""
+    if "=" in param or any(c.isspace() for c in param):
+        return None
+    return param.upper()
+
+def _line_ending(line):
+    return line[len(line.rstrip("\r\n")):]
+
+class Namelist:
+    '''
+    A YREC .nml1/.nml2 file parsed once: its lines (comments, spacing and line
+    endings untouched) and an index from each assigned key, e.g. 'RSCLM' or
+    'XENV0A(2)', to the lines assigning it.
+
+    updated_lines() applies any number of updates with the same rules as
+    update_lines(), looking at the indexed lines of each key only, and
+    text() without updates gives back the file byte for byte.
+
+    Args:
+        lines (list of str) : Lines of the file, with their line endings.
+        filename (str) : Where they were read from (for messages only).
+    '''
+    def __init__(self, lines, filename=None):
+        self.lines = list(lines)
+        self.filename = filename
+        self.index = {}
+        for i, line in enumerate(self.lines):
+            key = _line_key(line)
+            if key is not None:
+                self.index.setdefault(key, []).append(i)
+        self._assignments = sorted(i for lines in self.index.values() for i in lines)
+        # The matches depend on the lines only, not on the new values, so they are found once per parameter
+        self._param_matches = {}
+        self._output_matches = {}
+
+    @classmethod
+    def read(cls, filename):
+        # newline='' keeps \r\n line endings, so the file can be written back unchanged
+        with open(filename, "r", newline='') as f:
+            return cls(f.readlines(), filename)
+
+    def __repr__(self):
+        return f"Namelist({self.filename!r}, {len(self.lines)} lines, {len(self.index)} keys)"
+
+    def __contains__(self, key):
+        return "".join(key.split()).upper() in self.index
+
+    def keys(self):
+        return list(self.index)
+
+    def get(self, key, default=None):
+        '''Value (as written) of the first assignment of key.'''
+        for i in self.index.get("".join(key.split()).upper(), ()):
+            match = re.match(r"^[^=]*=\s*([^\s!]+)", self.lines[i])
+            if match:
+                return match.group(1)
+        return default
+
+    def _matches(self, param):
+        '''(line index, text before the value, text after the value) of every line assigning param.'''
+        matches = self._param_matches.get(param)
+        if matches is None:
+            key = _param_key(param)
+            # Only the indexed lines of the key can match; an unusual param (e.g. with spaces) is checked on every line
+            candidates = self.index.get(key, ()) if key is not None else self._assignments
+            pattern = _param_pattern(param)
+            matches = []
+            for i in candidates:
+                match = pattern.match(self.lines[i])
+                if match:
+                    matches.append((i, match.group(1), self.lines[i][match.end():]))
+            self._param_matches[param] = matches
+        return matches
+
+    def _output_file_matches(self, fname):
+        '''(line index, extension, line ending) of every line naming output file fname.'''
+        matches = self._output_matches.get(fname)
+        if matches is None:
+            matches = []
+            for i in self.index.get(fname, ()):
+                match = _output_pattern(fname).match(self.lines[i])
+                if match:
+                    matches.append((i, match.group(1), _line_ending(self.lines[i]) or "\n"))
+            self._output_matches[fname] = matches
+        return matches
+
+    def updated_lines(self, updates, output_prefix=None):
+        '''
+        Lines with parameter values replaced and, if output_prefix is given, output
+        file names (FLAST, FTRACK, ...) replaced by output_prefix.<ext>.
+        Same rules as update_lines(): on each line the first matching parameter (in
+        the order of updates) wins, and only lines no parameter matched are renamed.
+
+        Returns:
+            (list of str, set): the new lines and the parameters that were found.
+        '''
+        new_lines = list(self.lines)
+        found_params = set()
+        done = set()
+        for param, val in updates.items():
+            for i, leading, rest_of_line in self._matches(param):
+                if i not in done:
+                    new_lines[i] = f"{leading}{val}{rest_of_line}"
+                    found_params.add(param)
+                    done.add(i)
+
+        # Replaces output file names
+        if output_prefix is not None:
+            for fname in OUTPUT_FILE_NAMES:
+                for i, ext, ending in self._output_file_matches(fname):
+                    if i not in done:
+                        new_lines[i] = f' {fname} = "{output_prefix}.{ext}"{ending}'
+                        done.add(i)
+        return new_lines, found_params
+
+    def text(self, updates=None, output_prefix=None):
+        '''The file as a string, with updates applied (see updated_lines).'''
+        if not updates and output_prefix is None:
+            return "".join(self.lines)
+        return "".join(self.updated_lines(updates or {}, output_prefix)[0])
+
+    def write(self, filename, updates=None, output_prefix=None, skip_unchanged=False):
+        """Write the (updated) namelist to filename with write_nml(); returns True if the file was written."""
+        return write_nml(filename, self.text(updates, output_prefix), skip_unchanged)
 
 def parse_updates(args, verbose=True):
     ''' Parses CLI args or list of "PARAM=VALUE" strings into a dict.'''
@@ -40,70 +240,32 @@ def parse_updates(args, verbose=True):
 
 def update_lines(lines, updates, output_prefix):
     """Update lines with new parameter values and replace outfile names with user specified output_prefix."""
-    found_params = set()
-    new_lines = []
-    
-    output_file_names = ['FLAST','FSTOR','FTRACK','FSHORT','FPMOD','FPENV','FPATM','FMODPT','FSNU','FSCOMP']
-    
-    for line in lines:
-        stripped = line.lstrip()
-        if not stripped or stripped.startswith("!"):
-            new_lines.append(line)
-            continue
+    return Namelist(lines).updated_lines(updates, output_prefix)
 
-        updated = False
-        for param, val in updates.items():
-            # Match param, equal sign, spaces, value, keep all comments
-            pattern = rf"^(\s*{re.escape(param)}\s*=\s*)([^\s!]+)"
-            match = re.match(pattern, line, re.IGNORECASE)
-            if match:
-                leading = match.group(1)
-                rest_of_line = line[match.end():]
-                new_line = f"{leading}{val}{rest_of_line}"
-                new_lines.append(new_line)
-                found_params.add(param)
-                updated = True
-                break
-        
-        # Replaces output file names 
-        if not updated: 
-            for fname in output_file_names: 
-                match = re.match(rf"^\s*{fname}\s*=\s*['\"]?.*?\.([a-zA-Z0-9_]+)['\"]?(.*)$", line, re.IGNORECASE)
-                if match:
-                    ext = match.group(1)
-                    new_file_name = f'"{output_prefix}.{ext}"'
-                    new_lines.append(f" {fname} = {new_file_name}\n")
-                    updated = True
-                    break
-        
-        # Keeps remaining parameters as is
-        if not updated:
-            new_lines.append(line)
-
-    return new_lines, found_params
-
-def update_namelists(nml1_file, nml2_file, output_prefix, updates_dict, verbose=True):
+def update_namelists(nml1_file, nml2_file, output_prefix, updates_dict, verbose=True, skip_unchanged=False):
     '''
     Update YREC nml1 and nml2 files with given parameter updates.
     
     Args: 
-        nml1_file (str) : Path to nml1 file.
-        nml2_file (str) : Path to nml2 file. 
+        nml1_file (str or Namelist) : Path to nml1 file, or the file already parsed.
+        nml2_file (str or Namelist) : Path to nml2 file, or the file already parsed. 
         output_prefix (str) : Prefix for updated .nml files.
         updates_dict (dict) : Dictionary of parameters to be changed and the values specfied.
         verbose (bool) : Print status messages if True. 
+        skip_unchanged (bool) : Don't rewrite output files that already hold the same text
+            (off by default: the files are always rewritten, as before).
     Returns: 
         dict: { 
             "output_files": (updated_file.nml1, updated_file.nml2), 
             "missing_params": [list of parameters not found] 
         }
     '''
-    nml1_lines = read_nml(nml1_file)
-    nml2_lines = read_nml(nml2_file)
+    nml1 = nml1_file if isinstance(nml1_file, Namelist) else Namelist.read(nml1_file)
+    nml2 = nml2_file if isinstance(nml2_file, Namelist) else Namelist.read(nml2_file)
     
     # Update parameters 
-    nml1_updated, nml1_found = update_lines(nml1_lines, updates_dict, output_prefix)
-    nml2_updated, nml2_found = update_lines(nml2_lines, updates_dict, output_prefix)
+    nml1_updated, nml1_found = nml1.updated_lines(updates_dict, output_prefix)
+    nml2_updated, nml2_found = nml2.updated_lines(updates_dict, output_prefix)
 
     # Check for missing params
     all_found = nml1_found.union(nml2_found)
@@ -112,8 +274,8 @@ def update_namelists(nml1_file, nml2_file, output_prefix, updates_dict, verbose=
     # Create file name using output_prefix
     new_nml1_file = f"{output_prefix}.nml1"
     new_nml2_file = f"{output_prefix}.nml2"
-    write_nml(new_nml1_file, nml1_updated)
-    write_nml(new_nml2_file, nml2_updated)
+    write_nml_files([(new_nml1_file, nml1_updated), (new_nml2_file, nml2_updated)], n_threads=2,
+                    skip_unchanged=skip_unchanged)
     
     if verbose:
         print(f"Output files:\n  {new_nml1_file}\n  {new_nml2_file}")
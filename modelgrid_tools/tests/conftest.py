@@ -0,0 +1,11 @@
+"""
+Puts the tool folders on sys.path, as the scripts in them import their
+siblings by module name.
+"""
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+for folder in ('main_tools', 'alternate_tools', 'benchmarks'):
+    sys.path.insert(0, os.path.join(HERE, '..', folder))
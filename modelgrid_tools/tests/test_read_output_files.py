@@ -0,0 +1,106 @@
+"""
+read_track_table()/read_last_file() against the astropy.io.ascii readers they
+replaced (bench_fixed_width.read_*_astropy).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('astropy')
+
+import read_output_files as rof
+from bench_fixed_width import read_track_table_astropy, read_last_file_astropy
+from synthetic import write_track, write_last
+
+OVERFLOW = '1.00000000-100'
+
+
+def _set_cell(path, data_row, col_starts, k, text):
+    """Overwrite cell k of a data row (counted from the first line after the column names), keeping its width."""
+    with open(path) as f:
+        lines = f.readlines()
+    header = next(i for i, line in enumerate(lines) if line.split() and line.split()[0] in ('Step', 'SHELL'))
+    line = lines[header + 1 + data_row]
+    start, end = col_starts[k], col_starts[k + 1]
+    lines[header + 1 + data_row] = line[:start] + text.rjust(end - start) + line[end:]
+    with open(path, 'w') as f:
+        f.writelines(lines)
+
+
+@pytest.mark.parametrize('writer, new, old, names, starts', [
+    (write_track, rof.read_track_table, read_track_table_astropy, rof.TRACK_NAMES, rof.TRACK_COL_STARTS),
+    (write_last, rof.read_last_file, read_last_file_astropy, rof.LAST_NAMES, rof.LAST_COL_STARTS),
+])
+def test_matches_astropy(tmp_path, writer, new, old, names, starts):
+    path = writer(str(tmp_path / 'clean.out'), 500)
+    pd.testing.assert_frame_equal(new(path), old(path), check_exact=True)
+
+
+@pytest.mark.parametrize('writer, new, old, names, starts, column', [
+    (write_track, rof.read_track_table, read_track_table_astropy, rof.TRACK_NAMES, rof.TRACK_COL_STARTS, 'X_cen'),
+    (write_last, rof.read_last_file, read_last_file_astropy, rof.LAST_NAMES, rof.LAST_COL_STARTS, 'He3'),
+])
+def test_fortran_exponent_overflow(tmp_path, writer, new, old, names, starts, column):
+    clean = writer(str(tmp_path / 'clean.out'), 500)
+    overflow = writer(str(tmp_path / 'overflow.out'), 500)
+    _set_cell(overflow, 10, starts, names.index(column), OVERFLOW)
+
+    table, expected, reference = new(overflow), old(overflow), old(clean)
+    # only the overflow cell differs from the clean file; astropy loses the whole column
+    assert table[column][10] == 1e-100
+    np.testing.assert_array_equal(table[column].drop(10), reference[column].drop(10))
+    assert not np.array_equal(expected[column].drop(10), reference[column].drop(10))
+    others = [name for name in names if name != column]
+    pd.testing.assert_frame_equal(table[others], expected[others], check_exact=True)
+
+
+def test_bad_cell_becomes_nan(tmp_path):
+    path = write_track(str(tmp_path / 'bad.track'), 100)
+    _set_cell(path, 3, rof.TRACK_COL_STARTS, rof.TRACK_NAMES.index('LogL_lsun'), '*********')
+    table = rof.read_track_table(path)
+    assert np.isnan(table['LogL_lsun'][3])
+    assert np.isfinite(table['LogL_lsun'].drop(3)).all()
+
+
+def test_fixed_format_floats_round_like_float():
+    # 9-, 15- and 17-digit mantissas over a range of exponents, as float() reads them
+    rng = np.random.default_rng(0)
+    for digits in (9, 15, 17):
+        mantissas = rng.integers(10**(digits - 1), 10**digits, 20000)
+        exponents = rng.integers(-30, 31, 20000)
+        cells = [f' {m // 10**(digits - 1)}.{m % 10**(digits - 1):0{digits - 1}d}E{e:+03d}'
+                 for m, e in zip(mantissas.tolist(), exponents.tolist())]
+        chars = np.array([c.encode() for c in cells]).view(np.uint8).reshape(len(cells), -1)
+        values, redo = rof._fixed_format_floats(chars)
+        values[redo] = [float(c) for c, r in zip(cells, redo) if r]
+        np.testing.assert_array_equal(values, [float(c) for c in cells])
+
+
+@pytest.mark.parametrize('ext', ['.pmod', '.penv', '.atm', '.full', '.short', '.excomp'])
+def test_profile_headers(tmp_path, ext):
+    path = str(tmp_path / f'm100fehp000_x{ext}')
+    with open(path, 'w') as f:
+        for num in range(1, 6):
+            # a text line inside the table, as in .full printouts, must not split the model
+            f.write(f' MODEL {num} AGE {0.25 * num:.3f}\n   R  M\n')
+            f.write(' 1.0E+00 2.0E+00\n  CONVECTIVE ZONE\n 3.0E+00 4.0E+00\n\n')
+    with rof.open_output_file(path) as models:
+        np.testing.assert_array_equal(models.model_nums, [1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(models.ages, [0.25, 0.5, 0.75, 1.0, 1.25])
+        assert models.nearest_index(0.55) == 1
+        assert models.header(1).startswith(' MODEL 2 AGE 0.500')
+        # the text row is skipped, not kept as a row of NaN
+        np.testing.assert_array_equal(models[1].to_numpy(), [[1.0, 2.0], [3.0, 4.0]])
+        assert list(models[1].columns) == ['R', 'M']
+
+
+def test_profile_without_model_lines(tmp_path):
+    path = str(tmp_path / 'm100fehp000_x.pmod')
+    with open(path, 'w') as f:
+        for num in range(3):
+            f.write(f' STEP {num}\n 1.0E+00 {num}.0E+00\n\n')
+    with rof.open_output_file(path) as models:
+        assert len(models) == 3
+        assert np.isnan(models.ages).all()
+        assert models[2].to_numpy().tolist() == [[1.0, 2.0]]
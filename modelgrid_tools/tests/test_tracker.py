@@ -0,0 +1,62 @@
+"""
+tracker() against the previous readlines + pandas.read_csv reader
+(bench_tracker.tracker_two_pass).
+"""
+
+import numpy as np
+import pandas as pd
+
+from Tracker import tracker
+from bench_tracker import tracker_two_pass
+from synthetic import write_track
+
+
+def _insert_after_header(path, text):
+    with open(path) as f:
+        lines = f.readlines()
+    header = max(k for k, line in enumerate(lines) if line.startswith('#Version')) + 1
+    lines[header + 3:header + 3] = [text]
+    with open(path, 'w') as f:
+        f.writelines(lines)
+
+
+def test_matches_pandas_reader(tmp_path):
+    path = write_track(str(tmp_path / 'm100fehp000_test.track'), nrows=300)
+    pd.testing.assert_frame_equal(tracker(path), tracker_two_pass(path), check_exact=False, rtol=1e-12)
+
+
+def test_fortran_exponent_overflow(tmp_path):
+    path = write_track(str(tmp_path / 'm100fehp000_test.track'), nrows=50)
+    with open(path) as f:
+        text = f.read()
+    first_row = text.split('\n')[4]
+    last_token = first_row.split()[-1]
+    with open(path, 'w') as f:
+        f.write(text.replace(first_row, first_row.replace(last_token, '1.00000000-100'), 1))
+
+    track = tracker(path)
+    expected = tracker_two_pass(path)
+    assert track.iloc[0, -1] == 1e-100
+    # pandas leaves the overflow token as a string; every other cell agrees
+    other = expected.iloc[1:, -1].astype(float).to_numpy()
+    np.testing.assert_allclose(track.iloc[1:, -1].to_numpy(), other, rtol=1e-12)
+    pd.testing.assert_frame_equal(track.iloc[:, :-1], expected.iloc[:, :-1], check_exact=False, rtol=1e-12)
+
+
+def test_comment_lines_in_table_are_skipped(tmp_path):
+    # read_csv kept '# ...' lines as rows of strings; tracker() drops them
+    plain = write_track(str(tmp_path / 'plain.track'), nrows=100)
+    commented = write_track(str(tmp_path / 'commented.track'), nrows=100)
+    _insert_after_header(commented, '# model restarted\n')
+
+    assert len(tracker_two_pass(commented)) == 101
+    pd.testing.assert_frame_equal(tracker(commented), tracker_two_pass(plain), check_exact=False, rtol=1e-12)
+
+
+def test_empty_table(tmp_path):
+    path = write_track(str(tmp_path / 'empty.track'), nrows=0)
+    track, expected = tracker(path), tracker_two_pass(path)
+    assert len(track) == 0
+    assert list(track.columns) == list(expected.columns)
+    # read_csv gives object columns for a header without rows; tracker() gives float64
+    assert (track.dtypes == np.float64).all()